@@ -0,0 +1,11 @@
+from allauth.account.adapter import DefaultAccountAdapter
+
+from mailqueue.utils import enqueue_email
+
+
+class AccountAdapter(DefaultAccountAdapter):
+
+    def send_mail(self, template_prefix, email, context):
+        # confirmation and password reset emails are sent by the mail queue
+        # worker rather than during the sign up/reset request
+        enqueue_email(self.render_mail(template_prefix, email, context))
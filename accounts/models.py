@@ -10,6 +10,7 @@ from django.utils import timezone
 
 from accounts.utils import active_data_privacy_cache_key
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 
 # Decorator for django models that contain readonly fields.
@@ -74,8 +75,9 @@ class CookiePolicy(models.Model):
             # if no version specified, go to next major version
             self.version = floor((CookiePolicy.current_version() + 1))
         super(CookiePolicy, self).save(**kwargs)
-        ActivityLog.objects.create(
-            log='Cookie Policy version {} created'.format(self.version)
+        log_activity(
+            'Cookie Policy version {} created'.format(self.version),
+            action=ActivityLog.COOKIE_POLICY_CREATED, target=self
         )
 
 
@@ -115,8 +117,9 @@ class DataPrivacyPolicy(models.Model):
             # if no version specified, go to next major version
             self.version = floor((DataPrivacyPolicy.current_version() + 1))
         super().save(**kwargs)
-        ActivityLog.objects.create(
-            log='Data Privacy Policy version {} created'.format(self.version)
+        log_activity(
+            'Data Privacy Policy version {} created'.format(self.version),
+            action=ActivityLog.DATA_PRIVACY_POLICY_CREATED, target=self
         )
 
 
@@ -142,8 +145,10 @@ class SignedDataPrivacy(models.Model):
 
     def save(self, **kwargs):
         if not self.id:
-            ActivityLog.objects.create(
-                log="Signed data privacy policy agreement created: {}".format(self.__str__())
+            log_activity(
+                "Signed data privacy policy agreement created: {}".format(self.__str__()),
+                action=ActivityLog.DATA_PRIVACY_SIGNED, actor=self.user,
+                target=DataPrivacyPolicy
             )
         super(SignedDataPrivacy, self).save()
         # cache agreement
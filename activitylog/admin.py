@@ -2,7 +2,10 @@ from django.contrib import admin
 from activitylog.models import ActivityLog
 
 class ActivityLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp_formatted', 'log')
+    list_display = ('timestamp_formatted', 'actor', 'action', 'log')
+    list_filter = ('action',)
+    list_select_related = ('actor',)
+    raw_id_fields = ('actor',)
 
     def timestamp_formatted(self, obj):
         return obj.timestamp.strftime('%d-%b-%Y %H:%M:%S (%Z)')
@@ -0,0 +1,194 @@
+import gzip
+import json
+import os
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from activitylog.models import ActivityLog
+
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'log', 'actor_id', 'actor__username', 'action',
+    'target_model', 'target_id'
+)
+# ids of the batch being archived, and the sizes of the archive files
+# before it was appended to them
+PENDING_FILENAME = 'pending.json'
+
+
+def archive_root():
+    return settings.ACTIVITYLOG_ARCHIVE_ROOT
+
+
+def archive_path(month, root=None):
+    """
+    Path of the archive file for a month, given as 'YYYY-MM'
+    """
+    return os.path.join(
+        root or archive_root(), month[:4], '{}.jsonl.gz'.format(month)
+    )
+
+
+def archived_months(root=None):
+    """
+    Return the archived months as 'YYYY-MM' strings, newest first
+    """
+    root = root or archive_root()
+    months = []
+    if root and os.path.isdir(root):
+        for year in os.listdir(root):
+            year_dir = os.path.join(root, year)
+            if os.path.isdir(year_dir):
+                months.extend(
+                    filename[:-len('.jsonl.gz')]
+                    for filename in os.listdir(year_dir)
+                    if filename.endswith('.jsonl.gz')
+                )
+    return sorted(months, reverse=True)
+
+
+def _write_pending(root, ids, sizes):
+    path = os.path.join(root, PENDING_FILENAME)
+    with open(path + '.tmp', 'w') as pending_file:
+        json.dump({'ids': ids, 'sizes': sizes}, pending_file)
+        pending_file.flush()
+        os.fsync(pending_file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _recover_pending(root):
+    """
+    Finish the batch of an interrupted run.  Its rows are deleted in one
+    transaction, so either all of them are gone and the batch was archived
+    in full, or none are and the archive files are truncated back to their
+    sizes before the batch, dropping anything it appended (possibly an
+    incomplete gzip member, which would hide the members appended after
+    it).  The rows are then archived again.
+    """
+    path = os.path.join(root, PENDING_FILENAME)
+    if not os.path.exists(path):
+        return
+    with open(path) as pending_file:
+        pending = json.load(pending_file)
+    if ActivityLog.objects.filter(id__in=pending['ids']).exists():
+        for archive_file, size in pending['sizes'].items():
+            if not os.path.exists(archive_file):
+                continue
+            if size:
+                os.truncate(archive_file, size)
+            else:
+                os.remove(archive_file)
+    os.remove(path)
+
+
+def _append(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = ''.join(
+        json.dumps(row, sort_keys=True, default=str) + '\n' for row in rows
+    )
+    # each batch is appended as a separate gzip member; readers see the
+    # members as one stream
+    with open(path, 'ab') as archive_file:
+        archive_file.write(gzip.compress(lines.encode('utf-8')))
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+
+
+def archive_logs(before, batch_size=1000, root=None):
+    """
+    Move the activity logs older than `before` to the monthly archive files,
+    deleting them in batches of `batch_size`.  Each batch is written and
+    synced before its rows are deleted, so the job can be interrupted and
+    re-run; whatever an interrupted batch appended is truncated away before
+    it is archived again.  Returns the number of logs archived.
+    """
+    root = root or archive_root()
+    if not root:
+        # there's no default on Heroku, whose local filesystem is wiped, so
+        # logs are never deleted after being archived somewhere temporary
+        raise ImproperlyConfigured(
+            'ACTIVITYLOG_ARCHIVE_ROOT must be set to a directory on '
+            'persistent storage'
+        )
+    os.makedirs(root, exist_ok=True)
+    _recover_pending(root)
+
+    archived = 0
+    while True:
+        rows = list(
+            ActivityLog.objects.filter(timestamp__lt=before)
+            .order_by('timestamp', 'id')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return archived
+
+        by_month = {}
+        for row in rows:
+            row['actor_username'] = row.pop('actor__username')
+            row['timestamp'] = row['timestamp'].isoformat()
+            by_month.setdefault(row['timestamp'][:7], []).append(row)
+        paths = {
+            archive_path(month, root): month_rows
+            for month, month_rows in by_month.items()
+        }
+
+        ids = [row['id'] for row in rows]
+        _write_pending(root, ids, {
+            path: os.path.getsize(path) if os.path.exists(path) else 0
+            for path in paths
+        })
+        for path, month_rows in paths.items():
+            _append(path, month_rows)
+        with transaction.atomic():
+            ActivityLog.objects.filter(id__in=ids).delete()
+        os.remove(os.path.join(root, PENDING_FILENAME))
+        archived += len(rows)
+
+
+def _read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        try:
+            for line in archive_file:
+                yield json.loads(line)
+        except (EOFError, OSError, zlib.error, ValueError):
+            # the last batch of an interrupted run may be incomplete until
+            # the next run truncates it; its rows are still in the database
+            return
+
+
+def search_archive(search_text='', month=None, limit=200, root=None):
+    """
+    Search the archived logs of one month, or all months, for entries whose
+    text contains every word of `search_text` (case-insensitive).  Reads
+    the archive files in full, so it is much slower than searching the
+    database.  Returns up to `limit` entries, newest first.
+    """
+    words = search_text.lower().split()
+    months = [month] if month else archived_months(root)
+    results = []
+    for archive_month in months:
+        path = archive_path(archive_month, root)
+        if not os.path.exists(path):
+            continue
+        seen = set()
+        month_results = []
+        for row in _read_archive(path):
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+            text = row['log'].lower()
+            if all(word in text for word in words):
+                row['timestamp'] = parse_datetime(row['timestamp'])
+                month_results.append(row)
+        month_results.sort(
+            key=lambda row: (row['timestamp'], row['id']), reverse=True
+        )
+        results.extend(month_results[:limit - len(results)])
+        if len(results) >= limit:
+            break
+    return results
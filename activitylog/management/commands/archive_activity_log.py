@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from activitylog.archive import archive_logs
+
+
+class Command(BaseCommand):
+    help = 'Move activity logs older than the retention period to the ' \
+           'compressed monthly archive files in ACTIVITYLOG_ARCHIVE_ROOT.  ' \
+           'Safe to re-run after an interruption.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ACTIVITYLOG_RETENTION_DAYS,
+            help='Archive logs older than this many days (default: '
+                 'ACTIVITYLOG_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of logs to archive and delete at a time'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        archived = archive_logs(before, batch_size=options['batch_size'])
+        self.stdout.write(
+            '{} activity logs older than {} archived'.format(
+                archived, before.strftime('%d %b %Y')
+            )
+        )
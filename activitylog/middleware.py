@@ -0,0 +1,15 @@
+from activitylog.utils import activity_log_buffer
+
+
+class ActivityLogBufferMiddleware(object):
+    """
+    Write the activity log entries made while handling a request together,
+    when the response is ready
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with activity_log_buffer():
+            return self.get_response(request)
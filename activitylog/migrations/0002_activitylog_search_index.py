@@ -0,0 +1,44 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Django's icontains lookup on PostgreSQL is UPPER("log"::text) LIKE
+# UPPER(%s), so a trigram index on the same expression serves the log search.
+# Other databases keep the unindexed LIKE.
+CREATE_SEARCH_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS activitylog_log_upper_trgm '
+    'ON activitylog_activitylog USING gin (UPPER(log) gin_trgm_ops)',
+]
+DROP_SEARCH_INDEX = [
+    'DROP INDEX IF EXISTS activitylog_log_upper_trgm',
+]
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(
+            run_postgresql(CREATE_SEARCH_INDEX),
+            reverse_code=run_postgresql(DROP_SEARCH_INDEX)
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+EMPTY_CRON_JOB_LOGS = [
+    'email_warnings job run; no unpaid booking warnings to send',
+    'cancel_unpaid_bookings job run; no bookings to cancel'
+]
+
+
+def set_cron_job_action(apps, schema_editor):
+    ActivityLog = apps.get_model('activitylog', 'ActivityLog')
+    ActivityLog.objects.filter(log__in=EMPTY_CRON_JOB_LOGS).update(
+        action='cron_job_no_action'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activitylog', '0002_activitylog_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='action',
+            field=models.CharField(blank=True, choices=[('user_registered', 'User registered'), ('cookie_policy_created', 'Cookie policy created'), ('data_privacy_policy_created', 'Data privacy policy created'), ('data_privacy_signed', 'Data privacy policy signed'), ('email_error', 'Email error'), ('bulk_email_queued', 'Bulk email queued'), ('bulk_email_finished', 'Bulk email finished'), ('recipient_segment_saved', 'Email recipient selection saved'), ('restricted_access_granted', 'Restricted access granted'), ('restricted_access_revoked', 'Restricted access removed'), ('page_created', 'Page created'), ('page_updated', 'Page updated'), ('page_deleted', 'Page deleted'), ('session_deleted', 'Timetable session deleted'), ('event_updated', 'Event updated'), ('event_deleted', 'Event deleted'), ('category_created', 'Gallery category created'), ('category_updated', 'Gallery category updated'), ('category_deleted', 'Gallery category deleted'), ('images_added', 'Gallery images added'), ('images_updated', 'Gallery images edited'), ('images_deleted', 'Gallery images deleted'), ('review_submitted', 'Testimonial submitted'), ('review_updated', 'Testimonial updated'), ('review_approved', 'Testimonial approved'), ('review_rejected', 'Testimonial rejected'), ('cron_job_no_action', 'Automatic job with no action required')], default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='target_id',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='target_model',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['actor', 'timestamp'], name='activitylog_actor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['action', 'timestamp'], name='activitylog_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['target_model', 'target_id', 'timestamp'], name='activitylog_target_idx'),
+        ),
+        migrations.RunPython(
+            set_cron_job_action, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0003_activitylog_structured_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='activitylog_timestamp_idx'),
+        ),
+    ]
@@ -1,7 +1,101 @@
+from django.contrib.auth.models import User
 from django.db import models
 from django.utils import timezone
 
 class ActivityLog(models.Model):
+    """
+    On PostgreSQL, migration 0002 adds a trigram index on UPPER(log) so the
+    studioadmin log search (log__icontains per word) can use an index scan.
+    Entries are written with activitylog.utils.log_activity, which fills in
+    the structured actor/action/target columns.
+    """
+
+    USER_REGISTERED = 'user_registered'
+    COOKIE_POLICY_CREATED = 'cookie_policy_created'
+    DATA_PRIVACY_POLICY_CREATED = 'data_privacy_policy_created'
+    DATA_PRIVACY_SIGNED = 'data_privacy_signed'
+    EMAIL_ERROR = 'email_error'
+    BULK_EMAIL_QUEUED = 'bulk_email_queued'
+    BULK_EMAIL_FINISHED = 'bulk_email_finished'
+    RECIPIENT_SEGMENT_SAVED = 'recipient_segment_saved'
+    RESTRICTED_ACCESS_GRANTED = 'restricted_access_granted'
+    RESTRICTED_ACCESS_REVOKED = 'restricted_access_revoked'
+    PAGE_CREATED = 'page_created'
+    PAGE_UPDATED = 'page_updated'
+    PAGE_DELETED = 'page_deleted'
+    SESSION_DELETED = 'session_deleted'
+    EVENT_UPDATED = 'event_updated'
+    EVENT_DELETED = 'event_deleted'
+    CATEGORY_CREATED = 'category_created'
+    CATEGORY_UPDATED = 'category_updated'
+    CATEGORY_DELETED = 'category_deleted'
+    IMAGES_ADDED = 'images_added'
+    IMAGES_UPDATED = 'images_updated'
+    IMAGES_DELETED = 'images_deleted'
+    REVIEW_SUBMITTED = 'review_submitted'
+    REVIEW_UPDATED = 'review_updated'
+    REVIEW_APPROVED = 'review_approved'
+    REVIEW_REJECTED = 'review_rejected'
+    CRON_JOB_NO_ACTION = 'cron_job_no_action'
+
+    ACTION_CHOICES = (
+        (USER_REGISTERED, 'User registered'),
+        (COOKIE_POLICY_CREATED, 'Cookie policy created'),
+        (DATA_PRIVACY_POLICY_CREATED, 'Data privacy policy created'),
+        (DATA_PRIVACY_SIGNED, 'Data privacy policy signed'),
+        (EMAIL_ERROR, 'Email error'),
+        (BULK_EMAIL_QUEUED, 'Bulk email queued'),
+        (BULK_EMAIL_FINISHED, 'Bulk email finished'),
+        (RECIPIENT_SEGMENT_SAVED, 'Email recipient selection saved'),
+        (RESTRICTED_ACCESS_GRANTED, 'Restricted access granted'),
+        (RESTRICTED_ACCESS_REVOKED, 'Restricted access removed'),
+        (PAGE_CREATED, 'Page created'),
+        (PAGE_UPDATED, 'Page updated'),
+        (PAGE_DELETED, 'Page deleted'),
+        (SESSION_DELETED, 'Timetable session deleted'),
+        (EVENT_UPDATED, 'Event updated'),
+        (EVENT_DELETED, 'Event deleted'),
+        (CATEGORY_CREATED, 'Gallery category created'),
+        (CATEGORY_UPDATED, 'Gallery category updated'),
+        (CATEGORY_DELETED, 'Gallery category deleted'),
+        (IMAGES_ADDED, 'Gallery images added'),
+        (IMAGES_UPDATED, 'Gallery images edited'),
+        (IMAGES_DELETED, 'Gallery images deleted'),
+        (REVIEW_SUBMITTED, 'Testimonial submitted'),
+        (REVIEW_UPDATED, 'Testimonial updated'),
+        (REVIEW_APPROVED, 'Testimonial approved'),
+        (REVIEW_REJECTED, 'Testimonial rejected'),
+        (CRON_JOB_NO_ACTION, 'Automatic job with no action required'),
+    )
 
     timestamp = models.DateTimeField(default=timezone.now)
     log = models.TextField()
+    actor = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='activity_logs'
+    )
+    action = models.CharField(
+        max_length=50, choices=ACTION_CHOICES, blank=True, default=''
+    )
+    # app_label.model_name of the object the entry is about; target_id is
+    # blank for entries about several objects
+    target_model = models.CharField(max_length=100, blank=True, default='')
+    target_id = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # the studioadmin list pages on (timestamp, id)
+            models.Index(
+                fields=['timestamp', 'id'], name='activitylog_timestamp_idx'
+            ),
+            models.Index(
+                fields=['actor', 'timestamp'], name='activitylog_actor_idx'
+            ),
+            models.Index(
+                fields=['action', 'timestamp'], name='activitylog_action_idx'
+            ),
+            models.Index(
+                fields=['target_model', 'target_id', 'timestamp'],
+                name='activitylog_target_idx'
+            ),
+        ]
@@ -3,13 +3,15 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 
 @receiver(post_save, sender=User)
 def event_post_save(sender, instance, created, *args, **kwargs):
     if created:
-        ActivityLog.objects.create(
-            log='New user registered: {} {}, username {}'.format(
+        log_activity(
+            'New user registered: {} {}, username {}'.format(
                     instance.first_name, instance.last_name, instance.username
-            )
+            ),
+            action=ActivityLog.USER_REGISTERED, actor=instance, target=instance
         )
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from datetime import datetime, timedelta
+from io import StringIO
+from model_bakery import baker
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import management
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, \
+    override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from activitylog.archive import archive_logs, archive_path, \
+    archived_months, search_archive, PENDING_FILENAME
+from activitylog.middleware import ActivityLogBufferMiddleware
+from activitylog.models import ActivityLog
+from activitylog.utils import activity_log_buffer, log_activity
+
+
+class LogActivityTests(TestCase):
+
+    def test_log_with_target_instance(self):
+        user = baker.make_recipe('common.user')
+        log = log_activity(
+            'Test log', action=ActivityLog.RESTRICTED_ACCESS_GRANTED,
+            actor=user, target=user
+        )
+        log.refresh_from_db()
+        self.assertEqual(log.log, 'Test log')
+        self.assertEqual(log.action, ActivityLog.RESTRICTED_ACCESS_GRANTED)
+        self.assertEqual(log.actor, user)
+        self.assertEqual(log.target_model, 'auth.user')
+        self.assertEqual(log.target_id, str(user.id))
+
+    def test_log_with_target_model(self):
+        log = log_activity('Test log', target=User)
+        self.assertEqual(log.target_model, 'auth.user')
+        self.assertEqual(log.target_id, '')
+
+    def test_anonymous_actor_is_not_recorded(self):
+        log = log_activity('Test log', actor=AnonymousUser())
+        self.assertIsNone(log.actor)
+
+    def test_user_registration_logged(self):
+        user = baker.make_recipe('common.user')
+        log = ActivityLog.objects.get(
+            action=ActivityLog.USER_REGISTERED, target_id=str(user.id)
+        )
+        self.assertEqual(log.actor, user)
+
+
+@override_settings(ACTIVITYLOG_BUFFER_SIZE=100, ACTIVITYLOG_BUFFER_MAX_AGE=60)
+class ActivityLogBufferTests(TransactionTestCase):
+    # not a TestCase, whose transaction would stop entries being buffered
+
+    def test_entries_written_together_when_buffer_exits(self):
+        with CaptureQueriesContext(connection) as queries:
+            with activity_log_buffer():
+                for i in range(5):
+                    log_activity('Test log {}'.format(i))
+        # one INSERT for all the entries
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('log', flat=True)),
+            ['Test log {}'.format(i) for i in range(5)]
+        )
+
+    def test_nested_buffers_share_outer_buffer(self):
+        with activity_log_buffer() as outer:
+            with activity_log_buffer() as inner:
+                log_activity('Test log')
+            self.assertIs(inner, outer)
+            self.assertFalse(ActivityLog.objects.exists())
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    @override_settings(ACTIVITYLOG_BUFFER_SIZE=3)
+    def test_flushed_when_full(self):
+        with activity_log_buffer():
+            for i in range(4):
+                log_activity('Test log {}'.format(i))
+            self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(ActivityLog.objects.count(), 4)
+
+    @override_settings(ACTIVITYLOG_BUFFER_MAX_AGE=0)
+    def test_flushed_when_old(self):
+        with activity_log_buffer():
+            log_activity('Test log')
+            self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_flushed_on_exception(self):
+        with self.assertRaises(ValueError):
+            with activity_log_buffer():
+                log_activity('Test log')
+                raise ValueError
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_entries_rolled_back_with_transaction(self):
+        with activity_log_buffer():
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    log_activity('Rolled back')
+                    raise ValueError
+            with transaction.atomic():
+                log_activity('Committed')
+        self.assertEqual(
+            list(ActivityLog.objects.values_list('log', flat=True)),
+            ['Committed']
+        )
+
+    def test_middleware_writes_entries_at_end_of_request(self):
+        def view(request):
+            log_activity('Test log 1')
+            log_activity('Test log 2')
+            self.assertFalse(ActivityLog.objects.exists())
+            return HttpResponse()
+
+        middleware = ActivityLogBufferMiddleware(view)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(ActivityLog.objects.count(), 2)
+
+
+class ActivityLogArchiveTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = override_settings(ACTIVITYLOG_ARCHIVE_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = baker.make_recipe('common.user')
+        ActivityLog.objects.all().delete()
+        self.jan_log = baker.make(
+            ActivityLog, log='January log', actor=self.user,
+            timestamp=datetime(2015, 1, 10, 12, 0, tzinfo=timezone.utc)
+        )
+        self.feb_logs = baker.make(
+            ActivityLog, log='February log', _quantity=3,
+            timestamp=datetime(2015, 2, 10, 12, 0, tzinfo=timezone.utc)
+        )
+        self.recent_log = baker.make(ActivityLog, log='Recent log')
+
+    def test_archive_logs(self):
+        archived = archive_logs(
+            timezone.now() - timedelta(days=365), batch_size=2
+        )
+        self.assertEqual(archived, 4)
+        self.assertEqual(list(ActivityLog.objects.all()), [self.recent_log])
+        self.assertEqual(archived_months(), ['2015-02', '2015-01'])
+
+        with gzip.open(archive_path('2015-01'), 'rt') as archive_file:
+            rows = [json.loads(line) for line in archive_file]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], self.jan_log.id)
+        self.assertEqual(rows[0]['log'], 'January log')
+        self.assertEqual(rows[0]['actor_username'], self.user.username)
+
+    def test_search_archive(self):
+        archive_logs(timezone.now() - timedelta(days=365))
+        results = search_archive('LOG')
+        self.assertEqual(len(results), 4)
+        # newest first
+        self.assertEqual(results[-1]['id'], self.jan_log.id)
+        self.assertEqual(results[-1]['timestamp'], self.jan_log.timestamp)
+
+        self.assertEqual(len(search_archive('january log')), 1)
+        self.assertEqual(len(search_archive('log', month='2015-02')), 3)
+        self.assertEqual(len(search_archive('log', limit=2)), 2)
+
+    def test_resume_interrupted_archive(self):
+        # a previous run archived January and was stopped before removing
+        # its pending file
+        path = archive_path('2015-01')
+        archive_logs(timezone.now() - timedelta(days=365))
+        size = os.path.getsize(path)
+        with open(os.path.join(self.root, PENDING_FILENAME), 'w') as pending:
+            json.dump({'ids': [self.jan_log.id], 'sizes': {path: 0}}, pending)
+
+        self.assertEqual(archive_logs(timezone.now() - timedelta(days=365)), 0)
+        self.assertEqual(list(ActivityLog.objects.all()), [self.recent_log])
+        # the rows were deleted, so the batch was archived in full
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, PENDING_FILENAME))
+        )
+
+    def test_interrupted_append_is_truncated(self):
+        early_log = baker.make(
+            ActivityLog, log='Early january log',
+            timestamp=datetime(2015, 1, 5, 12, 0, tzinfo=timezone.utc)
+        )
+        archive_logs(datetime(2015, 1, 8, tzinfo=timezone.utc))
+        path = archive_path('2015-01')
+        size = os.path.getsize(path)
+        # a run stopped part way through appending the next January batch
+        pending = {'ids': [self.jan_log.id], 'sizes': {path: size}}
+        with open(os.path.join(self.root, PENDING_FILENAME), 'w') as file:
+            json.dump(pending, file)
+        with open(path, 'ab') as archive_file:
+            archive_file.write(gzip.compress(b'{"id": 1}\n' * 100)[:20])
+        later_log = baker.make(
+            ActivityLog, log='Later january log',
+            timestamp=datetime(2015, 1, 20, 12, 0, tzinfo=timezone.utc)
+        )
+
+        self.assertEqual(archive_logs(timezone.now() - timedelta(days=365)), 5)
+        with gzip.open(path, 'rt') as archive_file:
+            ids = [json.loads(line)['id'] for line in archive_file]
+        self.assertEqual(ids, [early_log.id, self.jan_log.id, later_log.id])
+        self.assertEqual(len(search_archive('january')), 3)
+
+    def test_new_month_file_removed_after_interrupted_append(self):
+        archive_logs(timezone.now() - timedelta(days=365))
+        path = archive_path('2015-01')
+        os.remove(path)
+        self.jan_log.save()
+        with open(os.path.join(self.root, PENDING_FILENAME), 'w') as pending:
+            json.dump({'ids': [self.jan_log.id], 'sizes': {path: 0}}, pending)
+        with open(path, 'wb') as archive_file:
+            archive_file.write(gzip.compress(b'{"id": 1}\n')[:10])
+
+        archive_logs(timezone.now() - timedelta(days=365))
+        self.assertEqual(len(search_archive('january')), 1)
+
+    @override_settings(ACTIVITYLOG_ARCHIVE_ROOT=None)
+    def test_archive_root_required(self):
+        with self.assertRaises(ImproperlyConfigured):
+            archive_logs(timezone.now() - timedelta(days=365))
+        self.assertEqual(ActivityLog.objects.count(), 5)
+        self.assertEqual(archived_months(), [])
+
+    def test_rows_archived_twice_are_found_once(self):
+        archive_logs(timezone.now() - timedelta(days=365))
+        # archived again after an interruption before the delete was recorded
+        self.jan_log.save()
+        archive_logs(timezone.now() - timedelta(days=365))
+        self.assertEqual(len(search_archive('january')), 1)
+
+    def test_incomplete_archive_file_is_readable(self):
+        archive_logs(timezone.now() - timedelta(days=365))
+        with open(archive_path('2015-02'), 'ab') as archive_file:
+            archive_file.write(gzip.compress(b'{"id": 1}\n')[:10])
+        self.assertEqual(len(search_archive('february')), 3)
+
+    def test_archive_command(self):
+        out = StringIO()
+        management.call_command(
+            'archive_activity_log', '--days', '365', stdout=out
+        )
+        self.assertIn('4 activity logs older than', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 1)
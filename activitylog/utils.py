@@ -0,0 +1,87 @@
+import threading
+import time
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import models, transaction
+
+from activitylog.models import ActivityLog
+
+
+_local = threading.local()
+
+
+class ActivityLogBuffer(object):
+    """
+    Collects log entries and writes them with one bulk_create when flushed.
+    It flushes itself once it holds ACTIVITYLOG_BUFFER_SIZE entries, or when
+    an entry is added more than ACTIVITYLOG_BUFFER_MAX_AGE seconds after the
+    oldest unwritten one.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.started = None
+
+    def add(self, entry):
+        if not self.entries:
+            self.started = time.monotonic()
+        self.entries.append(entry)
+        if len(self.entries) >= settings.ACTIVITYLOG_BUFFER_SIZE or \
+                time.monotonic() - self.started >= \
+                settings.ACTIVITYLOG_BUFFER_MAX_AGE:
+            self.flush()
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        if entries:
+            ActivityLog.objects.bulk_create(entries)
+
+
+@contextmanager
+def activity_log_buffer():
+    """
+    Buffer the entries written by log_activity in this thread until the
+    block exits.  Nested blocks share the outermost buffer.  Entries logged
+    inside a transaction aren't buffered (see log_activity).
+    """
+    if getattr(_local, 'buffer', None) is not None:
+        yield _local.buffer
+        return
+    _local.buffer = ActivityLogBuffer()
+    try:
+        yield _local.buffer
+    finally:
+        buffer, _local.buffer = _local.buffer, None
+        buffer.flush()
+
+
+def log_activity(log, action='', actor=None, target=None):
+    """
+    Write an activity log entry.  `actor` is the user who made the change
+    (ignored if not an authenticated user).  `target` is the model instance
+    the entry is about, or a model class for entries about several objects.
+    Inside activity_log_buffer() the entry is returned unsaved and written
+    when the buffer is flushed, unless it's logged inside a transaction: it
+    is then written straight away, as part of the transaction, so it's
+    rolled back with the changes it describes.
+    """
+    target_model = target_id = ''
+    if target is not None:
+        target_model = target._meta.label_lower
+        if isinstance(target, models.Model):
+            target_id = str(target.pk)
+    entry = ActivityLog(
+        log=log,
+        action=action,
+        actor=actor if getattr(actor, 'is_authenticated', False) else None,
+        target_model=target_model,
+        target_id=target_id,
+    )
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None or transaction.get_connection().in_atomic_block:
+        entry.save()
+    else:
+        buffer.add(entry)
+    return entry
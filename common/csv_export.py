@@ -0,0 +1,46 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+# rows are fetched from the database this many at a time
+EXPORT_CHUNK_SIZE = 2000
+# spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo(object):
+    """
+    File-like object whose write() returns the value instead of storing it,
+    so csv.writer produces each row as a string
+    """
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(filename, header, rows):
+    """
+    Return a StreamingHttpResponse that downloads `rows` as a CSV file.
+    `rows` should be a generator (e.g. over queryset.iterator()) so the
+    response starts straight away and the rows aren't held in memory.
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_cell(value) for value in row])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = \
+        'attachment; filename="{}"'.format(filename)
+    return response
@@ -5,6 +5,7 @@ from django.template import Context
 from django.template.loader import get_template
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 def send_support_email(e, module_name="", extra_subject=""):
     try:
@@ -17,8 +18,9 @@ def send_support_email(e, module_name="", extra_subject=""):
             [settings.SUPPORT_EMAIL],
             fail_silently=True)
     except Exception as ex:
-        ActivityLog.objects.create(
-            log="Problem sending an email ({}: {})".format(
+        log_activity(
+            "Problem sending an email ({}: {})".format(
                 module_name, ex
-            )
+            ),
+            action=ActivityLog.EMAIL_ERROR
         )
@@ -0,0 +1,268 @@
+import base64
+import logging
+import multiprocessing
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.deconstruct import deconstructible
+
+from imagekit import ImageSpec
+from imagekit.cachefiles import ImageCacheFile
+from imagekit.processors import ResizeToFit
+from PIL import features
+from PIL import Image as PILImage
+
+
+logger = logging.getLogger(__name__)
+
+# widths of the responsive renditions of gallery and page pictures
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+# browsers without WebP support fall back to the JPEG renditions; WebP is
+# only used if Pillow was built with it
+RENDITION_FORMATS = ('WEBP', 'JPEG') if features.check('webp') \
+    else ('JPEG',)
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+# longest side of the inline placeholder shown while an image loads
+PLACEHOLDER_SIZE = 16
+
+
+class Deferred(object):
+    """
+    Cache file strategy that never generates a file during a request; the
+    generate_image_specs worker generates them after upload.  Accessing a
+    spec's url assumes the file exists.
+    """
+
+    def should_verify_existence(self, file):
+        return False
+
+
+class Processed(ImageSpec):
+    """
+    An upload re-encoded as the JPEG that is stored and shown
+    """
+
+    format = 'JPEG'
+    options = {'quality': 70}
+
+
+@deconstructible
+class ProcessedName(object):
+    """
+    upload_to for images the worker re-encodes: uploads are stored as they
+    are in `directory`, under the .jpg name they keep once processed, so
+    their url doesn't change
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, instance, filename):
+        return os.path.join(
+            self.directory, os.path.splitext(filename)[0] + '.jpg'
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, ProcessedName) and \
+            self.directory == other.directory
+
+
+class Rendition(ImageSpec):
+    """
+    The source image scaled down (never up) to `width`
+    """
+
+    options = {'quality': 70}
+
+    def __init__(self, source, width, format):
+        self.processors = [ResizeToFit(width=width, upscale=False)]
+        self.format = format
+        super(Rendition, self).__init__(source)
+
+
+def renditions(source, format):
+    """
+    Return (width, cache file) for each rendition of an image file in a
+    format
+    """
+    return [
+        (width, ImageCacheFile(Rendition(source, width, format)))
+        for width in RENDITION_WIDTHS
+    ]
+
+
+def srcset(file, format, source_width=None):
+    """
+    The srcset attribute value for the renditions of an image file in a
+    format.  Renditions aren't scaled up, so with the file's width the
+    larger ones (all the size of the file) are listed once, at its width.
+    """
+    candidates = []
+    for width, rendition in renditions(file, format):
+        if source_width and width >= source_width:
+            candidates.append('{} {}w'.format(rendition.url, source_width))
+            break
+        candidates.append('{} {}w'.format(rendition.url, width))
+    return ', '.join(candidates)
+
+
+def rendition_url(file, ready):
+    """
+    Url of the largest JPEG rendition of an image file, or of the original
+    file until the renditions have been generated (`ready` is the object's
+    specs_generated)
+    """
+    if not (ready and file):
+        return '{}{}'.format(settings.MEDIA_URL, file.name or '')
+    width, rendition = renditions(file, 'JPEG')[-1]
+    return rendition.url
+
+
+def image_metadata(file):
+    """
+    Return (width, height, placeholder) for an image file, where
+    placeholder is a data uri of a tiny JPEG of the image, shown blurred
+    while the image loads; (None, None, '') if it can't be read as an
+    image.  Stored on upload so pages don't open image files.
+    """
+    file.seek(0)
+    try:
+        image = PILImage.open(file)
+        width, height = image.size
+        # JPEGs are decoded at a fraction of their size
+        image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        image = image.convert('RGB')
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        content = BytesIO()
+        image.save(content, 'JPEG', quality=50)
+    except Exception:
+        return None, None, ''
+    finally:
+        file.seek(0)
+    return width, height, 'data:image/jpeg;base64,{}'.format(
+        base64.b64encode(content.getvalue()).decode('ascii')
+    )
+
+
+def process_upload(source):
+    """
+    Re-encode an uploaded image file in place
+    """
+    content = Processed(source).generate().read()
+    source.close()
+    with source.storage.open(source.name, 'wb') as file:
+        file.write(content)
+
+
+def spec_files(instance):
+    """
+    All the cache files for a model instance: its ImageSpecFields
+    (`spec_fields`) and the renditions of its `spec_source` image field
+    """
+    files = [getattr(instance, name) for name in instance.spec_fields]
+    source = getattr(instance, instance.spec_source)
+    for format in RENDITION_FORMATS:
+        files.extend(file for width, file in renditions(source, format))
+    return files
+
+
+def delete_spec_files(instance):
+    """
+    Delete the cache files of a model instance, e.g. with the last
+    reference to its source file
+    """
+    if not getattr(instance, instance.spec_source):
+        return
+    for file in spec_files(instance):
+        if file.storage.exists(file.name):
+            file.storage.delete(file.name)
+
+
+def generate_specs(instance):
+    """
+    Generate any missing cache files for a model instance
+    """
+    for file in spec_files(instance):
+        file.generate()
+
+
+def _storage(model):
+    return model._meta.get_field(model.spec_source).storage
+
+
+def _generate(item):
+    """
+    Re-encode an image file if it's a new upload and generate its cache
+    files; returns the item with whether processing succeeded
+    """
+    model, source_name, new_upload = item
+    try:
+        instance = model(**{model.spec_source: source_name})
+        if new_upload:
+            process_upload(getattr(instance, model.spec_source))
+        generate_specs(instance)
+    except Exception:
+        logger.exception(
+            'Error processing %s image %s', model._meta.label, source_name
+        )
+        return item + (False,)
+    return item + (True,)
+
+
+def _save_result(model, source_name, new_upload, processed):
+    # every object using the file (gallery images can share one)
+    with transaction.atomic():
+        instances = list(model.objects.select_for_update().filter(
+            **{model.spec_source: source_name}
+        ))
+        if not instances:
+            # replaced or deleted while it was processed, and stored again
+            # by re-encoding it
+            if new_upload:
+                _storage(model).delete(source_name)
+            return 0
+        # saved rather than updated so the public page caches are evicted
+        for instance in instances:
+            if processed:
+                instance.specs_generated = True
+                instance.processing_failed = False
+            else:
+                instance.processing_failed = True
+            instance.save()
+        return len(instances) if processed else 0
+
+
+def generate_image_specs(queryset, processes=1):
+    """
+    Process a queryset of Image or Picture objects across `processes`
+    worker processes: re-encode new uploads, generate the missing cache
+    files and mark them as generated (or failed).  Objects whose image is
+    replaced while this runs are left for the next run.  Returns the
+    number of objects generated.
+    """
+    model = queryset.model
+    # each file once, however many objects use it
+    source_names = queryset.order_by().values_list(
+        model.spec_source, flat=True
+    ).distinct()
+    # files are new uploads until an object using them has been generated
+    processed = set(model.objects.filter(
+        specs_generated=True,
+        **{'{}__in'.format(model.spec_source): source_names}
+    ).values_list(model.spec_source, flat=True))
+    pending = [
+        (model, source_name, source_name not in processed)
+        for source_name in source_names
+    ]
+    if processes > 1 and len(pending) > 1:
+        # the forked workers mustn't share the parent's db connection; they
+        # only need the image files
+        connections.close_all()
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_generate, pending, chunksize=1)
+    else:
+        results = [_generate(item) for item in pending]
+
+    return sum(_save_result(*result) for result in results)
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    """
+    Encode a position as '<value>-<pk>'; datetimes are encoded as integer
+    microseconds since the epoch so the cursor is exact and URL-safe
+    """
+    if isinstance(value, datetime):
+        delta = value - EPOCH
+        value = (delta.days * 86400 + delta.seconds) * 10 ** 6 + \
+            delta.microseconds
+    return '{}-{}'.format(value, pk)
+
+
+def decode_cursor(cursor, is_datetime):
+    try:
+        value, pk = cursor.rsplit('-', 1)
+        value, pk = int(value), int(pk)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(cursor)
+    if is_datetime:
+        try:
+            value = EPOCH + timedelta(microseconds=value)
+        except OverflowError:
+            raise InvalidCursor(cursor)
+    return value, pk
+
+
+class KeysetPage(object):
+
+    def __init__(self, object_list, newer_cursor=None, older_cursor=None):
+        self.object_list = object_list
+        self.newer_cursor = newer_cursor
+        self.older_cursor = older_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_newer(self):
+        return self.newer_cursor is not None
+
+    @property
+    def has_older(self):
+        return self.older_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_newer or self.has_older
+
+
+class KeysetPaginator(object):
+    """
+    Seek pagination over a queryset, newest first by (field, pk).  Pages are
+    fetched with a WHERE on the last seen (field, pk) instead of an OFFSET,
+    so a page deep in the results costs the same as the first, given an
+    index on (field, id).
+    """
+
+    def __init__(self, queryset, field, per_page):
+        self.queryset = queryset
+        self.field = field
+        self.per_page = per_page
+        self.is_datetime = queryset.model._meta.get_field(
+            field
+        ).get_internal_type() == 'DateTimeField'
+
+    def cursor(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def _seek(self, cursor, lookup):
+        value, pk = decode_cursor(cursor, self.is_datetime)
+        return self.queryset.filter(
+            Q(**{'{}__{}'.format(self.field, lookup): value}) |
+            Q(**{self.field: value, 'pk__{}'.format(lookup): pk})
+        )
+
+    def page(self, older_than=None, newer_than=None):
+        """
+        Return the page of objects older than the cursor `older_than`, or
+        newer than the cursor `newer_than`, or the newest page.  Raises
+        InvalidCursor for a malformed cursor.
+        """
+        if newer_than:
+            objects = list(
+                self._seek(newer_than, 'gt')
+                .order_by(self.field, 'pk')[:self.per_page + 1]
+            )
+            has_newer = len(objects) > self.per_page
+            objects = objects[:self.per_page][::-1]
+            has_older = True
+        else:
+            queryset = self._seek(older_than, 'lt') if older_than \
+                else self.queryset
+            objects = list(
+                queryset.order_by(
+                    '-{}'.format(self.field), '-pk'
+                )[:self.per_page + 1]
+            )
+            has_older = len(objects) > self.per_page
+            objects = objects[:self.per_page]
+            has_newer = bool(older_than)
+
+        if not objects:
+            return KeysetPage([])
+        return KeysetPage(
+            objects,
+            newer_cursor=self.cursor(objects[0]) if has_newer else None,
+            older_cursor=self.cursor(objects[-1]) if has_older else None,
+        )
+
+
+def approximate_count(queryset, exact_up_to=1000):
+    """
+    Count a queryset without scanning all of it.  Returns (count, exact):
+    counts up to `exact_up_to` are exact; beyond that the count is the query
+    planner's estimate on PostgreSQL, or None on other databases.
+    """
+    queryset = queryset.order_by()
+    count = queryset[:exact_up_to + 1].count()
+    if count <= exact_up_to:
+        return count, True
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None, False
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+        plan = cursor.fetchone()[0]
+    return max(int(plan[0]['Plan']['Plan Rows']), exact_up_to + 1), False
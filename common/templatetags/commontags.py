@@ -3,7 +3,10 @@ import pytz
 from django import template
 from django.conf import settings
 from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
+from common.imagespecs import MIME_TYPES, RENDITION_FORMATS, \
+    rendition_url, srcset
 from website.models import RestrictedAccessTracker
 
 register = template.Library()
@@ -38,14 +41,64 @@ def can_view_restricted(user):
     return user.has_perm('website.can_view_restricted')
 
 
+@register.filter
+def time_since(start_date):
+    if not start_date:
+        return ''
+    time_since = timezone.now() - start_date
+    return '{} days, {}h:{}m:{}s'.format(
+        time_since.days, time_since.seconds//3600,
+        (time_since.seconds//60) % 60, time_since.seconds % 60
+    )
+
+
 @register.filter
 def time_since_access(user):
     try:
         tracker = RestrictedAccessTracker.objects.get(user=user)
-        time_since = timezone.now() - tracker.start_date
-        return '{} days, {}h:{}m:{}s'.format(
-            time_since.days, time_since.seconds//3600,
-            (time_since.seconds//60) % 60, time_since.seconds % 60
-        )
+        return time_since(tracker.start_date)
     except RestrictedAccessTracker.DoesNotExist:
         return ''
+
+
+@register.simple_tag
+def responsive_image(obj, sizes='100vw', alt='', css_class=''):
+    """
+    A <picture> with srcsets of the WebP and JPEG renditions of a gallery
+    Image's or page Picture's image, so browsers download the smallest one
+    for the displayed size.  Until the renditions have been generated, a
+    plain <img> of the original file.  The image's stored dimensions and
+    placeholder reserve its space and fill it while it loads, without
+    opening the file.
+    """
+    file = getattr(obj, obj.spec_source)
+    ready = obj.specs_generated
+    attrs = format_html(
+        'class="{}" src="{}" alt="{}"',
+        css_class, rendition_url(file, ready), alt
+    )
+    if obj.width and obj.height:
+        attrs = format_html(
+            '{} width="{}" height="{}"', attrs, obj.width, obj.height
+        )
+    if obj.placeholder:
+        attrs = format_html(
+            '{} style="background: url({}) center / cover no-repeat"',
+            attrs, obj.placeholder
+        )
+    if not (ready and file):
+        return format_html('<img {}>', attrs)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[format], srcset(file, format, obj.width), sizes)
+            for format in RENDITION_FORMATS if format != 'JPEG'
+        )
+    )
+    return format_html(
+        '<picture>{}<img {} srcset="{}" sizes="{}"></picture>',
+        sources, attrs, srcset(file, 'JPEG', obj.width), sizes
+    )
+
+
+register.simple_tag(rendition_url)
@@ -73,6 +73,7 @@ INSTALLED_APPS = (
     'timetable',
     'studioadmin',
     'activitylog',
+    'mailqueue',
     'website',
     'gallery',
     'reviews',
@@ -90,6 +91,7 @@ MIDDLEWARE = (
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'activitylog.middleware.ActivityLogBufferMiddleware',
 )
 
 AUTHENTICATION_BACKENDS = (
@@ -116,6 +118,7 @@ ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 ACCOUNT_EMAIL_SUBJECT_PREFIX = "[flexibeast]"
 ACCOUNT_PASSWORD_MIN_LENGTH = 6
 ACCOUNT_SIGNUP_FORM_CLASS = 'accounts.forms.SignupForm'
+ACCOUNT_ADAPTER = 'accounts.adapter.AccountAdapter'
 
 SOCIALACCOUNT_QUERY_EMAIL = True
 
@@ -131,9 +134,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.messages.context_processors.messages",
                 "django.template.context_processors.media",
-                "website.context_processors.website_pages",
-                "website.context_processors.more_menu_options",
-                "website.context_processors.menu_options",
+                "website.context_processors.navigation",
                 "website.context_processors.reviews_pending",
                 "website.context_processors.out_of_office"
             ),
@@ -186,10 +187,28 @@ STATIC_ROOT = root('collected-static')
 if HEROKU:  # pragma: no cover
     STATIC_ROOT = 'staticfiles'
 
+# Static html export of the public pages (see export_static_site command)
+STATIC_SITE_ROOT = root('static-site')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = root('media')
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Gallery thumbnails and the responsive renditions of gallery and page
+# pictures are generated after upload by the generate_image_specs worker,
+# never while serving a request
+IMAGEKIT_DEFAULT_CACHEFILE_STRATEGY = 'common.imagespecs.Deferred'
+
+# Emails are queued and sent by the send_queued_mail command, using the
+# MAILQUEUE_DELIVERY_BACKEND
+EMAIL_BACKEND = 'mailqueue.backends.QueuedEmailBackend'
+MAILQUEUE_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+MAILQUEUE_MAX_ATTEMPTS = 5
+# seconds before the first retry; doubled after each failed attempt
+MAILQUEUE_RETRY_DELAY = 60
+# Bulk emails to students are sent in batches over one connection, limited
+# to BULK_EMAIL_RATE messages per second (0 for no limit)
+BULK_EMAIL_BATCH_SIZE = 50
+BULK_EMAIL_RATE = 5
 EMAIL_USE_TLS = True
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_HOST_USER = 'flexibeast.web@gmail.com'
@@ -201,10 +220,40 @@ DEFAULT_FROM_EMAIL = 'flexibeast.web@gmail.com'
 DEFAULT_STUDIO_EMAIL = env('DEFAULT_STUDIO_EMAIL')
 SUPPORT_EMAIL = 'rebkwok@gmail.com'
 
+# Activity log entries made during a request or a worker run are written
+# together; the buffer is also flushed once it holds ACTIVITYLOG_BUFFER_SIZE
+# entries or its oldest entry is ACTIVITYLOG_BUFFER_MAX_AGE seconds old
+ACTIVITYLOG_BUFFER_SIZE = 100
+ACTIVITYLOG_BUFFER_MAX_AGE = 10
+# the archive_activity_log command moves logs older than this to compressed
+# monthly files, which can still be searched from studioadmin.  The archive
+# directory must be on persistent storage, so on Heroku (whose filesystem is
+# wiped) it has no default and nothing is archived until it's set
+ACTIVITYLOG_RETENTION_DAYS = 365
+ACTIVITYLOG_ARCHIVE_ROOT = env(
+    'ACTIVITYLOG_ARCHIVE_ROOT',
+    default=None if HEROKU else root('activitylog-archive')
+)
+
 
 import sys
 TESTING = 'test' in sys.argv
 
+# CACHE
+# Use a shared cache (e.g. memcached) in production so cached navigation and
+# public responses are shared between workers and invalidated for all of them
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Full-page cache for anonymous requests to the public views
+PUBLIC_RESPONSE_CACHE_ENABLED = not TESTING
+PUBLIC_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+if TESTING:
+    # queued emails are delivered to django.core.mail.outbox
+    MAILQUEUE_DELIVERY_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    BULK_EMAIL_RATE = 0
+
 
 # #####LOGGING######
 if not HEROKU and not TRAVIS and not TESTING:
@@ -337,7 +386,7 @@ CKEDITOR_JQUERY_URL = \
 
 # MAILCATCHER
 if env('USE_MAILCATCHER'):  # pragma: no cover
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    MAILQUEUE_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
     EMAIL_HOST = '127.0.0.1'
     EMAIL_HOST_USER = ''
     EMAIL_HOST_PASSWORD = ''
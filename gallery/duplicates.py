@@ -0,0 +1,115 @@
+import hashlib
+
+from PIL import Image as PILImage
+
+
+# images whose perceptual hashes differ in at most this many bits are
+# treated as the same photo (e.g. re-encoded or resized copies)
+NEAR_DUPLICATE_DISTANCE = 6
+
+
+def content_hash(file):
+    """
+    SHA-256 of a file's contents
+    """
+    sha = hashlib.sha256()
+    for chunk in file.chunks():
+        sha.update(chunk)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def perceptual_hash(file):
+    """
+    64 bit difference hash (as hex) of an image file: one bit per pixel of
+    a 9x8 greyscale thumbnail, set if the pixel is brighter than its right
+    neighbour.  Similar images have hashes that differ in only a few bits.
+    Returns '' if the file can't be read as an image.
+    """
+    file.seek(0)
+    try:
+        image = PILImage.open(file)
+        # JPEGs are decoded at a fraction of their size
+        image.draft('L', (36, 32))
+        pixels = list(
+            image.convert('L').resize((9, 8), PILImage.LANCZOS).getdata()
+        )
+    except Exception:
+        return ''
+    finally:
+        file.seek(0)
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = bits << 1 | (left > right)
+    return '{:016x}'.format(bits)
+
+
+def hash_distance(hash1, hash2):
+    return bin(int(hash1, 16) ^ int(hash2, 16)).count('1')
+
+
+def find_duplicate(image):
+    """
+    Return (another image with the same or a similar photo, whether it's an
+    exact copy), or (None, False).  Images already sharing this image's
+    file aren't counted.
+    """
+    others = type(image).objects.exclude(pk=image.pk).exclude(
+        photo=image.photo.name
+    ).select_related('category')
+    if image.content_hash:
+        exact = others.filter(content_hash=image.content_hash).first()
+        if exact is not None:
+            return exact, True
+    if image.perceptual_hash:
+        near = near_duplicates([image], others)
+        if image.pk in near:
+            return near[image.pk], False
+    return None, False
+
+
+def near_duplicates(images, others):
+    """
+    Return {image pk: similar image} for the images (Image objects with
+    perceptual hashes) that look like one of the `others` queryset, which
+    is scanned once.  Hamming distance can't be served by an index, so this
+    reads every hash; fine for a gallery's few thousand images.
+    """
+    hashed = [image for image in images if image.perceptual_hash]
+    matches = {}
+    if not hashed:
+        return matches
+    candidates = others.exclude(perceptual_hash='').values_list(
+        'pk', 'photo', 'perceptual_hash'
+    )
+    for pk, photo, phash in candidates.iterator():
+        for image in hashed:
+            if image.pk in matches or pk == image.pk or \
+                    photo == image.photo.name:
+                continue
+            if hash_distance(image.perceptual_hash, phash) <= \
+                    NEAR_DUPLICATE_DISTANCE:
+                matches[image.pk] = pk
+    found = others.model.objects.select_related('category').in_bulk(
+        matches.values()
+    )
+    return {pk: found[other_pk] for pk, other_pk in matches.items()}
+
+
+def reuse_photo(image, original):
+    """
+    Point `image` at the stored file of `original`; its own copy is deleted
+    if nothing else uses it
+    """
+    image.photo = original.photo.name
+    image.content_hash = original.content_hash
+    image.perceptual_hash = original.perceptual_hash
+    image.width = original.width
+    image.height = original.height
+    image.placeholder = original.placeholder
+    image.specs_generated = original.specs_generated
+    image.processing_failed = original.processing_failed
+    image.save()
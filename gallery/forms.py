@@ -98,3 +98,9 @@ class CategoryForm(forms.ModelForm):
         model = Category
         fields = ('name', 'description')
 
+
+class ZipImportForm(forms.Form):
+    zip_file = forms.FileField(
+        label='Add pictures from a ZIP file',
+        widget=forms.FileInput(attrs={'accept': '.zip'})
+    )
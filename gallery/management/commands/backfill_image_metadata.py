@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from common.imagespecs import image_metadata
+from gallery.duplicates import content_hash, perceptual_hash
+from gallery.models import Image
+from website.models import Picture
+
+
+class Command(BaseCommand):
+    help = 'Fill in what is recorded on upload for gallery images and page ' \
+           'pictures uploaded before it was: the hashes new uploads are ' \
+           'matched against, and the dimensions and placeholders the ' \
+           'templates show.'
+
+    def handle(self, *args, **options):
+        self.backfill(Image, Q(content_hash='') | Q(width__isnull=True))
+        self.backfill(Picture, Q(width__isnull=True))
+
+    def metadata(self, model, file):
+        width, height, placeholder = image_metadata(file)
+        fields = {
+            'width': width, 'height': height, 'placeholder': placeholder
+        }
+        if model == Image:
+            fields['content_hash'] = content_hash(file)
+            fields['perceptual_hash'] = perceptual_hash(file)
+        return fields
+
+    def backfill(self, model, missing):
+        source = model.spec_source
+        objects = model.objects.filter(missing).exclude(
+            **{source: ''}
+        ).exclude(**{'{}__isnull'.format(source): True})
+        updated = 0
+        for obj in objects.iterator():
+            file = getattr(obj, source)
+            try:
+                with file.open('rb'):
+                    fields = self.metadata(model, file)
+            except OSError as e:
+                self.stderr.write('Could not read {}: {}'.format(file.name, e))
+                continue
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            # saved so the cached pages showing the image are evicted
+            obj.save(update_fields=list(fields))
+            updated += 1
+        self.stdout.write(
+            'Metadata recorded for {} {}'.format(
+                updated, model._meta.verbose_name_plural
+            )
+        )
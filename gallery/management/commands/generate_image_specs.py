@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.imagespecs import generate_image_specs
+from gallery.models import Image
+from website.models import Picture
+
+
+class Command(BaseCommand):
+    help = 'Re-encode newly uploaded gallery images and page pictures and ' \
+           'generate their thumbnails and responsive renditions.  Run it ' \
+           'with --loop as a worker process, or with --all to generate any ' \
+           'missing files for every image and retry failed ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Check every image, generate any missing files and retry '
+                 'images that failed'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Number of images to process in parallel (default: the '
+                 'number of CPUs)'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new images instead of exiting'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Seconds to wait between polls with --loop'
+        )
+
+    def handle(self, *args, **options):
+        check_all = options['all']
+        while True:
+            for model in (Image, Picture):
+                queryset = model.objects.exclude(
+                    **{model.spec_source: ''}
+                ).exclude(**{'{}__isnull'.format(model.spec_source): True})
+                if not check_all:
+                    queryset = queryset.filter(
+                        specs_generated=False, processing_failed=False
+                    )
+                generated = generate_image_specs(
+                    queryset, processes=options['processes']
+                )
+                if generated:
+                    self.stdout.write(
+                        'Images generated for {} {}'.format(
+                            generated, model._meta.verbose_name_plural
+                        )
+                    )
+            if not options['loop']:
+                break
+            check_all = False
+            time.sleep(options['sleep'])
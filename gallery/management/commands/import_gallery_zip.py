@@ -0,0 +1,39 @@
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gallery.models import Category
+from gallery.zip_import import import_zip
+
+
+class Command(BaseCommand):
+    help = 'Add the pictures in a ZIP file to a gallery category.  The ' \
+           'imageworker process generates their thumbnails as usual.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category', help='Slug of the category')
+        parser.add_argument('zip_file', help='Path to the ZIP file')
+
+    def handle(self, *args, **options):
+        try:
+            category = Category.objects.get(slug=options['category'])
+        except Category.DoesNotExist:
+            raise CommandError(
+                'No category with slug {}'.format(options['category'])
+            )
+        try:
+            result = import_zip(category, options['zip_file'])
+        except (OSError, zipfile.BadZipFile) as e:
+            raise CommandError(
+                'Could not read {}: {}'.format(options['zip_file'], e)
+            )
+
+        for name, error in result.errors:
+            self.stderr.write('{}: {}'.format(name, error))
+        self.stdout.write(
+            '{} picture(s) added to {} ({} already stored), {} '
+            'error(s)'.format(
+                len(result.added), category.name, len(result.reused),
+                len(result.errors)
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0008_auto_20261018_1243'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='specs_generated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
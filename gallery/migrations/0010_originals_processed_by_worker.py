@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0009_image_specs_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='processing_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='gallery/originals'),
+        ),
+    ]
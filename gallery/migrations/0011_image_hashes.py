@@ -0,0 +1,35 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0010_originals_processed_by_worker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['content_hash'], name='image_content_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['perceptual_hash'], name='image_perceptual_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['photo'], name='image_photo_idx'),
+        ),
+    ]
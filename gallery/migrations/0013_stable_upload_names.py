@@ -0,0 +1,19 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:41
+
+import common.imagespecs
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0012_image_dimensions_placeholder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to=common.imagespecs.ProcessedName('gallery')),
+        ),
+    ]
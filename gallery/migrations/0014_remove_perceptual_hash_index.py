@@ -0,0 +1,17 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0013_stable_upload_names'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='image',
+            name='image_perceptual_hash_idx',
+        ),
+    ]
@@ -1,17 +1,22 @@
 from django.db import models
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
 from django_extensions.db.fields import AutoSlugField
 
-from imagekit.models import ImageSpecField, ProcessedImageField
+from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
+from common.imagespecs import ProcessedName, delete_spec_files, \
+    image_metadata
+from gallery.duplicates import content_hash, perceptual_hash
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     slug = AutoSlugField(populate_from='name', max_length=40, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -21,12 +26,25 @@ class Category(models.Model):
 
 
 class Image(models.Model):
-
-    photo = ProcessedImageField(
-        upload_to='gallery',
-        format='JPEG',
-        options={'quality': 70},
-        null=True, blank=True,
+    """
+    Uploaded photos are stored as they are, under the name they keep; the
+    generate_image_specs worker re-encodes them in place, generates the
+    thumbnail and responsive renditions and sets specs_generated (or
+    processing_failed), which are reset when a new photo is uploaded.
+
+    Uploads are hashed so duplicates can share one stored file (see
+    gallery.duplicates); a file is only deleted with the last image using
+    it, along with its thumbnail and renditions.  The photo's dimensions and placeholder are also stored on upload,
+    for the templates.
+    """
+
+    # the ImageSpecFields and the renditions source used by
+    # common.imagespecs
+    spec_fields = ('thumbnail',)
+    spec_source = 'photo'
+
+    photo = models.ImageField(
+        upload_to=ProcessedName('gallery'), null=True, blank=True
     )
 
     thumbnail = ImageSpecField(source='photo',
@@ -38,25 +56,74 @@ class Image(models.Model):
         Category, related_name='images', on_delete=models.CASCADE
     )
     caption = models.CharField(max_length=255, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    specs_generated = models.BooleanField(default=False)
+    processing_failed = models.BooleanField(default=False)
+    # SHA-256 of the uploaded file, and its 64 bit difference hash
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    perceptual_hash = models.CharField(max_length=16, blank=True, default='')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # data uri of a tiny version of the photo
+    placeholder = models.TextField(blank=True, default='')
 
     class Meta:
         ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=['content_hash'], name='image_content_hash_idx'
+            ),
+            # photo reference counts
+            models.Index(fields=['photo'], name='image_photo_idx'),
+        ]
 
     def __str__(self):
         return "Photo id: " + str(self.id)
 
+    @property
+    def processing_status(self):
+        if self.specs_generated:
+            return 'ready'
+        return 'failed' if self.processing_failed else 'processing'
+
+    @staticmethod
+    def photo_references(name):
+        """
+        Number of images using the stored file `name`
+        """
+        return Image.objects.filter(photo=name).count()
+
     def save(self, *args, **kwargs):
-        # delete old image file when replacing by updating the file
+        # a new upload, rather than the worker's processed photo or another
+        # image's file (which are already stored)
+        new_upload = bool(self.photo) and not self.photo._committed
+        if new_upload:
+            self.content_hash = content_hash(self.photo)
+            self.perceptual_hash = perceptual_hash(self.photo)
+            self.width, self.height, self.placeholder = \
+                image_metadata(self.photo)
         try:
             this = Image.objects.get(id=self.id)
-            if this.photo != self.photo:
-                this.photo.delete(save=False)
         except Image.DoesNotExist:
-            pass  # when new photo then we do nothing, normal case
+            this = None  # when new photo then we do nothing, normal case
+        replaced = this is not None and this.photo != self.photo
+        if replaced and new_upload:
+            self.specs_generated = False
+            self.processing_failed = False
         super(Image, self).save(*args, **kwargs)
+        # delete old image file when replacing by updating the file; after
+        # the save, so the new upload doesn't take the old file's name (and
+        # its cached renditions)
+        if replaced and Image.photo_references(this.photo.name) == 0:
+            delete_spec_files(this)
+            this.photo.delete(save=False)
 
 
-@receiver(pre_delete)
+@receiver(post_delete)
 def delete_image(sender, instance, **kwargs):
-    if sender == Image:
-        instance.photo.delete()
+    # shared files are kept until their last image is deleted; after the
+    # delete so images deleted together (with their category) are counted
+    if sender == Image and \
+            Image.photo_references(instance.photo.name) == 0:
+        delete_spec_files(instance)
+        instance.photo.delete(save=False)
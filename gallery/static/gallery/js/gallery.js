@@ -52,22 +52,30 @@ $(document).ready(function(){
             disableButtons(counter, $sel.data('image-id'));
         }
 
-        if(setIDs == true){
+        function setImageIds() {
+            counter = 0;
             $('[data-image-id]').each(function(){
                 counter++;
                 $(this).attr('data-image-id',counter);
             });
         }
-        $(setClickAttr).on('click',function(){
+
+        if(setIDs == true){
+            setImageIds();
+            // images loaded by gallery_scroll.js as the visitor scrolls
+            $(document).on('gallery:images-added', setImageIds);
+        }
+        $(document).on('click', setClickAttr, function(){
             updateGallery($(this));
         });
     }
 
-    jQuery(function($) {
-        $('img').one('load', function () {
+    function checkPortrait($images) {
+        $images.one('load', function () {
             var $img = $(this);
             var tempImage1 = new Image();
-            tempImage1.src = $img.attr('src');
+            // the srcset rendition the browser chose, if any
+            tempImage1.src = this.currentSrc || $img.attr('src');
             tempImage1.onload = function() {
                 var ratio = tempImage1.width / tempImage1.height;
                 if(!isNaN(ratio) && ratio < 1) $img.addClass('portrait');
@@ -75,6 +83,13 @@ $(document).ready(function(){
         }).each(function () {
             if (this.complete) $(this).load();
         });
+    }
+
+    jQuery(function($) {
+        checkPortrait($('img'));
+        $(document).on('gallery:images-added', function(event, $items) {
+            checkPortrait($items.find('img'));
+        });
     });
 
     //http://tablesorter.com/docs/
@@ -0,0 +1,140 @@
+// Infinite scroll for the gallery pages: the first page of images is
+// rendered with the page, and the rest are loaded from the gallery images
+// api (data-next-url) as the visitor scrolls to the bottom.
+$(document).ready(function(){
+    var $container = $('[data-next-url]').first();
+    if (!$container.length) {
+        return;
+    }
+    var nextUrl = $container.data('next-url'),
+        layout = $container.data('layout'),
+        sizes = $container.data('sizes'),
+        request = null;
+
+    function responsiveImage(image, cssClass) {
+        var $img = $('<img>').attr({
+            'class': cssClass || '',
+            src: image.large_url,
+            alt: image.photo_url
+        });
+        // the stored dimensions and placeholder, as in the page templates
+        if (image.width && image.height) {
+            $img.attr({width: image.width, height: image.height});
+        }
+        if (image.placeholder) {
+            $img.attr(
+                'style',
+                'background: url(' + image.placeholder + ') center / cover no-repeat'
+            );
+        }
+        if ($.isEmptyObject(image.srcset)) {
+            return $img;
+        }
+        var $picture = $('<picture>');
+        $.each(image.srcset, function(type, srcset) {
+            if (type !== 'image/jpeg') {
+                $picture.append(
+                    $('<source>').attr({type: type, srcset: srcset, sizes: sizes})
+                );
+            }
+        });
+        $img.attr({srcset: image.srcset['image/jpeg'], sizes: sizes});
+        return $picture.append($img);
+    }
+
+    function lightboxLink(image) {
+        return $('<a href="#" data-image-id="" data-toggle="modal" data-target="#image-gallery">')
+            .addClass('gallery-thumbnail')
+            .attr({
+                'data-title': image.category,
+                'data-caption': image.caption,
+                'data-image': image.large_url
+            });
+    }
+
+    // the same markup as the items rendered in the page templates
+    function renderImage(image) {
+        if (layout === 'isotope') {
+            var $inner = $('<div class="flexibeast-gallery-inner">')
+                .append($('<h3>').text(image.category));
+            if (image.caption) {
+                $inner.append($('<p>').text(image.caption));
+            }
+            $inner.append(
+                lightboxLink(image).addClass('preview')
+                    .append('<i class="fa fa-eye"></i> View')
+            );
+            return $('<div class="gallery-item col-xs-4 col-sm-3 col-md-2">')
+                .addClass('category' + image.category_id)
+                .append(
+                    $('<div class="flexibeast-gallery-wrap">')
+                        .append(responsiveImage(image, 'img-responsive'))
+                        .append($('<div class="overlay">').append($inner))
+                );
+        }
+        return $('<div class="col-lg-3 col-md-4 col-xs-6">').append(
+            lightboxLink(image).append(
+                $('<div class="thumbnail-container">').append(responsiveImage(image))
+            )
+        );
+    }
+
+    function addImages(images) {
+        var $items = $($.map(images, function(image) {
+            return renderImage(image).get(0);
+        }));
+        if (layout === 'isotope' && $container.data('isotope')) {
+            $container.append($items).isotope('appended', $items);
+        } else {
+            $container.append($items);
+        }
+        $(document).trigger('gallery:images-added', [$items]);
+    }
+
+    function loadMore() {
+        if (!nextUrl || request) {
+            return;
+        }
+        var thisRequest = request = $.getJSON(nextUrl);
+        thisRequest.done(function(data) {
+            nextUrl = data.next;
+            addImages(data.images);
+        }).always(function() {
+            // a request aborted by a filter change has been replaced
+            if (request === thisRequest) {
+                request = null;
+                fillWindow();
+            }
+        });
+    }
+
+    // keep loading until the page can scroll, and then as the visitor nears
+    // the bottom
+    function fillWindow() {
+        if ($(window).scrollTop() + $(window).height() >
+                $(document).height() - 600) {
+            loadMore();
+        }
+    }
+    $(window).on('scroll resize', fillWindow);
+    fillWindow();
+
+    // the category filters on the main gallery page show that category's
+    // images, loaded from its own api url
+    $('.gallery-filter > li > a[data-api-url]').on('click', function() {
+        var previous = request;
+        request = null;
+        if (previous) {
+            previous.abort();
+        }
+        var $items = $container.find('.gallery-item');
+        if ($container.data('isotope')) {
+            $container.isotope('remove', $items);
+        } else {
+            $items.remove();
+        }
+        nextUrl = $(this).data('api-url');
+        loadMore();
+        return false;
+    });
+});
@@ -1,20 +1,33 @@
 import os
+import shutil
+import zipfile
 
 from model_bakery import baker
+from PIL import Image as PILImage
 
-from tempfile import NamedTemporaryFile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from tempfile import NamedTemporaryFile, mkdtemp
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import Client, RequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.template import Context, Template
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.utils.html import strip_tags
 
+from common.imagespecs import RENDITION_WIDTHS, generate_specs, \
+    process_upload, renditions, spec_files
 from gallery.models import Category, Image
 from gallery.tests.helpers import set_up_fb, _create_session
-from gallery.views import CategoryListView, CategoryUpdateView, view_gallery
+from gallery.views import GALLERY_PAGE_SIZE, CategoryListView, \
+    CategoryUpdateView, view_gallery
+from gallery.duplicates import hash_distance
+from gallery.zip_import import import_zip
 
 
 def create_image(photo, category):
@@ -298,6 +311,133 @@ class CategoryDetailViewTests(TestCase):
         os.unlink(file.name)
 
 
+
+@override_settings(MEDIA_ROOT='/tmp/')
+class GalleryImagesApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = baker.make(Category, name='Api cat')
+        cls.other_category = baker.make(Category, name='Other cat')
+        cls.images = baker.make(
+            Image, category=cls.category, photo='gallery/test.jpg',
+            caption='a caption', _quantity=GALLERY_PAGE_SIZE + 2
+        )
+        cls.other_image = baker.make(
+            Image, category=cls.other_category, photo='gallery/other.jpg'
+        )
+
+    def test_first_page(self):
+        resp = self.client.get(reverse('gallery:images_api'))
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(len(data['images']), GALLERY_PAGE_SIZE)
+        # newest first
+        self.assertEqual(data['images'][0]['id'], self.other_image.id)
+        self.assertEqual(
+            data['images'][1],
+            {
+                'id': self.images[-1].id,
+                'category_id': self.category.id,
+                'category': 'Api cat',
+                'caption': 'a caption',
+                'photo_url': settings.MEDIA_URL + 'gallery/test.jpg',
+                'thumbnail_url': settings.MEDIA_URL + 'gallery/test.jpg',
+                'large_url': settings.MEDIA_URL + 'gallery/test.jpg',
+                'srcset': {},
+                'width': None,
+                'height': None,
+                'placeholder': '',
+            }
+        )
+        self.assertTrue(
+            data['next'].startswith(reverse('gallery:images_api') + '?older=')
+        )
+
+    def test_follow_next_page(self):
+        data = self.client.get(reverse('gallery:images_api')).json()
+        next_data = self.client.get(data['next']).json()
+        self.assertEqual(len(next_data['images']), 3)
+        self.assertIsNone(next_data['next'])
+        ids = [image['id'] for image in data['images'] + next_data['images']]
+        self.assertEqual(
+            sorted(ids),
+            sorted([image.id for image in self.images] + [self.other_image.id])
+        )
+
+    def test_category_images(self):
+        url = reverse('gallery:category_images_api', args=[self.category.slug])
+        data = self.client.get(url).json()
+        self.assertNotIn(
+            self.other_image.id, [image['id'] for image in data['images']]
+        )
+        self.assertTrue(data['next'].startswith(url + '?older='))
+        next_data = self.client.get(data['next']).json()
+        self.assertEqual(len(next_data['images']), 2)
+
+        url = reverse(
+            'gallery:category_images_api', args=[self.other_category.slug]
+        )
+        data = self.client.get(url).json()
+        self.assertEqual(
+            [image['id'] for image in data['images']], [self.other_image.id]
+        )
+        self.assertIsNone(data['next'])
+
+    def test_unknown_category(self):
+        resp = self.client.get(
+            reverse('gallery:category_images_api', args=['unknown'])
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_invalid_cursor_shows_first_page(self):
+        resp = self.client.get(
+            reverse('gallery:images_api'), {'older': 'not-a-cursor'}
+        )
+        self.assertEqual(resp.json()['images'][0]['id'], self.other_image.id)
+
+    def test_srcset_once_generated(self):
+        Image.objects.filter(id=self.other_image.id).update(
+            specs_generated=True
+        )
+        # saved to evict the cached api responses
+        self.category.save()
+        data = self.client.get(reverse('gallery:images_api')).json()
+        image = data['images'][0]
+        self.assertIn('image/jpeg', image['srcset'])
+        for width, rendition in renditions(self.other_image.photo, 'JPEG'):
+            self.assertIn(
+                '{} {}w'.format(rendition.url, width),
+                image['srcset']['image/jpeg']
+            )
+        self.assertNotEqual(image['thumbnail_url'], image['photo_url'])
+
+    def test_gallery_pages_show_first_page(self):
+        resp = self.client.get(reverse('gallery:gallery'))
+        self.assertEqual(
+            resp.content.decode().count('class="gallery-item '),
+            GALLERY_PAGE_SIZE
+        )
+        self.assertIn(
+            'data-next-url="{}?older='.format(reverse('gallery:images_api')),
+            resp.content.decode()
+        )
+
+        resp = self.client.get(reverse('gallery:alternative'))
+        self.assertEqual(len(resp.context['images']), GALLERY_PAGE_SIZE)
+        # counted for all the categories, not just the first page
+        self.assertEqual(resp.context['total_image_count'], 27)
+
+        resp = self.client.get(
+            reverse('gallery:category', args=[self.category.slug])
+        )
+        self.assertEqual(len(resp.context['images']), GALLERY_PAGE_SIZE)
+        self.assertEqual(
+            resp.context['next_url'].split('?')[0],
+            reverse('gallery:category_images_api', args=[self.category.slug])
+        )
+
+
 @override_settings(MEDIA_ROOT='/tmp/')
 class CategoryListViewTests(TestCase):
 
@@ -775,3 +915,546 @@ class CategoryUpdateViewTests(TestCase):
         self.assertEqual(self.category.images.count(), 0)
 
         os.unlink(copied_filepath)
+
+
+class ImageSpecTests(TestCase):
+
+    def setUp(self):
+        self.media_root = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        # imagekit caches whether files exist, by name
+        cache.clear()
+        self.category = baker.make(Category, name='specs')
+
+    def _upload(self, name='testjpg.jpg'):
+        testfile_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testjpg.jpg'
+        )
+        with open(testfile_path, 'rb') as file:
+            return SimpleUploadedFile(name, content=file.read())
+
+    def _thumbnail_exists(self, image):
+        return os.path.exists(
+            os.path.join(self.media_root, image.thumbnail.name)
+        )
+
+    def test_thumbnail_not_generated_on_access(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        self.assertFalse(image.specs_generated)
+        self.assertTrue(image.thumbnail.url)
+        self.assertFalse(self._thumbnail_exists(image))
+
+    def test_generate_new_images(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        call_command('generate_image_specs', processes=1, stdout=StringIO())
+        image.refresh_from_db()
+        self.assertTrue(image.specs_generated)
+        self.assertTrue(self._thumbnail_exists(image))
+        for width, rendition in renditions(image.photo, 'JPEG'):
+            self.assertTrue(
+                os.path.exists(os.path.join(self.media_root, rendition.name))
+            )
+
+        # replacing the photo queues the image again
+        image.photo = self._upload('replacement.jpg')
+        image.save()
+        image.refresh_from_db()
+        self.assertFalse(image.specs_generated)
+
+    def test_upload_processed_by_worker(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload('upload.png')
+        )
+        path = os.path.join(self.media_root, image.photo.name)
+        with open(path, 'rb') as file:
+            uploaded = file.read()
+        # stored under the name it keeps once processed
+        self.assertEqual(image.photo.name, 'gallery/upload.jpg')
+        self.assertEqual(image.processing_status, 'processing')
+
+        call_command('generate_image_specs', processes=1, stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, 'ready')
+        # re-encoded in place, so its url doesn't change
+        self.assertEqual(image.photo.name, 'gallery/upload.jpg')
+        with open(path, 'rb') as file:
+            processed = file.read()
+        self.assertNotEqual(processed, uploaded)
+        self.assertEqual(PILImage.open(BytesIO(processed)).format, 'JPEG')
+        self.assertTrue(self._thumbnail_exists(image))
+
+        # not re-encoded again when every image is checked
+        call_command(
+            'generate_image_specs', all=True, processes=1, stdout=StringIO()
+        )
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), processed)
+
+    def test_replaced_photo_stored_under_new_name(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload('upload.jpg')
+        )
+        old_path = os.path.join(self.media_root, image.photo.name)
+        image.photo = self._upload('upload.jpg')
+        image.save()
+        self.assertNotEqual(image.photo.name, 'gallery/upload.jpg')
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_processing_failed(self):
+        image = Image.objects.create(
+            category=self.category,
+            photo=SimpleUploadedFile('broken.jpg', content=b'not an image')
+        )
+        with self.assertLogs('common.imagespecs', 'ERROR'):
+            call_command(
+                'generate_image_specs', processes=1, stdout=StringIO()
+            )
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, 'failed')
+        self.assertEqual(image.photo.name, 'gallery/broken.jpg')
+
+        # not retried until a new photo is uploaded
+        self.assertFalse(
+            Image.objects.filter(
+                specs_generated=False, processing_failed=False
+            ).exists()
+        )
+        image.photo = self._upload()
+        image.save()
+        self.assertEqual(image.processing_status, 'processing')
+
+    def test_processing_status_shown_on_category_page(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        staff_user = baker.make(User, is_staff=True)
+        self.client.force_login(staff_user)
+        url = reverse('gallery:edit_category', args=[self.category.id])
+        self.assertIn('Processing</span>', self.client.get(url).content.decode())
+
+        Image.objects.filter(id=image.id).update(processing_failed=True)
+        self.assertIn(
+            'Processing failed', self.client.get(url).content.decode()
+        )
+
+        Image.objects.filter(id=image.id).update(specs_generated=True)
+        self.assertNotIn('Processing', self.client.get(url).content.decode())
+
+    def test_generate_all_in_parallel(self):
+        images = [
+            Image.objects.create(
+                category=self.category, photo=self._upload()
+            ) for _ in range(3)
+        ]
+        Image.objects.update(specs_generated=True)
+        call_command(
+            'generate_image_specs', all=True, processes=2,
+            stdout=StringIO()
+        )
+        for image in images:
+            image.refresh_from_db()
+            self.assertTrue(self._thumbnail_exists(image))
+
+    def test_responsive_image_tag(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        template = Template(
+            '{% load commontags %}'
+            '{% responsive_image image sizes="150px" alt="photo" %}'
+        )
+        # the original until the renditions are generated
+        html = template.render(Context({'image': image}))
+        self.assertNotIn('srcset', html)
+        self.assertIn(
+            'src="{}{}"'.format(settings.MEDIA_URL, image.photo.name), html
+        )
+        # with the dimensions and placeholder stored on upload
+        self.assertIn('width="2816" height="1880"', html)
+        self.assertIn(
+            'style="background: url({}) center / cover no-repeat"'.format(
+                image.placeholder
+            ),
+            html
+        )
+
+        image.specs_generated = True
+        html = template.render(Context({'image': image}))
+        self.assertTrue(html.startswith('<picture>'))
+        self.assertIn('sizes="150px"', html)
+        for width, rendition in renditions(image.photo, 'JPEG'):
+            self.assertIn('{} {}w'.format(rendition.url, width), html)
+        self.assertEqual(
+            html.count(' {}w'.format(RENDITION_WIDTHS[0])),
+            2 if 'image/webp' in html else 1
+        )
+
+        # renditions aren't scaled up; those at least as wide as a smaller
+        # photo are listed once, at its width
+        image.width = 800
+        html = template.render(Context({'image': image}))
+        jpeg_renditions = renditions(image.photo, 'JPEG')
+        self.assertIn('{} 640w'.format(jpeg_renditions[1][1].url), html)
+        self.assertIn('{} 800w'.format(jpeg_renditions[2][1].url), html)
+        self.assertNotIn('1024w', html)
+        self.assertNotIn('1600w', html)
+
+    def test_dimensions_and_placeholder_stored_on_upload(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        self.assertEqual((image.width, image.height), (2816, 1880))
+        self.assertTrue(
+            image.placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(image.placeholder), 1000)
+
+        # an image that can't be read has none
+        broken = Image.objects.create(
+            category=self.category,
+            photo=SimpleUploadedFile('broken.jpg', content=b'not an image')
+        )
+        self.assertIsNone(broken.width)
+        self.assertEqual(broken.placeholder, '')
+
+    def test_backfill_dimensions(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        placeholder = image.placeholder
+        Image.objects.update(width=None, height=None, placeholder='')
+        call_command('backfill_image_metadata', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (2816, 1880))
+        self.assertEqual(image.placeholder, placeholder)
+
+
+class ZipImportTests(TestCase):
+
+    def setUp(self):
+        self.media_root = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = baker.make(Category, name='zipped')
+        testfile_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testjpg.jpg'
+        )
+        with open(testfile_path, 'rb') as file:
+            self.jpg = file.read()
+
+    def _zip(self, entries):
+        content = BytesIO()
+        with zipfile.ZipFile(content, 'w') as archive:
+            for name, data in entries:
+                archive.writestr(name, data)
+        content.seek(0)
+        return content
+
+    def test_import_zip(self):
+        archive = self._zip([
+            ('photos/one.jpg', self.jpg),
+            ('photos/two.jpg', self.jpg),
+            ('photos/notes.txt', b'not a picture'),
+            ('__MACOSX/photos/._one.jpg', b'metadata'),
+        ])
+        with patch('gallery.zip_import.ZIP_IMPORT_BATCH_SIZE', 1):
+            result = import_zip(self.category, archive)
+        # the same photo is stored once
+        self.assertEqual(
+            result.added,
+            ['gallery/one.jpg', 'gallery/one.jpg']
+        )
+        self.assertEqual(result.reused, ['photos/two.jpg'])
+        self.assertEqual(
+            result.errors, [('photos/notes.txt', 'Not an image file')]
+        )
+        images = self.category.images.all()
+        self.assertEqual(
+            [image.photo.name for image in images], result.added
+        )
+        for image in images:
+            self.assertEqual(image.processing_status, 'processing')
+            self.assertTrue(
+                os.path.exists(os.path.join(self.media_root, image.photo.name))
+            )
+
+    def test_entry_too_large(self):
+        archive = self._zip([('big.jpg', self.jpg), ('small.jpg', self.jpg)])
+        with patch(
+            'gallery.zip_import.ZIP_IMPORT_MAX_ENTRY_SIZE', len(self.jpg) - 1
+        ):
+            result = import_zip(self.category, archive)
+        self.assertEqual(result.added, [])
+        self.assertEqual(
+            result.errors,
+            [('big.jpg', 'File is too large'),
+             ('small.jpg', 'File is too large')]
+        )
+        self.assertFalse(self.category.images.exists())
+
+    def test_import_view(self):
+        url = reverse('gallery:import_zip', args=[self.category.id])
+        archive = SimpleUploadedFile(
+            'photos.zip',
+            self._zip([('one.jpg', self.jpg), ('<b>.txt', b'text')]).read()
+        )
+        self.client.force_login(baker.make(User))
+        resp = self.client.post(url, {'zip_file': archive})
+        self.assertIn(reverse(settings.PERMISSION_DENIED_URL), resp.url)
+        self.assertFalse(self.category.images.exists())
+
+        self.client.force_login(baker.make(User, is_staff=True))
+        archive.seek(0)
+        resp = self.client.post(url, {'zip_file': archive}, follow=True)
+        self.assertRedirects(
+            resp, reverse('gallery:edit_category', args=[self.category.id])
+        )
+        self.assertEqual(self.category.images.count(), 1)
+        content = resp.content.decode()
+        self.assertIn('1 picture(s) added to &quot;Zipped&quot;', content)
+        self.assertIn('<li>&lt;b&gt;.txt: Not an image file</li>', content)
+
+    def test_import_view_not_a_zip(self):
+        self.client.force_login(baker.make(User, is_staff=True))
+        resp = self.client.post(
+            reverse('gallery:import_zip', args=[self.category.id]),
+            {'zip_file': SimpleUploadedFile('photos.zip', b'not a zip')},
+            follow=True
+        )
+        self.assertIn(
+            'The uploaded file is not a ZIP file', resp.content.decode()
+        )
+        self.assertFalse(self.category.images.exists())
+
+    def test_import_command(self):
+        path = os.path.join(self.media_root, 'photos.zip')
+        with open(path, 'wb') as file:
+            file.write(self._zip([('one.jpg', self.jpg)]).read())
+        stdout = StringIO()
+        call_command(
+            'import_gallery_zip', self.category.slug, path, stdout=stdout
+        )
+        self.assertEqual(self.category.images.count(), 1)
+        self.assertIn('1 picture(s) added to zipped', stdout.getvalue())
+
+
+class DuplicateImageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        self.category = baker.make(Category, name='first')
+        self.other_category = baker.make(Category, name='second')
+        testfile_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testjpg.jpg'
+        )
+        with open(testfile_path, 'rb') as file:
+            self.jpg = file.read()
+        self.staff_user = baker.make(User, is_staff=True)
+
+    def _upload(self, name='testjpg.jpg', content=None):
+        return SimpleUploadedFile(name, content=content or self.jpg)
+
+    def _resized(self):
+        # a smaller, re-encoded copy of the test photo
+        image = PILImage.open(BytesIO(self.jpg))
+        image = image.resize((image.width // 2, image.height // 2))
+        content = BytesIO()
+        image.save(content, 'JPEG', quality=50)
+        return content.getvalue()
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_hashes(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        similar = Image.objects.create(
+            category=self.category,
+            photo=self._upload('resized.jpg', self._resized())
+        )
+        self.assertEqual(len(image.content_hash), 64)
+        self.assertNotEqual(image.content_hash, similar.content_hash)
+        self.assertLessEqual(
+            hash_distance(image.perceptual_hash, similar.perceptual_hash), 6
+        )
+
+    def test_shared_file_deleted_with_last_image(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        name = image.photo.name
+        copy = baker.make(
+            Image, category=self.other_category, photo=name
+        )
+        image.delete()
+        self.assertTrue(self._exists(name))
+        copy.delete()
+        self.assertFalse(self._exists(name))
+
+        # deleting a category deletes the files its images share
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        baker.make(Image, category=self.category, photo=image.photo.name)
+        self.category.delete()
+        self.assertFalse(self._exists(image.photo.name))
+
+    def test_cache_files_deleted_with_last_image(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        generate_specs(image)
+        cache_names = [file.name for file in spec_files(image)]
+        self.assertTrue(all(self._exists(name) for name in cache_names))
+        copy = baker.make(
+            Image, category=self.other_category, photo=image.photo.name
+        )
+        image.delete()
+        self.assertTrue(all(self._exists(name) for name in cache_names))
+        copy.delete()
+        self.assertFalse(any(self._exists(name) for name in cache_names))
+
+    def test_cache_files_deleted_with_replaced_photo(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        generate_specs(image)
+        cache_names = [file.name for file in spec_files(image)]
+        image.photo = self._upload('new.jpg', self._resized())
+        image.save()
+        self.assertFalse(any(self._exists(name) for name in cache_names))
+
+    def test_backfill_hashes(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        hashes = (image.content_hash, image.perceptual_hash)
+        Image.objects.update(content_hash='', perceptual_hash='')
+        call_command('backfill_image_metadata', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual((image.content_hash, image.perceptual_hash), hashes)
+
+    def test_shared_original_processed_once(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        copy = baker.make(
+            Image, category=self.other_category, photo=image.photo.name
+        )
+        with patch(
+            'common.imagespecs.process_upload', wraps=process_upload
+        ) as process:
+            call_command(
+                'generate_image_specs', processes=1, stdout=StringIO()
+            )
+        self.assertEqual(process.call_count, 1)
+        image.refresh_from_db()
+        copy.refresh_from_db()
+        self.assertEqual(image.photo.name, 'gallery/testjpg.jpg')
+        self.assertEqual(copy.photo.name, image.photo.name)
+        self.assertTrue(copy.specs_generated)
+        self.assertTrue(self._exists(image.photo.name))
+
+        # a new image reusing the processed file isn't re-encoded
+        baker.make(Image, category=self.category, photo=image.photo.name)
+        with patch('common.imagespecs.process_upload') as process:
+            call_command(
+                'generate_image_specs', processes=1, stdout=StringIO()
+            )
+        process.assert_not_called()
+
+    def _post_upload(self, photo):
+        formset_data = {
+            'name': self.other_category.name,
+            'description': '',
+            'images-TOTAL_FORMS': 1,
+            'images-INITIAL_FORMS': 0,
+            'images-0-photo': photo,
+        }
+        self.client.force_login(self.staff_user)
+        return self.client.post(
+            reverse('gallery:edit_category', args=[self.other_category.id]),
+            formset_data, follow=True
+        )
+
+    def test_upload_exact_duplicate_offers_file(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        resp = self._post_upload(self._upload('copy.jpg'))
+        self.assertIn('is the same as a picture', resp.content.decode())
+        # not reused until staff choose to, as its url changes
+        copy = self.other_category.images.get()
+        self.assertEqual(copy.photo.name, 'gallery/copy.jpg')
+        self.assertTrue(self._exists('gallery/copy.jpg'))
+
+        reuse_url = reverse(
+            'gallery:reuse_photo', args=[self.other_category.id, copy.id]
+        )
+        url = reverse('gallery:edit_category', args=[self.other_category.id])
+        content = self.client.get(url).content.decode()
+        self.assertIn('is the same as one in', content)
+        self.assertIn(reuse_url, content)
+
+        self.client.post(reuse_url, {'duplicate': image.id})
+        copy.refresh_from_db()
+        self.assertEqual(copy.photo.name, image.photo.name)
+        self.assertEqual(Image.photo_references(image.photo.name), 2)
+        self.assertFalse(self._exists('gallery/copy.jpg'))
+
+    def test_upload_near_duplicate_offers_file(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        resp = self._post_upload(self._upload('resized.jpg', self._resized()))
+        self.assertIn('looks like a picture', resp.content.decode())
+        similar = self.other_category.images.get()
+        self.assertNotEqual(similar.photo.name, image.photo.name)
+
+        url = reverse('gallery:edit_category', args=[self.other_category.id])
+        reuse_url = reverse(
+            'gallery:reuse_photo', args=[self.other_category.id, similar.id]
+        )
+        resp = self.client.get(url)
+        self.assertIn(reuse_url, resp.content.decode())
+        self.assertIn(
+            'name="duplicate" value="{}"'.format(image.id),
+            resp.content.decode()
+        )
+
+        self.client.post(reuse_url, {'duplicate': image.id})
+        similar.refresh_from_db()
+        self.assertEqual(similar.photo.name, image.photo.name)
+        self.assertFalse(self._exists('gallery/resized.jpg'))
+        self.assertNotIn(reuse_url, self.client.get(url).content.decode())
+
+    def test_reuse_requires_staff_user(self):
+        image = Image.objects.create(
+            category=self.category, photo=self._upload()
+        )
+        other = baker.make(Image, category=self.other_category)
+        self.client.force_login(baker.make(User))
+        resp = self.client.post(
+            reverse(
+                'gallery:reuse_photo', args=[self.other_category.id, other.id]
+            ),
+            {'duplicate': image.id}
+        )
+        self.assertIn(reverse(settings.PERMISSION_DENIED_URL), resp.url)
+        other.refresh_from_db()
+        self.assertNotEqual(other.photo.name, image.photo.name)
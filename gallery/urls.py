@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.urls import path
 from gallery.views import category_detail_view, CategoryListView, \
-    CategoryUpdateView, gallery_menu_view, view_gallery, gallery_website_view
+    CategoryUpdateView, CategoryZipImportView, gallery_menu_view, \
+    ImageReusePhotoView, images_api_view, view_gallery, gallery_website_view
 
 app_name = 'gallery'
 
@@ -10,6 +11,12 @@ urlpatterns = [
     # path('', gallery_menu_view, name='gallery'),
     path('', gallery_website_view, name='gallery'),
     path('album/<slug:slug>/', category_detail_view, name='category'),
+    # pages of images as json, for infinite scroll
+    path('api/images/', images_api_view, name='images_api'),
+    path(
+        'api/album/<slug:slug>/images/', images_api_view,
+        name='category_images_api'
+    ),
     ##### VIEWS FOR STAFF USER ONLY #####
     # Category list view, show all categories in list, allow  for edit of
     # name and delete of entire category, add new category, links to category
@@ -19,7 +26,17 @@ urlpatterns = [
     path(
         'albums/<int:pk>/', CategoryUpdateView.as_view(),
         name='edit_category'
-    )
+    ),
+    # Add the pictures in a ZIP file to a category
+    path(
+        'albums/<int:pk>/import/', CategoryZipImportView.as_view(),
+        name='import_zip'
+    ),
+    # Use the stored file of a similar image
+    path(
+        'albums/<int:pk>/images/<int:image_id>/reuse/',
+        ImageReusePhotoView.as_view(), name='reuse_photo'
+    ),
 ]
 
 
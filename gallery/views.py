@@ -1,33 +1,126 @@
+import zipfile
+
+from django.db.models import Count
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import CreateView, ListView, UpdateView, DeleteView
+from django.views.generic import CreateView, ListView, UpdateView, \
+    DeleteView, View
 from django.shortcuts import HttpResponseRedirect
 from django.urls import reverse
 from django.contrib import messages
 from django.template.response import TemplateResponse
+from django.utils.html import format_html, format_html_join
+from django.utils.http import urlencode
 from django.utils.safestring import mark_safe
 
 from activitylog.models import ActivityLog
-
-from gallery.forms import CategoryForm, CategoriesFormset, ImageFormset
+from activitylog.utils import log_activity
+from common.imagespecs import MIME_TYPES, RENDITION_FORMATS, \
+    rendition_url, srcset
+from common.pagination import InvalidCursor, KeysetPaginator
+
+from gallery.duplicates import find_duplicate, near_duplicates, reuse_photo
+from gallery.forms import CategoryForm, CategoriesFormset, ImageFormset, \
+    ZipImportForm
 from gallery.models import Category, Image
 from gallery.utils import StaffUserMixin
+from gallery.zip_import import import_zip
+from website.utils import cache_public_response, \
+    conditional_public_response
+
 
+# images per page of the gallery pages and the images api; later pages are
+# loaded as the visitor scrolls
+GALLERY_PAGE_SIZE = 24
 
+
+def images_page(request, images):
+    """
+    The page of images older than the `older` cursor, newest first
+    """
+    paginator = KeysetPaginator(
+        images.select_related('category'), 'id', GALLERY_PAGE_SIZE
+    )
+    try:
+        return paginator.page(older_than=request.GET.get('older'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def images_api_url(page, category=None):
+    """
+    Url of the images api page after `page`, or None if it's the last
+    """
+    if not page.has_older:
+        return None
+    if category is None:
+        url = reverse('gallery:images_api')
+    else:
+        url = reverse('gallery:category_images_api', args=[category.slug])
+    return '{}?{}'.format(url, urlencode({'older': page.older_cursor}))
+
+
+def image_data(image):
+    ready = image.specs_generated
+    photo_url = rendition_url(image.photo, False)
+    return {
+        'id': image.id,
+        'category_id': image.category_id,
+        'category': image.category.name,
+        'caption': image.caption or '',
+        'photo_url': photo_url,
+        'thumbnail_url': image.thumbnail.url if ready else photo_url,
+        'large_url': rendition_url(image.photo, ready),
+        # srcset for each rendition type; empty until they're generated
+        'srcset': {
+            MIME_TYPES[format]: srcset(image.photo, format, image.width)
+            for format in RENDITION_FORMATS
+        } if ready else {},
+        'width': image.width,
+        'height': image.height,
+        'placeholder': image.placeholder,
+    }
+
+
+@conditional_public_response(Image, Category)
+@cache_public_response(Image, Category)
+def images_api_view(request, slug=None):
+    """
+    A page of gallery images as json, for all categories or the category
+    `slug`, with the url of the next page
+    """
+    images = Image.objects.all()
+    category = None
+    if slug is not None:
+        category = get_object_or_404(Category, slug=slug)
+        images = images.filter(category=category)
+    page = images_page(request, images)
+    return JsonResponse({
+        'images': [image_data(image) for image in page],
+        'next': images_api_url(page, category),
+    })
+
+
+@conditional_public_response(Image, Category)
+@cache_public_response(Image, Category)
 def gallery_website_view(request):
     categories = Category.objects.all().order_by('name')
-    images = Image.objects.all()
+    page = images_page(request, Image.objects.all())
     return TemplateResponse(
         request,
         'website/gallery.html',
         {
             'categories': categories,
-            'images': images,
+            'images': page.object_list,
+            'next_url': images_api_url(page),
             'nav_section': 'gallery'
         }
     )
 
 def view_gallery(request):
-    categories = Category.objects.all().order_by('name')
+    categories = Category.objects.annotate(
+        image_count=Count('images')
+    ).order_by('name')
     category_choice = request.GET.getlist('category', ['All'])[0]
     if category_choice == 'All':
         images = Image.objects.all()
@@ -35,6 +128,7 @@ def view_gallery(request):
     else:
         images = Image.objects.filter(category__id=int(category_choice))
         cat_selection = Category.objects.get(id=int(category_choice))
+    page = images_page(request, images)
 
     return render(
         request,
@@ -42,8 +136,13 @@ def view_gallery(request):
         {
             'cat_selection': cat_selection,
             'categories': categories,
-            'images': images,
-            'total_image_count': Image.objects.all().count()
+            'images': page.object_list,
+            'next_url': images_api_url(
+                page, None if cat_selection == 'All' else cat_selection
+            ),
+            'total_image_count': sum(
+                category.image_count for category in categories
+            )
         }
     )
 
@@ -62,12 +161,14 @@ def gallery_menu_view(request):
 def category_detail_view(request, slug):
 
     category = get_object_or_404(Category, slug=slug)
+    page = images_page(request, category.images.all())
     return TemplateResponse(
         request,
         'gallery/gallery_category.html',
         {
             'category': category,
-            'images': category.images.all(),
+            'images': page.object_list,
+            'next_url': images_api_url(page, category),
             'sidenav_selection': 'gallery'
         }
     )
@@ -165,16 +266,22 @@ class CategoryListView(StaffUserMixin, ListView):
                 )
 
                 if del_msg:
-                    ActivityLog.objects.create(
-                        log=del_msg + 'by admin user {}'.format(request.user)
+                    log_activity(
+                        del_msg + 'by admin user {}'.format(request.user),
+                        action=ActivityLog.CATEGORY_DELETED,
+                        actor=request.user, target=Category
                     )
                 if upd_msg:
-                    ActivityLog.objects.create(
-                        log=upd_msg + 'by admin user {}'.format(request.user)
+                    log_activity(
+                        upd_msg + 'by admin user {}'.format(request.user),
+                        action=ActivityLog.CATEGORY_UPDATED,
+                        actor=request.user, target=Category
                     )
                 if new_msg:
-                    ActivityLog.objects.create(
-                        log=new_msg + 'by admin user {}'.format(request.user)
+                    log_activity(
+                        new_msg + 'by admin user {}'.format(request.user),
+                        action=ActivityLog.CATEGORY_CREATED,
+                        actor=request.user, target=Category
                     )
 
             else:
@@ -208,7 +315,16 @@ class CategoryUpdateView(StaffUserMixin, UpdateView):
         context = super(CategoryUpdateView, self).get_context_data(**kwargs)
 
         picture_formset = ImageFormset(instance=self.get_object())
+        # offer to reuse the files of similar photos in other albums
+        duplicates = near_duplicates(
+            [form.instance for form in picture_formset.forms
+             if form.instance.id],
+            Image.objects.all()
+        )
+        for form in picture_formset.forms:
+            form.duplicate = duplicates.get(form.instance.id)
         context['image_formset'] = picture_formset
+        context['zip_import_form'] = ZipImportForm()
         return context
 
     def post(self, request, *args, **kwargs):
@@ -255,6 +371,10 @@ class CategoryUpdateView(StaffUserMixin, UpdateView):
                                 )
                             else:
                                 new_pics.append(image.photo.name.split('/')[-1])
+                            if 'photo' in form.changed_data:
+                                change_messages.extend(
+                                    self.check_duplicate(image)
+                                )
                     else:
                         for error in form.errors:
                             messages.error(request, mark_safe(error))
@@ -270,25 +390,31 @@ class CategoryUpdateView(StaffUserMixin, UpdateView):
                 )
 
                 if new_pics:
-                    ActivityLog.objects.create(
-                        log='Pictures added to Gallery category {} by admin '
-                            'user {}: {}'.format(
+                    log_activity(
+                        'Pictures added to Gallery category {} by admin '
+                        'user {}: {}'.format(
                             category.name, request.user, ', '.join(new_pics)
-                        )
+                        ),
+                        action=ActivityLog.IMAGES_ADDED, actor=request.user,
+                        target=category
                     )
                 if edited_pics:
-                    ActivityLog.objects.create(
-                        log='Pictures in Gallery category {} edited by admin '
-                            'user {}: {}'.format(
+                    log_activity(
+                        'Pictures in Gallery category {} edited by admin '
+                        'user {}: {}'.format(
                             category.name, request.user, ', '.join(edited_pics)
-                        )
+                        ),
+                        action=ActivityLog.IMAGES_UPDATED, actor=request.user,
+                        target=category
                     )
                 if deleted_pics:
-                    ActivityLog.objects.create(
-                        log='Pictures deleted from Gallery category {} by admin '
-                            'user {}: {}'.format(
+                    log_activity(
+                        'Pictures deleted from Gallery category {} by admin '
+                        'user {}: {}'.format(
                             category.name, request.user, ', '.join(deleted_pics)
-                        )
+                        ),
+                        action=ActivityLog.IMAGES_DELETED, actor=request.user,
+                        target=category
                     )
 
             else:
@@ -304,11 +430,122 @@ class CategoryUpdateView(StaffUserMixin, UpdateView):
             context = {
                 'form': form,
                 'image_formset': image_formset,
+                'zip_import_form': ZipImportForm(),
             }
 
             return TemplateResponse(request, self.template_name, context)
 
         return HttpResponseRedirect(self.get_success_url())
 
+    def check_duplicate(self, image):
+        """
+        Point out a copy or a similar photo of a new photo in another album;
+        its stored file is offered on the edit page rather than reused
+        here, as staff may already have copied the new photo's url
+        """
+        duplicate, exact = find_duplicate(image)
+        if duplicate is None:
+            return []
+        return [
+            'Picture {} {} a picture in the "{}" album; you can use that '
+            'file instead on the album page'.format(
+                image.photo.name.split('/')[-1],
+                'is the same as' if exact else 'looks like',
+                duplicate.category.name.title()
+            )
+        ]
+
     def get_success_url(self):
         return reverse('gallery:categories')
+
+
+class CategoryZipImportView(StaffUserMixin, View):
+    """
+    Add the pictures in an uploaded ZIP file to a category; entries that
+    can't be added are listed without stopping the import
+    """
+
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        category = get_object_or_404(Category, id=self.kwargs['pk'])
+        form = ZipImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            messages.error(request, 'Please choose a ZIP file to upload')
+            return HttpResponseRedirect(self.get_success_url(category))
+
+        try:
+            result = import_zip(
+                category, form.cleaned_data['zip_file'], actor=request.user
+            )
+        except zipfile.BadZipFile:
+            messages.error(request, 'The uploaded file is not a ZIP file')
+            return HttpResponseRedirect(self.get_success_url(category))
+
+        if result.added:
+            reused = ''
+            if result.reused:
+                reused = ' ({} already stored; the stored files have been ' \
+                    'reused)'.format(len(result.reused))
+            messages.success(
+                request,
+                '{} picture(s) added to "{}"{}'.format(
+                    len(result.added), category.name.title(), reused
+                )
+            )
+        else:
+            messages.info(request, 'No pictures found in the ZIP file')
+        if result.errors:
+            messages.error(
+                request,
+                format_html(
+                    'Some files could not be added:<ul>{}</ul>',
+                    format_html_join(
+                        '', '<li>{}: {}</li>', result.errors
+                    )
+                )
+            )
+        return HttpResponseRedirect(self.get_success_url(category))
+
+    def get_success_url(self, category):
+        return reverse('gallery:edit_category', args=[category.id])
+
+
+class ImageReusePhotoView(StaffUserMixin, View):
+    """
+    Replace an image's file with the stored file of an identical or
+    similar image
+    """
+
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        image = get_object_or_404(
+            Image.objects.select_related('category'),
+            id=self.kwargs['image_id'], category_id=self.kwargs['pk']
+        )
+        duplicate_id = request.POST.get('duplicate', '')
+        duplicate = get_object_or_404(
+            Image.objects.select_related('category'),
+            id=int(duplicate_id) if duplicate_id.isdigit() else None
+        )
+        name = image.photo.name.split('/')[-1]
+        reuse_photo(image, duplicate)
+        messages.success(
+            request,
+            'Picture {} now uses the file of the picture in the "{}" '
+            'album'.format(name, duplicate.category.name.title())
+        )
+        log_activity(
+            'Picture {} in Gallery category {} replaced with the file of '
+            'picture {} in category {} by admin user {}'.format(
+                name, image.category.name,
+                duplicate.photo.name.split('/')[-1],
+                duplicate.category.name, request.user
+            ),
+            action=ActivityLog.IMAGES_UPDATED, actor=request.user,
+            target=image.category
+        )
+        return HttpResponseRedirect(
+            reverse('gallery:edit_category', args=[image.category_id])
+        )
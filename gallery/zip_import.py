@@ -0,0 +1,164 @@
+import os
+import zipfile
+import zlib
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+
+from PIL import Image as PILImage
+
+from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
+from common.imagespecs import image_metadata
+from gallery.duplicates import content_hash, perceptual_hash
+from gallery.models import Image
+from website.utils import bump_cache_version, model_cache_version_key
+
+
+# new Image rows are inserted this many at a time
+ZIP_IMPORT_BATCH_SIZE = 100
+# entries larger than this (uncompressed) are skipped
+ZIP_IMPORT_MAX_ENTRY_SIZE = 25 * 1024 * 1024
+# entries are spooled to disk above this size
+SPOOL_SIZE = 1024 * 1024
+
+
+class EntryError(Exception):
+    pass
+
+
+class ZipImportResult(object):
+
+    def __init__(self):
+        self.added = []
+        # entries that were already stored, whose files were reused
+        self.reused = []
+        # (entry name, error message)
+        self.errors = []
+
+
+def _is_skipped(info):
+    # directories and the metadata files macOS adds to archives
+    name = info.filename
+    return (
+        info.is_dir() or name.startswith('__MACOSX/') or
+        os.path.basename(name).startswith('.')
+    )
+
+
+def _copy_entry(archive, info, destination):
+    """
+    Decompress an entry into `destination` in chunks, without trusting the
+    size recorded in the archive
+    """
+    if info.file_size > ZIP_IMPORT_MAX_ENTRY_SIZE:
+        raise EntryError('File is too large')
+    size = 0
+    with archive.open(info) as entry:
+        for chunk in iter(lambda: entry.read(64 * 1024), b''):
+            size += len(chunk)
+            if size > ZIP_IMPORT_MAX_ENTRY_SIZE:
+                raise EntryError('File is too large')
+            destination.write(chunk)
+    destination.seek(0)
+
+
+def _read_entry(archive, info, stored, field):
+    """
+    Return an unsaved Image for an entry, and whether its file was stored;
+    the file isn't stored again if it's in `stored` or used by another
+    image
+    """
+    with SpooledTemporaryFile(max_size=SPOOL_SIZE) as file:
+        _copy_entry(archive, info, file)
+        try:
+            PILImage.open(file).verify()
+        except Exception:
+            raise EntryError('Not an image file')
+        file = File(file)
+        width, height, placeholder = image_metadata(file)
+        image = Image(
+            content_hash=content_hash(file),
+            perceptual_hash=perceptual_hash(file),
+            width=width, height=height, placeholder=placeholder
+        )
+        name = stored.get(image.content_hash) or Image.objects.filter(
+            content_hash=image.content_hash
+        ).values_list('photo', flat=True).first()
+        new_file = name is None
+        if new_file:
+            name = field.storage.save(
+                field.generate_filename(
+                    None, os.path.basename(info.filename)
+                ),
+                file
+            )
+            stored[image.content_hash] = name
+        image.photo = name
+        return image, new_file
+
+
+def import_zip(category, zip_file, actor=None):
+    """
+    Add every image in a ZIP archive (a path or file object) to a gallery
+    category, logging the import as by `actor`.  Entries are read one at a
+    time, so the archive is never held in memory, and the new Image rows
+    are inserted in batches; the generate_image_specs worker then processes
+    them in parallel.  Photos that are already stored (by content hash)
+    reuse the stored file.  Entries that aren't images or can't be read are
+    reported in the result's errors without stopping the import.  Raises
+    zipfile.BadZipFile if the file isn't a ZIP archive.
+    """
+    result = ZipImportResult()
+    field = Image._meta.get_field('photo')
+    # content hash: name of the files stored by this import
+    stored = {}
+    # (image, whether its file was stored by this import)
+    batch = []
+
+    def flush():
+        try:
+            Image.objects.bulk_create([image for image, new_file in batch])
+        except Exception:
+            for image, new_file in batch:
+                if new_file:
+                    field.storage.delete(image.photo.name)
+            raise
+        result.added.extend(image.photo.name for image, new_file in batch)
+        del batch[:]
+
+    with zipfile.ZipFile(zip_file) as archive:
+        for info in archive.infolist():
+            if _is_skipped(info):
+                continue
+            # corrupt, encrypted or unsupported entries are reported and
+            # skipped
+            try:
+                image, new_file = _read_entry(archive, info, stored, field)
+            except (EntryError, zipfile.BadZipFile, zlib.error, EOFError,
+                    RuntimeError, NotImplementedError) as e:
+                result.errors.append((info.filename, str(e)))
+                continue
+            image.category = category
+            if not new_file:
+                result.reused.append(info.filename)
+            batch.append((image, new_file))
+            if len(batch) >= ZIP_IMPORT_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+    if result.added:
+        # bulk_create doesn't send post_save, which evicts the cached
+        # gallery pages
+        bump_cache_version(model_cache_version_key(Image))
+        by = 'admin user {}'.format(actor) if actor else 'management command'
+        log_activity(
+            'Pictures added to Gallery category {} from a ZIP file by {}: '
+            '{}'.format(
+                category.name, by,
+                ', '.join(name.split('/')[-1] for name in result.added)
+            ),
+            action=ActivityLog.IMAGES_ADDED, actor=actor, target=category
+        )
+    return result
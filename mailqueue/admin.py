@@ -0,0 +1,38 @@
+from django.contrib import admin
+
+from mailqueue.models import BulkEmail, BulkEmailRecipient, QueuedEmail
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject', 'to', 'status', 'attempts', 'created', 'next_attempt',
+        'sent_at'
+    )
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('last_error', 'sent_at')
+
+
+class BulkEmailRecipientInline(admin.TabularInline):
+    model = BulkEmailRecipient
+    fields = ('email', 'status', 'sent_at', 'error')
+    readonly_fields = ('email', 'status', 'sent_at', 'error')
+    extra = 0
+    can_delete = False
+
+
+class BulkEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject', 'created', 'created_by', 'status', 'total', 'sent_count',
+        'failed_count'
+    )
+    list_filter = ('status',)
+    readonly_fields = (
+        'total', 'sent_count', 'failed_count', 'started_at', 'finished_at',
+        'heartbeat'
+    )
+    inlines = [BulkEmailRecipientInline]
+
+
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
+admin.site.register(BulkEmail, BulkEmailAdmin)
@@ -0,0 +1,22 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from mailqueue.utils import enqueue_messages
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend that only adds messages to the outbound queue, so
+    sending mail never blocks a request on the SMTP server.  The
+    send_queued_mail command delivers them with
+    settings.MAILQUEUE_DELIVERY_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        try:
+            return len(enqueue_messages(email_messages))
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
@@ -0,0 +1,176 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
+from common.email_helpers import send_support_email
+from mailqueue.models import BulkEmail, BulkEmailRecipient
+from mailqueue.utils import CLAIM_TIMEOUT, open_connection, \
+    reset_connection
+
+
+def create_bulk_email(users, subject, body, from_email, html_message='',
+                      cc_from_address=False, created_by=None):
+    """
+    Create a bulk email to a queryset of users, to be sent in the background
+    by the send_queued_mail worker.  The html body should be rendered once
+    by the caller; it's the same for every recipient.
+    """
+    bulk_email = BulkEmail.objects.create(
+        subject=subject, body=body, html_message=html_message,
+        from_email=from_email, cc_from_address=cc_from_address,
+        created_by=created_by
+    )
+    recipients = []
+    total = 0
+    for user_id, email in users.exclude(email='').order_by('id').values_list(
+            'id', 'email'
+    ).iterator():
+        recipients.append(
+            BulkEmailRecipient(bulk_email=bulk_email, user_id=user_id, email=email)
+        )
+        if len(recipients) == settings.BULK_EMAIL_BATCH_SIZE:
+            BulkEmailRecipient.objects.bulk_create(recipients)
+            total += len(recipients)
+            recipients = []
+    BulkEmailRecipient.objects.bulk_create(recipients)
+    total += len(recipients)
+
+    bulk_email.total = total
+    bulk_email.save(update_fields=['total'])
+    return bulk_email
+
+
+def claim_bulk_email():
+    """
+    Claim the oldest queued bulk email, or one whose worker has stopped
+    updating its heartbeat, so only one worker sends it
+    """
+    now = timezone.now()
+    candidates = BulkEmail.objects.filter(
+        Q(status=BulkEmail.QUEUED) |
+        Q(status=BulkEmail.SENDING, heartbeat__lt=now - CLAIM_TIMEOUT)
+    ).order_by('created', 'id')
+    for bulk_email in candidates:
+        claimed = BulkEmail.objects.filter(
+            id=bulk_email.id, status=bulk_email.status,
+            heartbeat=bulk_email.heartbeat
+        ).update(status=BulkEmail.SENDING, heartbeat=now)
+        if claimed:
+            bulk_email.refresh_from_db()
+            if bulk_email.started_at is None:
+                bulk_email.started_at = now
+                bulk_email.save(update_fields=['started_at'])
+            return bulk_email
+    return None
+
+
+def send_bulk_email(bulk_email, connection=None, batch_size=None, rate=None,
+                    after_batch=None):
+    """
+    Send the pending recipients of a bulk email over a single connection,
+    recording each recipient's status and the overall progress after every
+    batch.  Sending is throttled to `rate` messages per second
+    (settings.BULK_EMAIL_RATE by default; 0 for no limit).  Messages are
+    passed to the connection one at a time so a failure can be recorded
+    against the right recipient; the connection is reopened after a
+    failure, and if it can't be, the error is recorded against the
+    remaining recipients.  Returns the number sent and failed.
+    """
+    batch_size = batch_size or settings.BULK_EMAIL_BATCH_SIZE
+    rate = settings.BULK_EMAIL_RATE if rate is None else rate
+    if connection is None:
+        connection = get_connection(settings.MAILQUEUE_DELIVERY_BACKEND)
+
+    total_sent = total_failed = 0
+    open_error = open_connection(connection)
+    try:
+        while True:
+            batch = list(
+                bulk_email.recipients.filter(
+                    status=BulkEmailRecipient.PENDING
+                ).order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+
+            started = time.monotonic()
+            sent_ids = []
+            failed = []
+            for recipient in batch:
+                if open_error:
+                    failed.append((recipient, open_error))
+                    continue
+                try:
+                    connection.send_messages(
+                        [bulk_email.to_message(recipient, connection)]
+                    )
+                except Exception as e:
+                    failed.append((recipient, repr(e)))
+                    open_error = reset_connection(connection)
+                else:
+                    sent_ids.append(recipient.id)
+
+            now = timezone.now()
+            BulkEmailRecipient.objects.filter(id__in=sent_ids).update(
+                status=BulkEmailRecipient.SENT, sent_at=now
+            )
+            for recipient, error in failed:
+                recipient.status = BulkEmailRecipient.FAILED
+                recipient.error = error
+                recipient.save(update_fields=['status', 'error'])
+            BulkEmail.objects.filter(id=bulk_email.id).update(
+                sent_count=F('sent_count') + len(sent_ids),
+                failed_count=F('failed_count') + len(failed),
+                heartbeat=now
+            )
+            total_sent += len(sent_ids)
+            total_failed += len(failed)
+
+            if after_batch is not None:
+                after_batch()
+            if rate:
+                time.sleep(
+                    max(0, len(batch) / rate - (time.monotonic() - started))
+                )
+    finally:
+        connection.close()
+
+    bulk_email.refresh_from_db()
+    bulk_email.status = BulkEmail.DONE
+    bulk_email.finished_at = timezone.now()
+    bulk_email.save(update_fields=['status', 'finished_at'])
+
+    log_activity(
+        'Bulk email with subject "{}" (id {}) finished; {} sent, {} '
+        'failed'.format(
+            bulk_email.subject, bulk_email.id, bulk_email.sent_count,
+            bulk_email.failed_count
+        ),
+        action=ActivityLog.BULK_EMAIL_FINISHED, target=bulk_email
+    )
+    if total_failed:
+        send_support_email(
+            '{} of {} emails could not be sent (bulk email id {})'.format(
+                total_failed, bulk_email.total, bulk_email.id
+            ),
+            __name__, "Bulk Email to students"
+        )
+    return total_sent, total_failed
+
+
+def send_bulk_emails(after_batch=None):
+    """
+    Send all queued bulk emails; returns the number of bulk emails sent
+    """
+    count = 0
+    bulk_email = claim_bulk_email()
+    while bulk_email is not None:
+        send_bulk_email(bulk_email, after_batch=after_batch)
+        count += 1
+        bulk_email = claim_bulk_email()
+    return count
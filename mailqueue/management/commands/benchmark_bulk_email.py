@@ -0,0 +1,148 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mailqueue.bulk import send_bulk_email
+from mailqueue.models import BulkEmail, BulkEmailRecipient
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough of SMTP to accept messages from smtplib; the messages are
+    counted and discarded
+    """
+
+    def reply(self, line):
+        self.wfile.write('{}\r\n'.format(line).encode('ascii'))
+
+    def handle(self):
+        # stands in for the network and TLS handshake of a real server
+        time.sleep(self.server.connect_latency)
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.message_count += 1
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self, connect_latency=0):
+        super(SMTPStandIn, self).__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.connect_latency = connect_latency
+        self.lock = threading.Lock()
+        self.message_count = 0
+        self.connection_count = 0
+
+    def process_request(self, request, client_address):
+        self.connection_count += 1
+        super(SMTPStandIn, self).process_request(request, client_address)
+
+
+class Command(BaseCommand):
+    help = 'Measure bulk email throughput against a local SMTP stand-in, ' \
+           'compared with opening a connection per message.  Nothing is ' \
+           'saved to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients', type=int, default=500,
+            help='Number of recipients to send to'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Number of recipients per batch'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Throttle to this many messages per second (default: no '
+                 'limit)'
+        )
+        parser.add_argument(
+            '--connect-latency', type=float, default=0.05,
+            help='Seconds the stand-in waits before greeting each new '
+                 'connection, to simulate connecting to a remote server'
+        )
+
+    def handle(self, *args, **options):
+        server = SMTPStandIn(options['connect_latency'])
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        try:
+            self.benchmark(server, host, port, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def get_connection(self, host, port):
+        return get_connection(
+            'django.core.mail.backends.smtp.EmailBackend', host=host,
+            port=port, username='', password='', use_tls=False,
+            use_ssl=False
+        )
+
+    def report(self, label, server, seconds):
+        self.stdout.write(
+            '{}: {} messages over {} connections in {:.2f}s ({:.0f} '
+            'messages/s)'.format(
+                label, server.message_count, server.connection_count, seconds,
+                server.message_count / seconds if seconds else 0
+            )
+        )
+        server.message_count = server.connection_count = 0
+
+    def benchmark(self, server, host, port, options):
+        with transaction.atomic():
+            bulk_email = BulkEmail.objects.create(
+                subject='Benchmark', body='Benchmark message',
+                html_message='<p>Benchmark message</p>',
+                from_email='benchmark@test.com', total=options['recipients']
+            )
+            BulkEmailRecipient.objects.bulk_create(
+                [
+                    BulkEmailRecipient(
+                        bulk_email=bulk_email,
+                        email='student{}@test.com'.format(i)
+                    )
+                    for i in range(options['recipients'])
+                ]
+            )
+            recipients = list(bulk_email.recipients.all())
+
+            # the previous approach: one connection per message
+            start = time.monotonic()
+            for recipient in recipients:
+                bulk_email.to_message(
+                    recipient, self.get_connection(host, port)
+                ).send()
+            self.report('Connection per message', server, time.monotonic() - start)
+
+            start = time.monotonic()
+            send_bulk_email(
+                bulk_email, connection=self.get_connection(host, port),
+                batch_size=options['batch_size'], rate=options['rate']
+            )
+            self.report('Bulk engine', server, time.monotonic() - start)
+
+            transaction.set_rollback(True)
@@ -0,0 +1,73 @@
+import time
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from activitylog.utils import activity_log_buffer
+from mailqueue.bulk import send_bulk_emails
+from mailqueue.models import QueuedEmail
+from mailqueue.utils import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send the emails waiting in the outbound mail queue, and any ' \
+           'queued bulk emails.  Run it from a scheduler, or with --loop ' \
+           'as a worker process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the queue instead of exiting when it is empty'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Seconds to wait between polls with --loop'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of emails to send over each connection'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=30,
+            help='Delete sent emails older than this many days'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            with activity_log_buffer():
+                self.run_once(options)
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+    def run_once(self, options):
+        sent, failed = self.send_all(options['batch_size'])
+        if sent or failed:
+            self.stdout.write(
+                '{} emails sent, {} failed'.format(sent, failed)
+            )
+        # keep sending account and contact form emails between the
+        # batches of a long bulk email
+        bulk_sent = send_bulk_emails(
+            after_batch=lambda: self.send_all(options['batch_size'])
+        )
+        if bulk_sent:
+            self.stdout.write('{} bulk emails sent'.format(bulk_sent))
+        self.delete_old_emails(options['keep_days'])
+
+    def send_all(self, batch_size):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_emails(batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < batch_size:
+                return total_sent, total_failed
+
+    def delete_old_emails(self, keep_days):
+        QueuedEmail.objects.filter(
+            status=QueuedEmail.SENT,
+            sent_at__lt=timezone.now() - timedelta(days=keep_days)
+        ).delete()
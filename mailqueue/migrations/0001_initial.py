@@ -0,0 +1,43 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField()),
+                ('body', models.TextField(blank=True, default='')),
+                ('html_message', models.TextField(blank=True, default='')),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.TextField(blank=True, default='')),
+                ('cc', models.TextField(blank=True, default='')),
+                ('bcc', models.TextField(blank=True, default='')),
+                ('reply_to', models.TextField(blank=True, default='')),
+                ('failure_notification', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('next_attempt', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='queuedemail',
+            index=models.Index(fields=['status', 'next_attempt'], name='mailqueue_q_status_e46eb1_idx'),
+        ),
+    ]
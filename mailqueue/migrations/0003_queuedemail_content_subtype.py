@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailqueue', '0002_auto_20261018_1249'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedemail',
+            name='content_subtype',
+            field=models.CharField(default='plain', max_length=20),
+        ),
+    ]
@@ -0,0 +1,195 @@
+from django.contrib.auth.models import User
+from django.core.mail.message import EmailMultiAlternatives
+from django.db import models
+from django.utils import timezone
+
+
+def _split_addresses(addresses):
+    return [address for address in addresses.split('\n') if address]
+
+
+class QueuedEmail(models.Model):
+    """
+    An outbound email waiting to be delivered by the send_queued_mail
+    command.  Address lists are stored one address per line.
+    """
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.TextField()
+    body = models.TextField(blank=True, default='')
+    html_message = models.TextField(blank=True, default='')
+    # of the body, e.g. 'html' for an html-only message
+    content_subtype = models.CharField(max_length=20, default='plain')
+    from_email = models.CharField(max_length=255)
+    to = models.TextField(blank=True, default='')
+    cc = models.TextField(blank=True, default='')
+    bcc = models.TextField(blank=True, default='')
+    reply_to = models.TextField(blank=True, default='')
+
+    # sent to support if the email still can't be delivered after the
+    # last attempt
+    failure_notification = models.TextField(blank=True, default='')
+
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(default=timezone.now)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('next_attempt', 'id')
+        indexes = [models.Index(fields=['status', 'next_attempt'])]
+
+    def __str__(self):
+        return '{} ({})'.format(self.subject, self.status)
+
+    @classmethod
+    def from_message(cls, message, failure_notification=''):
+        """
+        Raises ValueError for a message with parts that can't be queued:
+        attachments, extra headers or non-html alternatives
+        """
+        alternatives = getattr(message, 'alternatives', [])
+        if message.attachments or message.extra_headers or any(
+                mimetype != 'text/html' for content, mimetype in alternatives
+        ):
+            raise ValueError(
+                'Emails with attachments, extra headers or non-html '
+                'alternatives can\'t be queued'
+            )
+        html_message = next(
+            (
+                content for content, mimetype in alternatives
+                if mimetype == 'text/html'
+            ), ''
+        )
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            html_message=html_message,
+            content_subtype=message.content_subtype,
+            from_email=message.from_email,
+            to='\n'.join(message.to),
+            cc='\n'.join(message.cc),
+            bcc='\n'.join(message.bcc),
+            reply_to='\n'.join(message.reply_to),
+            failure_notification=failure_notification,
+        )
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email,
+            to=_split_addresses(self.to),
+            cc=_split_addresses(self.cc),
+            bcc=_split_addresses(self.bcc),
+            reply_to=_split_addresses(self.reply_to),
+            connection=connection
+        )
+        message.content_subtype = self.content_subtype
+        if self.html_message:
+            message.attach_alternative(self.html_message, 'text/html')
+        return message
+
+
+class BulkEmail(models.Model):
+    """
+    An email to a list of users, sent by the send_queued_mail worker.  The
+    html body is rendered once when it's created; the counts record the
+    worker's progress.
+    """
+
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    DONE = 'done'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (SENDING, 'Sending'),
+        (DONE, 'Done'),
+    )
+
+    subject = models.TextField()
+    body = models.TextField()
+    html_message = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255)
+    cc_from_address = models.BooleanField(default=False)
+    created_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='bulk_emails'
+    )
+    created = models.DateTimeField(default=timezone.now)
+
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    total = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # updated after each batch, so a run abandoned by a worker can be
+    # picked up by another
+    heartbeat = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __str__(self):
+        return '{} ({})'.format(self.subject, self.status)
+
+    @property
+    def pending_count(self):
+        return self.total - self.sent_count - self.failed_count
+
+    def to_message(self, recipient, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email, [recipient.email],
+            cc=[self.from_email] if self.cc_from_address else [],
+            reply_to=[self.from_email],
+            connection=connection
+        )
+        if self.html_message:
+            message.attach_alternative(self.html_message, 'text/html')
+        return message
+
+
+class BulkEmailRecipient(models.Model):
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    bulk_email = models.ForeignKey(
+        BulkEmail, related_name='recipients', on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    email = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [models.Index(fields=['bulk_email', 'status'])]
+
+    def __str__(self):
+        return '{} ({})'.format(self.email, self.status)
@@ -0,0 +1,433 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from model_bakery import baker
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail, management
+from django.core.mail import EmailMessage, EmailMultiAlternatives, \
+    send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.adapter import AccountAdapter
+from activitylog.models import ActivityLog
+from mailqueue.bulk import claim_bulk_email, create_bulk_email, \
+    send_bulk_email, send_bulk_emails
+from mailqueue.models import BulkEmail, BulkEmailRecipient, QueuedEmail
+from mailqueue.utils import enqueue_email, retry_delay, send_queued_emails
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    Fails to send anything except support notifications
+    """
+
+    def send_messages(self, messages):
+        if any(message.to != [settings.SUPPORT_EMAIL] for message in messages):
+            raise ConnectionRefusedError('SMTP server unavailable')
+        return super(FailingEmailBackend, self).send_messages(messages)
+
+
+class RefusingEmailBackend(EmailBackend):
+    """
+    Refuses emails to addresses starting with "bad"
+    """
+
+    def send_messages(self, messages):
+        if any(message.to[0].startswith('bad') for message in messages):
+            raise ConnectionRefusedError('Recipient refused')
+        return super(RefusingEmailBackend, self).send_messages(messages)
+
+
+class UnavailableEmailBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+def _make_message():
+    msg = EmailMultiAlternatives(
+        'Subject', 'Text body', 'from@test.com',
+        to=['to@test.com'], cc=['cc@test.com'], reply_to=['reply@test.com']
+    )
+    msg.attach_alternative('<p>Html body</p>', 'text/html')
+    return msg
+
+
+class QueuedEmailBackendTests(TestCase):
+
+    @override_settings(
+        EMAIL_BACKEND='mailqueue.backends.QueuedEmailBackend'
+    )
+    def test_send_mail_only_enqueues(self):
+        send_mail(
+            'Subject', 'Body', 'from@test.com', ['to1@test.com', 'to2@test.com']
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.PENDING)
+        self.assertEqual(queued.to, 'to1@test.com\nto2@test.com')
+
+    def test_message_round_trip(self):
+        queued = enqueue_email(_make_message())
+        msg = QueuedEmail.objects.get(id=queued.id).to_message()
+        self.assertEqual(msg.subject, 'Subject')
+        self.assertEqual(msg.body, 'Text body')
+        self.assertEqual(msg.to, ['to@test.com'])
+        self.assertEqual(msg.cc, ['cc@test.com'])
+        self.assertEqual(msg.bcc, [])
+        self.assertEqual(msg.reply_to, ['reply@test.com'])
+        self.assertEqual(msg.alternatives, [('<p>Html body</p>', 'text/html')])
+
+    def test_message_with_unqueueable_parts_rejected(self):
+        msg = _make_message()
+        msg.attach('notes.txt', 'Notes', 'text/plain')
+        with self.assertRaises(ValueError):
+            enqueue_email(msg)
+        msg = _make_message()
+        msg.extra_headers['X-Test'] = 'test'
+        with self.assertRaises(ValueError):
+            enqueue_email(msg)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_html_only_message_round_trip(self):
+        msg = EmailMessage(
+            'Subject', '<p>Html body</p>', 'from@test.com', ['to@test.com']
+        )
+        msg.content_subtype = 'html'
+        queued = enqueue_email(msg)
+        msg = QueuedEmail.objects.get(id=queued.id).to_message()
+        self.assertEqual(msg.content_subtype, 'html')
+        self.assertIn('text/html', msg.message()['Content-Type'])
+
+    def test_account_adapter_enqueues(self):
+        request = RequestFactory().get('/')
+        AccountAdapter(request).send_mail(
+            'account/email/password_reset_key', 'user@test.com',
+            {'password_reset_url': 'http://test.com/reset/', 'request': request}
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().to, 'user@test.com')
+
+
+class SendQueuedEmailsTests(TestCase):
+
+    def test_send_queued_emails(self):
+        enqueue_email(_make_message())
+        enqueue_email(_make_message())
+        self.assertEqual(send_queued_emails(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].cc, ['cc@test.com'])
+        for queued in QueuedEmail.objects.all():
+            self.assertEqual(queued.status, QueuedEmail.SENT)
+            self.assertIsNotNone(queued.sent_at)
+
+        # nothing left to send
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    def test_emails_not_due_are_not_sent(self):
+        queued = enqueue_email(_make_message())
+        queued.next_attempt = timezone.now() + timedelta(minutes=1)
+        queued.save()
+        self.assertEqual(send_queued_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.FailingEmailBackend',
+        MAILQUEUE_RETRY_DELAY=60
+    )
+    def test_failed_email_retried_with_backoff(self):
+        queued = enqueue_email(_make_message())
+        self.assertEqual(send_queued_emails(), (0, 1))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.PENDING)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('SMTP server unavailable', queued.last_error)
+        delay = queued.next_attempt - timezone.now()
+        self.assertTrue(timedelta(seconds=50) < delay <= timedelta(seconds=60))
+
+        self.assertEqual(retry_delay(2), 120)
+        self.assertEqual(retry_delay(3), 240)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.RefusingEmailBackend'
+    )
+    def test_connection_reopened_after_failed_send(self):
+        bad = _make_message()
+        bad.to = ['bad@test.com']
+        enqueue_email(bad)
+        enqueue_email(_make_message())
+        with patch.object(EmailBackend, 'open') as mock_open:
+            self.assertEqual(send_queued_emails(), (1, 1))
+        self.assertEqual(mock_open.call_count, 2)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.RefusingEmailBackend'
+    )
+    def test_failed_reopen_recorded_against_remaining_emails(self):
+        bad = _make_message()
+        bad.to = ['bad@test.com']
+        enqueue_email(bad)
+        queued = enqueue_email(_make_message())
+        with patch.object(
+            EmailBackend, 'open',
+            side_effect=[None, ConnectionRefusedError('SMTP unavailable')]
+        ):
+            self.assertEqual(send_queued_emails(), (0, 2))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.PENDING)
+        self.assertIn('SMTP unavailable', queued.last_error)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.FailingEmailBackend',
+        MAILQUEUE_MAX_ATTEMPTS=2
+    )
+    def test_support_notified_after_last_attempt(self):
+        queued = enqueue_email(
+            _make_message(), failure_notification='Contact form details'
+        )
+        send_queued_emails()
+        self.assertEqual(len(mail.outbox), 0)
+
+        QueuedEmail.objects.update(next_attempt=timezone.now())
+        send_queued_emails()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedEmail.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [settings.SUPPORT_EMAIL])
+        self.assertIn('Contact form details', mail.outbox[0].body)
+
+        # failed emails aren't retried
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.UnavailableEmailBackend',
+        MAILQUEUE_MAX_ATTEMPTS=1
+    )
+    def test_support_notification_failure_logged(self):
+        enqueue_email(_make_message())
+        send_queued_emails()
+        self.assertTrue(
+            ActivityLog.objects.filter(
+                log__startswith='Problem sending an email'
+            ).exists()
+        )
+
+    def test_claimed_emails_not_sent_again(self):
+        queued = enqueue_email(_make_message())
+        # claimed by another worker that hasn't finished sending it yet
+        QueuedEmail.objects.filter(id=queued.id).update(
+            next_attempt=timezone.now() + timedelta(minutes=10)
+        )
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+
+class SendQueuedMailCommandTests(TestCase):
+
+    def test_command_sends_all_batches(self):
+        for _ in range(5):
+            enqueue_email(_make_message())
+        management.call_command('send_queued_mail', batch_size=2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(
+            QueuedEmail.objects.filter(status=QueuedEmail.PENDING).exists()
+        )
+
+    def test_command_deletes_old_sent_emails(self):
+        old = enqueue_email(_make_message())
+        old.status = QueuedEmail.SENT
+        old.sent_at = timezone.now() - timedelta(days=31)
+        old.save()
+        recent = enqueue_email(_make_message())
+        management.call_command('send_queued_mail')
+        self.assertEqual(
+            list(QueuedEmail.objects.values_list('id', flat=True)), [recent.id]
+        )
+
+
+class BulkEmailTests(TestCase):
+
+    def setUp(self):
+        self.users = baker.make_recipe('common.user', _quantity=5)
+
+    def _create_bulk_email(self, **kwargs):
+        return create_bulk_email(
+            User.objects.filter(id__in=[user.id for user in self.users]),
+            'Subject', 'Text body', 'from@test.com',
+            html_message='<p>Html body</p>', **kwargs
+        )
+
+    def test_create_bulk_email(self):
+        baker.make_recipe('common.user', email='')
+        bulk_email = create_bulk_email(
+            User.objects.all(), 'Subject', 'Text body', 'from@test.com'
+        )
+        self.assertEqual(bulk_email.status, BulkEmail.QUEUED)
+        # users without an email address are skipped
+        self.assertEqual(bulk_email.total, 5)
+        self.assertEqual(
+            sorted(bulk_email.recipients.values_list('email', flat=True)),
+            sorted(user.email for user in self.users)
+        )
+
+    def test_send_bulk_email(self):
+        bulk_email = self._create_bulk_email(cc_from_address=True)
+        self.assertEqual(send_bulk_email(bulk_email, batch_size=2), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        for email in mail.outbox:
+            self.assertEqual(len(email.to), 1)
+            self.assertEqual(email.cc, ['from@test.com'])
+            self.assertEqual(
+                email.alternatives, [('<p>Html body</p>', 'text/html')]
+            )
+
+        bulk_email.refresh_from_db()
+        self.assertEqual(bulk_email.status, BulkEmail.DONE)
+        self.assertEqual(bulk_email.sent_count, 5)
+        self.assertEqual(bulk_email.pending_count, 0)
+        self.assertIsNotNone(bulk_email.finished_at)
+        self.assertFalse(
+            bulk_email.recipients.exclude(
+                status=BulkEmailRecipient.SENT
+            ).exists()
+        )
+
+    def test_send_bulk_email_uses_one_connection(self):
+        bulk_email = self._create_bulk_email()
+        with patch.object(EmailBackend, 'open') as mock_open:
+            send_bulk_email(bulk_email, batch_size=2)
+        self.assertEqual(mock_open.call_count, 1)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.RefusingEmailBackend'
+    )
+    def test_failed_recipients_recorded(self):
+        self.users[0].email = 'bad@test.com'
+        self.users[0].save()
+        bulk_email = self._create_bulk_email()
+        self.assertEqual(send_bulk_email(bulk_email), (4, 1))
+
+        failed = bulk_email.recipients.get(status=BulkEmailRecipient.FAILED)
+        self.assertEqual(failed.email, 'bad@test.com')
+        self.assertIn('Recipient refused', failed.error)
+        bulk_email.refresh_from_db()
+        self.assertEqual(bulk_email.failed_count, 1)
+        # support is notified once for the whole run
+        self.assertEqual(
+            len([m for m in mail.outbox if m.to == [settings.SUPPORT_EMAIL]]),
+            1
+        )
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.RefusingEmailBackend'
+    )
+    def test_connection_reopened_after_failure(self):
+        self.users[0].email = 'bad@test.com'
+        self.users[0].save()
+        bulk_email = self._create_bulk_email()
+        with patch.object(EmailBackend, 'open') as mock_open:
+            self.assertEqual(send_bulk_email(bulk_email), (4, 1))
+        self.assertEqual(mock_open.call_count, 2)
+
+    @override_settings(
+        MAILQUEUE_DELIVERY_BACKEND='mailqueue.tests.RefusingEmailBackend'
+    )
+    def test_failed_reopen_recorded_against_remaining_recipients(self):
+        self.users[0].email = 'bad@test.com'
+        self.users[0].save()
+        bulk_email = self._create_bulk_email()
+        with patch.object(
+            EmailBackend, 'open',
+            side_effect=[None, ConnectionRefusedError('SMTP unavailable')]
+        ):
+            self.assertEqual(send_bulk_email(bulk_email, batch_size=2), (0, 5))
+        self.assertEqual(
+            bulk_email.recipients.filter(
+                error__contains='SMTP unavailable'
+            ).count(),
+            4
+        )
+
+    def test_failed_open_recorded_against_recipients(self):
+        bulk_email = self._create_bulk_email()
+        with patch.object(
+            EmailBackend, 'open',
+            side_effect=ConnectionRefusedError('SMTP unavailable')
+        ) as mock_open:
+            self.assertEqual(send_bulk_email(bulk_email), (0, 5))
+        self.assertEqual(mock_open.call_count, 1)
+        self.assertEqual(
+            bulk_email.recipients.filter(
+                status=BulkEmailRecipient.FAILED,
+                error__contains='SMTP unavailable'
+            ).count(),
+            5
+        )
+        self.assertFalse(
+            [m for m in mail.outbox if m.to != [settings.SUPPORT_EMAIL]]
+        )
+
+    @patch('mailqueue.bulk.time.sleep')
+    def test_throttled_to_rate(self, mock_sleep):
+        bulk_email = self._create_bulk_email()
+        send_bulk_email(bulk_email, batch_size=2, rate=1)
+        # 3 batches; each should take about as many seconds as messages
+        self.assertEqual(mock_sleep.call_count, 3)
+        self.assertAlmostEqual(mock_sleep.call_args_list[0][0][0], 2, places=1)
+
+    def test_resumes_pending_recipients(self):
+        bulk_email = self._create_bulk_email()
+        bulk_email.recipients.filter(
+            id__in=bulk_email.recipients.values_list('id', flat=True)[:2]
+        ).update(status=BulkEmailRecipient.SENT)
+        self.assertEqual(send_bulk_email(bulk_email), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_claim_bulk_email(self):
+        bulk_email = self._create_bulk_email()
+        claimed = claim_bulk_email()
+        self.assertEqual(claimed.id, bulk_email.id)
+        self.assertEqual(claimed.status, BulkEmail.SENDING)
+        self.assertIsNotNone(claimed.started_at)
+        # already claimed by a running worker
+        self.assertIsNone(claim_bulk_email())
+
+        # abandoned by its worker
+        BulkEmail.objects.update(
+            heartbeat=timezone.now() - timedelta(minutes=11)
+        )
+        self.assertEqual(claim_bulk_email().id, bulk_email.id)
+
+    def test_send_bulk_emails(self):
+        self._create_bulk_email()
+        self._create_bulk_email()
+        self.assertEqual(send_bulk_emails(), 2)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(send_bulk_emails(), 0)
+
+    def test_queued_emails_sent_between_batches(self):
+        self._create_bulk_email()
+        enqueue_email(_make_message())
+        management.call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertFalse(
+            QueuedEmail.objects.filter(status=QueuedEmail.PENDING).exists()
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        management.call_command(
+            'benchmark_bulk_email', recipients=3, connect_latency=0, stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn(
+            'Connection per message: 3 messages over 3 connections', output
+        )
+        self.assertIn('Bulk engine: 3 messages over 1 connections', output)
+        self.assertFalse(BulkEmail.objects.exists())
@@ -0,0 +1,170 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
+from mailqueue.models import QueuedEmail
+
+
+# how long a worker has to send the emails it has claimed before another
+# worker may pick them up again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+MAX_RETRY_DELAY = 60 * 60 * 6
+
+
+def enqueue_messages(messages, failure_notification=''):
+    """
+    Add email messages to the outbound queue; they are sent by the
+    send_queued_mail command
+    """
+    return QueuedEmail.objects.bulk_create(
+        [
+            QueuedEmail.from_message(message, failure_notification)
+            for message in messages
+        ]
+    )
+
+
+def enqueue_email(message, failure_notification=''):
+    queued_email = QueuedEmail.from_message(message, failure_notification)
+    queued_email.save()
+    return queued_email
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before the next attempt; doubles after each failure
+    """
+    return min(
+        settings.MAILQUEUE_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY
+    )
+
+
+def claim_queued_emails(batch_size):
+    """
+    Claim a batch of due emails by pushing their next attempt past the
+    claim timeout, so concurrent workers don't send them too.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queued_ids = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True).filter(
+                status=QueuedEmail.PENDING, next_attempt__lte=now
+            ).order_by('next_attempt', 'id').values_list(
+                'id', flat=True
+            )[:batch_size]
+        )
+        QueuedEmail.objects.filter(id__in=queued_ids).update(
+            next_attempt=now + CLAIM_TIMEOUT
+        )
+    return list(QueuedEmail.objects.filter(id__in=queued_ids))
+
+
+def notify_support(queued_email):
+    # sent with the delivery backend directly so a failure can't be queued
+    # behind itself
+    try:
+        send_mail(
+            '{} An error occurred! ({})'.format(
+                settings.ACCOUNT_EMAIL_SUBJECT_PREFIX, 'mail queue'
+            ),
+            'An email could not be sent after {} attempts.\n\n'
+            'The last error was "{}"\n\n'
+            'subject: {}\n'
+            'to: {}\n\n'
+            '{}'.format(
+                queued_email.attempts, queued_email.last_error,
+                queued_email.subject, ', '.join(queued_email.to.split('\n')),
+                queued_email.failure_notification
+            ),
+            settings.DEFAULT_FROM_EMAIL,
+            [settings.SUPPORT_EMAIL],
+            connection=get_connection(settings.MAILQUEUE_DELIVERY_BACKEND)
+        )
+    except Exception as e:
+        log_activity(
+            "Problem sending an email ({}: {})".format(__name__, e),
+            action=ActivityLog.EMAIL_ERROR
+        )
+
+
+def open_connection(connection):
+    """
+    Open a connection; returns the error if it can't be opened, which is
+    recorded against the emails instead of sending them
+    """
+    try:
+        connection.open()
+    except Exception as e:
+        return repr(e)
+    return None
+
+
+def reset_connection(connection):
+    """
+    Replace a connection after a failed send, which can leave an smtp
+    connection unusable; left closed, the smtp backend would open and close
+    a connection for every message.  Returns the error if the new one
+    can't be opened.
+    """
+    try:
+        connection.close()
+    except Exception:
+        pass
+    return open_connection(connection)
+
+
+def send_queued_emails(batch_size=100):
+    """
+    Send one batch of due emails over a single connection, which is
+    reopened after a failed send.  Failed emails are retried with an increasing delay until MAILQUEUE_MAX_ATTEMPTS is
+    reached, when they're marked as failed and support is notified.
+    Returns the number of emails sent and failed in this batch.
+    """
+    queued_emails = claim_queued_emails(batch_size)
+    if not queued_emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(settings.MAILQUEUE_DELIVERY_BACKEND)
+    open_error = open_connection(connection)
+    try:
+        for queued_email in queued_emails:
+            queued_email.attempts += 1
+            error = open_error
+            if error is None:
+                try:
+                    connection.send_messages(
+                        [queued_email.to_message(connection)]
+                    )
+                except Exception as e:
+                    error = repr(e)
+                    open_error = reset_connection(connection)
+            if error:
+                failed += 1
+                queued_email.last_error = error
+                if queued_email.attempts >= settings.MAILQUEUE_MAX_ATTEMPTS:
+                    queued_email.status = QueuedEmail.FAILED
+                    notify_support(queued_email)
+                else:
+                    queued_email.next_attempt = timezone.now() + timedelta(
+                        seconds=retry_delay(queued_email.attempts)
+                    )
+            else:
+                sent += 1
+                queued_email.status = QueuedEmail.SENT
+                queued_email.sent_at = timezone.now()
+                queued_email.last_error = ''
+            queued_email.save(
+                update_fields=[
+                    'attempts', 'status', 'last_error', 'next_attempt',
+                    'sent_at'
+                ]
+            )
+    finally:
+        connection.close()
+    return sent, failed
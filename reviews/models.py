@@ -36,10 +36,24 @@ class Review(models.Model):
     slug = AutoSlugField(populate_from='title', max_length=40, unique=True)
 
     selected = models.BooleanField(default=False, help_text="Selected for display on home page")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ('-submission_date',)
 
+    @property
+    def moderation_state(self):
+        """
+        'pending' until staff have reviewed the latest version; then
+        'approved' or 'rejected', as in the staff review list
+        """
+        if not self.reviewed:
+            return 'pending'
+        if (self.published and not self.edited) or \
+                (self.edited and self.update_published):
+            return 'approved'
+        return 'rejected'
+
     def approve(self):
         if not self.published:
             self.published = True
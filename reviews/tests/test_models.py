@@ -126,6 +126,19 @@ class ReviewModelTests(TestCase):
         self.assertTrue(review.published)
         self.assertFalse(review.update_published)
 
+    def test_moderation_state(self):
+        review = baker.make(Review, user=self.user)
+        self.assertEqual(review.moderation_state, 'pending')
+        review.approve()
+        self.assertEqual(review.moderation_state, 'approved')
+
+        # an edited review is pending again until the update is reviewed
+        review.title = 'updated title'
+        review.save()
+        self.assertEqual(review.moderation_state, 'pending')
+        review.reject()
+        self.assertEqual(review.moderation_state, 'rejected')
+
     def test_updated_existing_review(self):
         """
         Updating user_display_name, review, rating or title sets the previous
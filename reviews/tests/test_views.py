@@ -1,3 +1,5 @@
+import csv
+
 from model_bakery import baker
 
 from django.conf import settings
@@ -9,7 +11,7 @@ from django.test.client import Client
 from reviews.models import Review
 from reviews.tests.helpers import set_up_fb, _create_session
 from reviews.views import ReviewListView, ReviewCreateView, ReviewUpdateView, \
-        StaffReviewListView
+        StaffReviewExportView, StaffReviewListView
 
 
 class ReviewTestMixin(object):
@@ -443,3 +445,36 @@ class StaffReviewListViewTests(ReviewTestMixin, TestCase):
         self.assertFalse(self.review_pending.published)
         self.assertTrue(self.review_update_pending.reviewed)
         self.assertFalse(self.review_update_pending.update_published)
+
+
+class StaffReviewExportViewTests(ReviewTestMixin, TestCase):
+
+    def _get_response(self, user):
+        url = reverse('reviews:staff_reviews_export')
+        request = self.factory.get(url)
+        request.user = user
+        view = StaffReviewExportView.as_view()
+        return view(request)
+
+    def test_staff_user_required(self):
+        resp = self._get_response(self.user)
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(resp.url, reverse(settings.PERMISSION_DENIED_URL))
+
+    def test_export_with_moderation_state(self):
+        pending = baker.make(Review, user=self.user, title='Pending')
+        approved = baker.make(Review, user=self.user, title='Approved')
+        approved.approve()
+        rejected = baker.make(Review, user=self.user, title='Rejected')
+        rejected.reject()
+
+        resp = self._get_response(self.staff_user)
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        content = b''.join(resp.streaming_content).decode('utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0][7], 'Moderation state')
+        states = {row[4]: row[7] for row in rows[1:]}
+        self.assertEqual(
+            states,
+            {'Pending': 'pending', 'Approved': 'approved', 'Rejected': 'rejected'}
+        )
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from reviews.views import ReviewListView, ReviewCreateView, \
-    ReviewUpdateView, StaffReviewListView
+    ReviewUpdateView, StaffReviewExportView, StaffReviewListView
 
 
 app_name = 'reviews'
@@ -18,5 +18,9 @@ urlpatterns = [
     ),
     ##### VIEWS FOR STAFF USER ONLY #####
     # listview for all reviews, button to publish/reject
-    path('staff-review/', StaffReviewListView.as_view(), name='staff_reviews')
+    path('staff-review/', StaffReviewListView.as_view(), name='staff_reviews'),
+    path(
+        'staff-review/export/', StaffReviewExportView.as_view(),
+        name='staff_reviews_export'
+    ),
 ]
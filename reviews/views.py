@@ -1,19 +1,25 @@
 from django.shortcuts import render, HttpResponseRedirect
-from django.views.generic import CreateView, ListView, UpdateView, DeleteView
+from django.views.generic import CreateView, ListView, UpdateView, \
+    DeleteView, View
 from django.conf import settings
 from django.contrib import messages
 from django.urls import reverse
 from django.db.models import Q
+from django.utils.decorators import method_decorator
 
 from braces.views import LoginRequiredMixin
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
+from common.csv_export import EXPORT_CHUNK_SIZE, stream_csv
 
 from reviews.forms import ReviewForm, ReviewFormSet, ReviewSortForm
 from reviews.models import Review
 from reviews.utils import StaffUserMixin
+from website.utils import conditional_public_response
 
 
+@method_decorator(conditional_public_response(Review), name='dispatch')
 class ReviewListView(ListView):
 
     template_name = 'reviews/reviews.html'
@@ -49,10 +55,12 @@ class ReviewCreateView(LoginRequiredMixin, CreateView):
         review = form.save(commit=False)
         review.user = self.request.user
         review.save()
-        ActivityLog.objects.create(
-            log="Testimonial (id {}) submitted by {}".format(
+        log_activity(
+            "Testimonial (id {}) submitted by {}".format(
                 review.id, review.user.username
-            )
+            ),
+            action=ActivityLog.REVIEW_SUBMITTED, actor=review.user,
+            target=review
         )
         messages.success(self.request, 'Your testimonial has been submitted and will be '
                               'displayed on the site shortly')
@@ -78,10 +86,12 @@ class ReviewUpdateView(LoginRequiredMixin, UpdateView):
 
     def form_valid(self, form):
         form.save()
-        ActivityLog.objects.create(
-            log="Testimonial (id {}) updated by {}".format(
+        log_activity(
+            "Testimonial (id {}) updated by {}".format(
                 form.instance.id, form.instance.user.username
-            )
+            ),
+            action=ActivityLog.REVIEW_UPDATED, actor=form.instance.user,
+            target=form.instance
         )
         messages.success(self.request, 'Your testimonial has been updated and '
                                         'will be displayed on the site shortly')
@@ -158,11 +168,13 @@ class StaffReviewListView(StaffUserMixin, ListView):
                                 )
                             )
                             change = True
-                            ActivityLog.objects.create(
-                                log="Testimonial{} (id {}) approved by {}".format(
+                            log_activity(
+                                "Testimonial{} (id {}) approved by {}".format(
                                     " update" if review.edited else "",
                                     review.id, request.user.username
-                                )
+                                ),
+                                action=ActivityLog.REVIEW_APPROVED,
+                                actor=request.user, target=review
                             )
                         elif decision == 'reject' and view != 'rejected':
                             review.reject()
@@ -174,12 +186,14 @@ class StaffReviewListView(StaffUserMixin, ListView):
                                 )
                             )
                             change = True
-                            ActivityLog.objects.create(
-                                log="Testimonial{} (id {}) rejected "
-                                    "by {}".format(
+                            log_activity(
+                                "Testimonial{} (id {}) rejected "
+                                "by {}".format(
                                     " update" if review.edited else "",
                                     review.id, request.user.username
-                                )
+                                ),
+                                action=ActivityLog.REVIEW_REJECTED,
+                                actor=request.user, target=review
                             )
 
                         review.save()
@@ -191,4 +205,35 @@ class StaffReviewListView(StaffUserMixin, ListView):
         return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
-        return reverse('reviews:staff_reviews')
\ No newline at end of file
+        return reverse('reviews:staff_reviews')
+
+
+class StaffReviewExportView(StaffUserMixin, View):
+    """
+    Download all testimonials, with their moderation state, as CSV
+    """
+
+    def get(self, request):
+        reviews = Review.objects.select_related('user').order_by(
+            '-submission_date', '-id'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        rows = (
+            (
+                review.id, review.user.username, review.user_display_name,
+                review.submission_date.isoformat(), review.title,
+                review.review, review.rating, review.moderation_state,
+                'yes' if review.published else 'no',
+                'yes' if review.edited else 'no',
+                review.edited_date.isoformat() if review.edited_date else '',
+                'yes' if review.selected else 'no'
+            ) for review in reviews
+        )
+        return stream_csv(
+            'testimonials.csv',
+            [
+                'Id', 'Username', 'Display name', 'Submitted', 'Title',
+                'Testimonial', 'Rating', 'Moderation state', 'Published',
+                'Edited', 'Edited date', 'Selected for home page'
+            ],
+            rows
+        )
@@ -1,17 +1,19 @@
 # -*- coding: utf-8 -*-
-from studioadmin.forms.activitylog_forms import ActivityLogSearchForm
+from studioadmin.forms.activitylog_forms import \
+    ActivityLogArchiveSearchForm, ActivityLogSearchForm
 from studioadmin.forms.page_forms import PageForm, PagesFormset, PictureFormset
 from studioadmin.forms.timetable_forms import CreateEventForm, \
     DAY_CHOICES, DAY_CHOICES_DICT, \
     EditSessionForm, EditEventForm, \
     TimetableWeeklySessionFormSet, EventsFormSet
-from studioadmin.forms.user_forms import ChooseUsersFormSet, EmailUsersForm
+from studioadmin.forms.user_forms import EmailUsersForm, \
+    RecipientSegmentForm
 
 
 __all__ = [
-    'ActivityLogSearchForm', 'ChooseUsersFormSet', 'DAY_CHOICES',
+    'ActivityLogArchiveSearchForm', 'ActivityLogSearchForm', 'DAY_CHOICES',
     'DAY_CHOICES_DICT',
-    'EmailUsersForm', 'EditSessionForm', 'EditEventForm',
+    'EmailUsersForm', 'RecipientSegmentForm', 'EditSessionForm', 'EditEventForm',
     'UserBookingFormSet', 'TimetableWeeklySessionFormSet',
     'EventsFormSet', 'CreateEventForm'
 ]
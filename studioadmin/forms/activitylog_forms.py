@@ -2,6 +2,9 @@
 
 from django import forms
 
+from activitylog.archive import archived_months
+from activitylog.models import ActivityLog
+
 
 class ActivityLogSearchForm(forms.Form):
     search = forms.CharField(
@@ -21,10 +24,40 @@ class ActivityLogSearchForm(forms.Form):
             format='%d-%m-%y',
         ),
     )
+    action = forms.ChoiceField(
+        choices=(('', 'All actions'),) + ActivityLog.ACTION_CHOICES,
+        required=False
+    )
+    actor = forms.CharField(
+        widget=forms.TextInput(
+            attrs={
+                'placeholder': 'Username'
+            }
+        ),
+        required=False
+    )
     hide_empty_cronjobs = forms.BooleanField(
         widget=forms.CheckboxInput(attrs={
             'class': "regular-checkbox",
             'id': 'hide_empty_cronjobs_id'
         }),
         initial='on'
-    )
\ No newline at end of file
+    )
+
+
+class ActivityLogArchiveSearchForm(forms.Form):
+    search = forms.CharField(
+        widget=forms.TextInput(
+            attrs={
+                'placeholder': 'Search log text'
+            }
+        ),
+        required=False
+    )
+    month = forms.ChoiceField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super(ActivityLogArchiveSearchForm, self).__init__(*args, **kwargs)
+        self.fields['month'].choices = [('', 'All archived months')] + [
+            (month, month) for month in archived_months()
+        ]
@@ -2,11 +2,12 @@
 
 from django import forms
 from django.conf import settings
-from django.contrib.auth.models import User
-from django.forms.models import modelformset_factory, BaseModelFormSet, \
-    inlineformset_factory, formset_factory, BaseFormSet, BaseInlineFormSet
+from django.forms.models import inlineformset_factory, formset_factory, \
+    BaseFormSet, BaseInlineFormSet
 from django.utils import timezone
 
+from studioadmin.models import RecipientSegment
+
 # from flex_bookings.models import Block, Booking, Event
 # from payments.models import PaypalBookingTransaction
 #
@@ -207,27 +208,31 @@ from django.utils import timezone
 # )
 
 
-class ChooseUsersBaseFormSet(BaseModelFormSet):
-
-    def add_fields(self, form, index):
-        super(ChooseUsersBaseFormSet, self).add_fields(form, index)
+class RecipientSegmentForm(forms.ModelForm):
 
-        form.fields['email_user'] = forms.BooleanField(
-            widget=forms.CheckboxInput(attrs={
-                'class': "regular-checkbox studioadmin-list select-checkbox",
-                'id': 'email_user_cbox_{}'.format(index)
-            }),
-            initial=True,
-            required=False
+    class Meta:
+        model = RecipientSegment
+        fields = (
+            'search', 'restricted_access', 'data_privacy',
+            'reviewed_within_days', 'chosen_users', 'name'
         )
-        form.email_user_cbox_id = 'email_user_cbox_{}'.format(index)
-
-ChooseUsersFormSet = modelformset_factory(
-    User,
-    fields=('id',),
-    formset=ChooseUsersBaseFormSet,
-    extra=0,
-    can_delete=False)
+        widgets = {
+            # ticked in the preview of matching users
+            'chosen_users': forms.MultipleHiddenInput(),
+            'search': forms.TextInput(attrs={'class': 'form-control'}),
+            'restricted_access': forms.Select(
+                attrs={'class': 'form-control'}
+            ),
+            'data_privacy': forms.Select(attrs={'class': 'form-control'}),
+            'reviewed_within_days': forms.NumberInput(
+                attrs={'class': 'form-control'}
+            ),
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+        }
+        labels = {
+            'reviewed_within_days': 'Testimonial in last (days)',
+            'name': 'Save selection as',
+        }
 
 
 class EmailUsersForm(forms.Form):
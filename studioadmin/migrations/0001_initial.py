@@ -0,0 +1,34 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipientSegment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', help_text='Give the selection a name to save it for future emails', max_length=255)),
+                ('search', models.CharField(blank=True, default='', help_text='Username, name or email address contains', max_length=255)),
+                ('restricted_access', models.CharField(blank=True, choices=[('', 'Any'), ('yes', 'Can view restricted pages'), ('no', 'Cannot view restricted pages')], default='', max_length=3)),
+                ('data_privacy', models.CharField(blank=True, choices=[('', 'Any'), ('signed', 'Signed current data privacy policy'), ('not_signed', 'Not signed current data privacy policy')], default='', max_length=10)),
+                ('reviewed_within_days', models.PositiveIntegerField(blank=True, help_text='Only students who have submitted a testimonial in this many days', null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recipient_segments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('name',),
+            },
+        ),
+    ]
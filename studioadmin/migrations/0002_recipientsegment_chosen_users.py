@@ -0,0 +1,20 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('studioadmin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipientsegment',
+            name='chosen_users',
+            field=models.ManyToManyField(blank=True, help_text='Only email these students, if any are chosen', related_name='_recipientsegment_chosen_users_+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from accounts.models import DataPrivacyPolicy, SignedDataPrivacy
+from reviews.models import Review
+from website.utils import annotate_restricted_access
+
+
+class RecipientSegment(models.Model):
+    """
+    A filter definition for choosing the students to email.  The users are
+    resolved from it when the email is sent, so a saved segment always
+    reflects the current users; if students have been chosen individually
+    only they are emailed.  Segments without a name are one-off
+    selections.
+    """
+
+    RESTRICTED_ACCESS_CHOICES = (
+        ('', 'Any'),
+        ('yes', 'Can view restricted pages'),
+        ('no', 'Cannot view restricted pages'),
+    )
+    DATA_PRIVACY_CHOICES = (
+        ('', 'Any'),
+        ('signed', 'Signed current data privacy policy'),
+        ('not_signed', 'Not signed current data privacy policy'),
+    )
+
+    name = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text='Give the selection a name to save it for future emails'
+    )
+    search = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text='Username, name or email address contains'
+    )
+    restricted_access = models.CharField(
+        max_length=3, choices=RESTRICTED_ACCESS_CHOICES, blank=True,
+        default=''
+    )
+    data_privacy = models.CharField(
+        max_length=10, choices=DATA_PRIVACY_CHOICES, blank=True, default=''
+    )
+    reviewed_within_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Only students who have submitted a testimonial in this '
+                  'many days'
+    )
+    chosen_users = models.ManyToManyField(
+        User, blank=True, related_name='+',
+        help_text='Only email these students, if any are chosen'
+    )
+    created_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='recipient_segments'
+    )
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('name',)
+
+    def __str__(self):
+        return self.name or 'Selection {}'.format(self.id)
+
+    def get_users(self):
+        """
+        Return a lazy queryset of the users to email: the chosen users of a
+        saved segment, if it has any, or else the users matching its filters
+        """
+        if self.pk is not None and self.chosen_users.exists():
+            return self.chosen_users.order_by('username')
+        return self.get_matching_users()
+
+    def get_matching_users(self):
+        """
+        Return a lazy queryset of the users matching this segment's filters
+        """
+        users = User.objects.all()
+        if self.search:
+            users = users.filter(
+                Q(username__icontains=self.search) |
+                Q(first_name__icontains=self.search) |
+                Q(last_name__icontains=self.search) |
+                Q(email__icontains=self.search)
+            )
+        if self.restricted_access:
+            users = annotate_restricted_access(users).filter(
+                restricted_access=self.restricted_access == 'yes'
+            )
+        if self.data_privacy:
+            signed = SignedDataPrivacy.objects.filter(
+                user=OuterRef('pk'),
+                version=DataPrivacyPolicy.current_version()
+            )
+            users = users.annotate(signed_data_privacy=Exists(signed)).filter(
+                signed_data_privacy=self.data_privacy == 'signed'
+            )
+        if self.reviewed_within_days is not None:
+            reviews = Review.objects.filter(
+                user=OuterRef('pk'),
+                submission_date__gte=timezone.now() - timedelta(
+                    days=self.reviewed_within_days
+                )
+            )
+            users = users.annotate(recently_reviewed=Exists(reviews)).filter(
+                recently_reviewed=True
+            )
+        return users.order_by('username')
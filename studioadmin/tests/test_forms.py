@@ -7,13 +7,13 @@ from django.conf import settings
 from django.test import TestCase, override_settings
 
 from studioadmin.forms import (
-    ChooseUsersFormSet,
     DAY_CHOICES,
     DAY_CHOICES_DICT,
     EmailUsersForm,
     PageForm,
     PagesFormset,
     PictureFormset,
+    RecipientSegmentForm,
     TimetableWeeklySessionFormSet,
     EditSessionForm
 )
@@ -86,27 +86,26 @@ class WeeklySessionEditFormTests(TestCase):
         self.assertIn('Invalid time format', str(form.errors['time']))
 
 
-class ChooseUsersFormSetTests(TestCase):
+class RecipientSegmentFormTests(TestCase):
 
-    def setUp(self):
-        self.user = baker.make_recipe('common.user')
-
-    def formset_data(self, extra_data={}):
+    def test_empty_form_valid(self):
+        form = RecipientSegmentForm(data={})
+        self.assertTrue(form.is_valid())
 
-        data = {
-            'form-TOTAL_FORMS': 1,
-            'form-INITIAL_FORMS': 1,
-            'form-0-id': str(self.user.id),
+    def test_form_valid(self):
+        form = RecipientSegmentForm(
+            data={
+                'search': 'test', 'restricted_access': 'yes',
+                'data_privacy': 'signed', 'reviewed_within_days': 30,
+                'name': 'Regulars'
             }
+        )
+        self.assertTrue(form.is_valid())
 
-        for key, value in extra_data.items():
-            data[key] = value
-
-        return data
-
-    def test_choose_users_formset_valid(self):
-        formset = ChooseUsersFormSet(data=self.formset_data())
-        self.assertTrue(formset.is_valid())
+    def test_invalid_choice(self):
+        form = RecipientSegmentForm(data={'restricted_access': 'maybe'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('restricted_access', form.errors)
 
 
 class EmailUsersFormTests(TestCase):
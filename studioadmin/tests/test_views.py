@@ -1,4 +1,7 @@
+import csv
 import pytz
+import shutil
+import tempfile
 
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
@@ -6,20 +9,30 @@ from model_bakery import baker
 
 from django.urls import reverse
 from django.core import mail
-from django.test import TestCase, RequestFactory
+from django.test import TestCase, RequestFactory, override_settings
 from django.test.client import Client
 from django.contrib.auth.models import User, Permission
 from django.contrib.messages.storage.fallback import FallbackStorage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from accounts.models import DataPrivacyPolicy, SignedDataPrivacy
+from activitylog.archive import archive_logs
 from activitylog.models import ActivityLog
 from common.helpers import set_up_fb, _create_session
+from mailqueue.bulk import send_bulk_emails
+from mailqueue.models import BulkEmail, BulkEmailRecipient
 
+from reviews.models import Review
+from studioadmin.models import RecipientSegment
 from studioadmin.tests.utils import TestPermissionMixin
-from studioadmin.views.activitylog import ActivityLogListView
-from studioadmin.views.email_users import choose_users_to_email, \
-    email_users_view
-from studioadmin.views.users import UserListView
+from studioadmin.views.activitylog import ActivityLogArchiveView, \
+    ActivityLogExportView, ActivityLogListView
+from studioadmin.views.email_users import bulk_email_status_view, \
+    choose_users_to_email, email_users_view
+from studioadmin.views.users import UserExportView, UserListView
+from website.models import RestrictedAccessTracker
 
 
 class TestPermissionMixin(object):
@@ -130,13 +143,198 @@ class UserListViewTests(TestPermissionMixin, TestCase):
             changed_student.has_perm('website.can_view_restricted')
         )
 
+    def _post_response(self, user, form_data):
+        url = reverse('studioadmin:users')
+        session = _create_session()
+        request = self.factory.post(url, form_data)
+        request.session = session
+        request.user = user
+        messages = FallbackStorage(request)
+        request._messages = messages
+        view = UserListView.as_view()
+        return view(request)
+
+    def test_grant_access_to_selected_users(self):
+        students = baker.make_recipe('common.user', _quantity=3)
+        resp = self._post_response(
+            self.staff_user, {
+                'bulk_action': 'grant', 'apply_to': 'selected',
+                'selected_users': [students[0].id, students[1].id],
+                'next': 'page=2'
+            }
+        )
+        self.assertEqual(resp.url, reverse('studioadmin:users') + '?page=2')
+        self.assertEqual(
+            [
+                user.id for user in User.objects.all()
+                if user.has_perm('website.can_view_restricted')
+            ],
+            [students[0].id, students[1].id]
+        )
+        self.assertEqual(RestrictedAccessTracker.objects.count(), 2)
+        self.assertEqual(
+            ActivityLog.objects.latest('id').log,
+            'Permission to view restricted pages has been added for selected '
+            'users (2 users changed) by admin user {}'.format(
+                self.staff_user.username
+            )
+        )
+
+    def test_revoke_access_from_all_users(self):
+        perm = Permission.objects.get(codename='can_view_restricted')
+        students = baker.make_recipe('common.user', _quantity=3)
+        for user in students + [self.staff_user]:
+            user.user_permissions.add(perm)
+        log_count = ActivityLog.objects.count()
+
+        self._post_response(
+            self.staff_user, {'bulk_action': 'revoke', 'apply_to': 'all'}
+        )
+        # staff users keep their permission
+        self.assertEqual(
+            [
+                user.id for user in User.objects.all()
+                if user.has_perm('website.can_view_restricted')
+            ],
+            [self.staff_user.id]
+        )
+        # one summary log entry
+        self.assertEqual(ActivityLog.objects.count(), log_count + 1)
+        self.assertIn(
+            'removed for all users (except staff and superusers) (3 users '
+            'changed)', ActivityLog.objects.latest('id').log
+        )
+
+    def test_bulk_action_with_no_users_selected(self):
+        self._post_response(
+            self.staff_user, {'bulk_action': 'grant', 'apply_to': 'selected'}
+        )
+        self.assertFalse(RestrictedAccessTracker.objects.exists())
+
+    def test_restricted_access_and_tracker_annotated(self):
+        restr_student = baker.make_recipe('common.user')
+        perm = Permission.objects.get(codename='can_view_restricted')
+        restr_student.user_permissions.add(perm)
+        tracker = baker.make(RestrictedAccessTracker, user=restr_student)
+
+        resp = self._get_response(self.staff_user)
+        users = {user.id: user for user in resp.context_data['users']}
+        self.assertTrue(users[restr_student.id].restricted_access)
+        self.assertEqual(
+            users[restr_student.id].access_start_date, tracker.start_date
+        )
+        self.assertFalse(users[self.user.id].restricted_access)
+        self.assertIsNone(users[self.user.id].access_start_date)
+
+    def test_number_of_queries_does_not_depend_on_users(self):
+        perm = Permission.objects.get(codename='can_view_restricted')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self._get_response(self.staff_user).render()
+            return len(queries)
+
+        for user in baker.make_recipe('common.user', _quantity=2):
+            user.user_permissions.add(perm)
+            baker.make(RestrictedAccessTracker, user=user)
+        num_queries = count_queries()
+
+        for user in baker.make_recipe('common.user', _quantity=10):
+            user.user_permissions.add(perm)
+            baker.make(RestrictedAccessTracker, user=user)
+        self.assertEqual(count_queries(), num_queries)
+
+    def test_paginated(self):
+        baker.make_recipe('common.user', _quantity=53)
+        resp = self._get_response(self.staff_user)
+        self.assertEqual(len(resp.context_data['users']), 50)
+        resp = self._get_response(self.staff_user, {'page': 2})
+        self.assertEqual(len(resp.context_data['users']), 5)
+
+    def test_search(self):
+        baker.make_recipe('common.user', first_name='Findme')
+        user = baker.make_recipe('common.user', last_name='Findme')
+        baker.make_recipe('common.user', _quantity=3)
+        resp = self._get_response(self.staff_user, {'search': 'findme'})
+        self.assertEqual(len(resp.context_data['users']), 2)
+        self.assertEqual(resp.context_data['users'][0], user)
+
+    def test_sort(self):
+        user_b = baker.make_recipe('common.user', last_name='B')
+        user_a = baker.make_recipe('common.user', last_name='A')
+        resp = self._get_response(self.staff_user, {'sort': '-last_name'})
+        self.assertEqual(
+            list(resp.context_data['users'])[:2], [user_b, user_a]
+        )
+
+        # unknown sort fields are ignored
+        resp = self._get_response(self.staff_user, {'sort': 'password'})
+        self.assertEqual(resp.context_data['sort'], 'first_name')
+
+
+class UserExportViewTests(TestPermissionMixin, TestCase):
+
+    def _get_response(self, user, form_data={}):
+        url = reverse('studioadmin:users_export')
+        request = self.factory.get(url, form_data)
+        request.session = _create_session()
+        request.user = user
+        request._messages = FallbackStorage(request)
+        view = UserExportView.as_view()
+        return view(request)
+
+    def test_cannot_access_if_not_staff(self):
+        resp = self._get_response(self.user)
+        self.assertEquals(resp.status_code, 302)
+        self.assertEquals(resp.url, reverse('permission_denied'))
+
+    def test_export_users_with_restricted_access(self):
+        perm = Permission.objects.get(codename='can_view_restricted')
+        self.user.user_permissions.add(perm)
+        baker.make(RestrictedAccessTracker, user=self.user)
+
+        resp = self._get_response(self.staff_user, {'sort': 'username'})
+        # the users are fetched as the response streams, in one query
+        with self.assertNumQueries(1):
+            content = b''.join(resp.streaming_content).decode('utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(
+            rows[0][:5],
+            ['Username', 'First name', 'Last name', 'Email',
+             'Can view restricted pages']
+        )
+        by_username = {row[0]: row for row in rows[1:]}
+        self.assertEqual(
+            sorted(by_username), [self.user.username, self.staff_user.username]
+        )
+        self.assertEqual(by_username[self.user.username][4], 'yes')
+        self.assertNotEqual(by_username[self.user.username][5], '')
+        self.assertEqual(by_username[self.staff_user.username][4:6], ['no', ''])
+
+    def test_export_uses_search(self):
+        resp = self._get_response(
+            self.staff_user, {'search': self.staff_user.username}
+        )
+        content = b''.join(resp.streaming_content).decode('utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(
+            [row[0] for row in rows[1:]], [self.staff_user.username]
+        )
+
+    def test_post_not_allowed(self):
+        url = reverse('studioadmin:users_export')
+        request = self.factory.post(url, {'bulk_action': 'grant'})
+        request.user = self.staff_user
+        resp = UserExportView.as_view()(request)
+        self.assertEqual(resp.status_code, 405)
+
 
 class ChooseUsersToEmailTests(TestPermissionMixin, TestCase):
 
-    def _get_response(self, user):
+    def _get_response(self, user, data={}):
         url = reverse('studioadmin:choose_email_users')
         session = _create_session()
-        request = self.factory.get(url)
+        request = self.factory.get(url, data)
         request.session = session
         request.user = user
         messages = FallbackStorage(request)
@@ -153,19 +351,6 @@ class ChooseUsersToEmailTests(TestPermissionMixin, TestCase):
         request._messages = messages
         return choose_users_to_email(request)
 
-    def formset_data(self, extra_data={}):
-
-        data = {
-            'form-TOTAL_FORMS': 1,
-            'form-INITIAL_FORMS': 1,
-            'form-0-id': str(self.user.id),
-            }
-
-        for key, value in extra_data.items():
-            data[key] = value
-
-        return data
-
     def test_cannot_access_if_not_logged_in(self):
         """
         test that the page redirects if user is not logged in
@@ -191,36 +376,195 @@ class ChooseUsersToEmailTests(TestPermissionMixin, TestCase):
         resp = self._get_response(self.staff_user)
         self.assertEquals(resp.status_code, 200)
 
+    def test_preview_filters_users(self):
+        resp = self._get_response(
+            self.staff_user, {'search': self.user.username}
+        )
+        self.assertEqual(list(resp.context_data['users']), [self.user])
+
+    def test_preview_is_paginated(self):
+        baker.make_recipe('common.user', _quantity=55)
+        resp = self._get_response(self.staff_user)
+        self.assertEqual(len(resp.context_data['users']), 50)
+        self.assertEqual(resp.context_data['page_obj'].paginator.count, 57)
+
+        resp = self._get_response(self.staff_user, {'page': 2})
+        self.assertEqual(len(resp.context_data['users']), 7)
+
+    def test_preview_saved_segment(self):
+        segment = baker.make(
+            RecipientSegment, name='Test', search=self.user.username
+        )
+        resp = self._get_response(self.staff_user, {'segment': segment.id})
+        self.assertEqual(list(resp.context_data['users']), [self.user])
+        self.assertEqual(
+            list(resp.context_data['saved_segments']), [segment]
+        )
+
+    def test_post_saves_segment_and_redirects(self):
+        resp = self._post_response(
+            self.staff_user, {'search': self.user.username}
+        )
+        segment = RecipientSegment.objects.get()
+        self.assertEqual(
+            resp.url,
+            reverse('studioadmin:email_users_view', args=[segment.id])
+        )
+        self.assertEqual(segment.created_by, self.staff_user)
+        self.assertEqual(list(segment.get_users()), [self.user])
+        self.assertFalse(
+            ActivityLog.objects.filter(
+                log__contains='Email recipient selection'
+            ).exists()
+        )
+
+    def test_preview_posts_selection_back(self):
+        resp = self._post_response(
+            self.staff_user,
+            {'search': self.user.username, 'chosen_users': [self.user.id],
+             'preview': ''}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(RecipientSegment.objects.exists())
+        resp.render()
+        content = resp.content.decode()
+        self.assertIn(
+            'value="{}" checked'.format(self.user.id), content
+        )
+        # the csrf token is only ever posted, never in a link
+        self.assertNotIn('?csrfmiddlewaretoken', content)
+        self.assertNotIn('&csrfmiddlewaretoken', content)
+
+    def test_chosen_users_kept_while_paging(self):
+        others = baker.make_recipe('common.user', _quantity=55)
+        resp = self._post_response(
+            self.staff_user,
+            {'chosen_users': [others[0].id, self.user.id], 'page': 2}
+        )
+        self.assertFalse(RecipientSegment.objects.exists())
+        self.assertEqual(resp.context_data['page_obj'].number, 2)
+        page_ids = {user.id for user in resp.context_data['users']}
+        self.assertEqual(
+            set(resp.context_data['chosen_elsewhere']),
+            {others[0].id, self.user.id} - page_ids
+        )
+
+    def test_post_chosen_users(self):
+        chosen = baker.make_recipe('common.user')
+        self._post_response(
+            self.staff_user, {'chosen_users': [chosen.id, self.user.id]}
+        )
+        segment = RecipientSegment.objects.get()
+        # only the chosen users, not every user matching the filters
+        self.assertEqual(
+            sorted(user.id for user in segment.get_users()),
+            sorted([chosen.id, self.user.id])
+        )
+
+    def test_post_deletes_abandoned_one_off_segments(self):
+        old = baker.make(
+            RecipientSegment, created=timezone.now() - timedelta(days=2)
+        )
+        recent = baker.make(RecipientSegment)
+        named = baker.make(
+            RecipientSegment, name='Saved',
+            created=timezone.now() - timedelta(days=2)
+        )
+        self._post_response(
+            self.staff_user, {'search': self.user.username}
+        )
+        self.assertFalse(RecipientSegment.objects.filter(id=old.id).exists())
+        self.assertTrue(RecipientSegment.objects.filter(id=recent.id).exists())
+        self.assertTrue(RecipientSegment.objects.filter(id=named.id).exists())
+
+    def test_post_named_segment(self):
+        self._post_response(
+            self.staff_user, {'search': self.user.username, 'name': 'Test'}
+        )
+        self.assertEqual(RecipientSegment.objects.get().name, 'Test')
+        self.assertEqual(
+            ActivityLog.objects.latest('id').log,
+            'Email recipient selection "Test" saved by admin user {}'.format(
+                self.staff_user.username
+            )
+        )
+
+
+class RecipientSegmentTests(TestCase):
+
+    def setUp(self):
+        self.user = baker.make_recipe('common.user')
+
+    def test_restricted_access(self):
+        perm = Permission.objects.get(codename='can_view_restricted')
+        restricted = baker.make_recipe('common.user')
+        restricted.user_permissions.add(perm)
+        superuser = baker.make_recipe('common.user', is_superuser=True)
+
+        segment = RecipientSegment(restricted_access='yes')
+        self.assertEqual(
+            sorted(user.id for user in segment.get_users()),
+            sorted([restricted.id, superuser.id])
+        )
+        segment = RecipientSegment(restricted_access='no')
+        self.assertEqual(list(segment.get_users()), [self.user])
+
+    def test_data_privacy(self):
+        baker.make(DataPrivacyPolicy)
+        signed = baker.make_recipe('common.user')
+        baker.make(
+            SignedDataPrivacy, user=signed,
+            version=DataPrivacyPolicy.current_version()
+        )
+        segment = RecipientSegment(data_privacy='signed')
+        self.assertEqual(list(segment.get_users()), [signed])
+        segment = RecipientSegment(data_privacy='not_signed')
+        self.assertEqual(list(segment.get_users()), [self.user])
+
+    def test_reviewed_within_days(self):
+        reviewer = baker.make_recipe('common.user')
+        baker.make(Review, user=reviewer, submission_date=timezone.now())
+        baker.make(
+            Review, user=self.user,
+            submission_date=timezone.now() - timedelta(days=60)
+        )
+        segment = RecipientSegment(reviewed_within_days=30)
+        self.assertEqual(list(segment.get_users()), [reviewer])
+
 
 class EmailUsersTests(TestPermissionMixin, TestCase):
 
-    def _get_response(self, user, users_to_email):
-        url = reverse('studioadmin:email_users_view')
+    def setUp(self):
+        super(EmailUsersTests, self).setUp()
+        self.segment = baker.make(
+            RecipientSegment, search=self.user.username
+        )
+
+    def _get_response(self, user, segment):
+        url = reverse('studioadmin:email_users_view', args=[segment.id])
         session = _create_session()
         request = self.factory.get(url)
         request.session = session
-        request.session['users_to_email'] = users_to_email
         request.user = user
         messages = FallbackStorage(request)
         request._messages = messages
-        return email_users_view(request)
+        return email_users_view(request, segment.id)
 
-    def _post_response(self, user, users_to_email, form_data):
-        url = reverse('studioadmin:email_users_view')
+    def _post_response(self, user, segment, form_data):
+        url = reverse('studioadmin:email_users_view', args=[segment.id])
         session = _create_session()
         request = self.factory.post(url, form_data)
         request.session = session
-        request.session['users_to_email'] = users_to_email
         request.user = user
         messages = FallbackStorage(request)
         request._messages = messages
-        return email_users_view(request)
+        return email_users_view(request, segment.id)
 
     def test_cannot_access_if_not_logged_in(self):
         """
         test that the page redirects if user is not logged in
         """
-        url = reverse('studioadmin:email_users_view')
+        url = reverse('studioadmin:email_users_view', args=[self.segment.id])
         resp = self.client.get(url)
         redirected_url = reverse('account_login') + "?next={}".format(url)
         self.assertEquals(resp.status_code, 302)
@@ -230,7 +574,7 @@ class EmailUsersTests(TestPermissionMixin, TestCase):
         """
         test that the page redirects if user is not a staff user
         """
-        resp = self._get_response(self.user, [self.user.id])
+        resp = self._get_response(self.user, self.segment)
         self.assertEquals(resp.status_code, 302)
         self.assertEquals(resp.url, reverse('permission_denied'))
 
@@ -238,23 +582,34 @@ class EmailUsersTests(TestPermissionMixin, TestCase):
         """
         test that the page can be accessed by a staff user
         """
-        resp = self._get_response(self.staff_user, [self.user.id])
+        resp = self._get_response(self.staff_user, self.segment)
         self.assertEquals(resp.status_code, 200)
 
     def test_users_in_context(self):
-        resp = self._get_response(self.staff_user, [self.user.id])
+        resp = self._get_response(self.staff_user, self.segment)
         self.assertEqual(
             [user for user in resp.context_data['users_to_email']], [self.user]
         )
 
     def test_emails_sent(self):
-        self._post_response(
-            self.staff_user, [self.user.id],
+        resp = self._post_response(
+            self.staff_user, self.segment,
             form_data={
                 'subject': 'Test email',
                 'message': 'Test message',
                 'from_address': 'test@test.com'}
         )
+        bulk_email = BulkEmail.objects.get()
+        self.assertEqual(
+            resp.url,
+            reverse('studioadmin:bulk_email_status', args=[bulk_email.id])
+        )
+        # sent in the background
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(bulk_email.total, 1)
+        self.assertIn('Test message', bulk_email.html_message)
+
+        send_bulk_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(email.body, 'Test message')
@@ -263,21 +618,119 @@ class EmailUsersTests(TestPermissionMixin, TestCase):
         self.assertEqual(email.cc, [])
         self.assertEqual(email.reply_to, ['test@test.com'])
 
+    def test_one_off_segment_deleted_when_email_queued(self):
+        form_data = {
+            'subject': 'Test email',
+            'message': 'Test message',
+            'from_address': 'test@test.com'
+        }
+        self._post_response(self.staff_user, self.segment, form_data)
+        self.assertFalse(RecipientSegment.objects.exists())
+
+        named = baker.make(
+            RecipientSegment, name='Saved', search=self.user.username
+        )
+        self._post_response(self.staff_user, named, form_data)
+        self.assertTrue(RecipientSegment.objects.filter(id=named.id).exists())
+        self.assertEqual(BulkEmail.objects.count(), 2)
+
     def test_cc_email_sent(self):
         self._post_response(
-            self.staff_user, [self.user.id],
+            self.staff_user, self.segment,
             form_data={
                 'subject': 'Test email',
                 'message': 'Test message',
                 'from_address': 'test@test.com',
                 'cc': True}
         )
+        send_bulk_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(email.to, [self.user.email])
         self.assertEqual(email.cc, ['test@test.com'])
         self.assertEqual(email.reply_to, ['test@test.com'])
 
+    def test_users_resolved_when_sent(self):
+        resp = self._get_response(self.staff_user, self.segment)
+        self.assertEqual(resp.context_data['recipient_count'], 1)
+        # a user who matches the segment after the preview is still emailed
+        new_user = baker.make_recipe(
+            'common.user', username=self.user.username + 'new',
+            email='new@test.com'
+        )
+        self._post_response(
+            self.staff_user, self.segment,
+            form_data={
+                'subject': 'Test email',
+                'message': 'Test message',
+                'from_address': 'test@test.com'}
+        )
+        send_bulk_emails()
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            sorted([self.user.email, new_user.email])
+        )
+
+    def test_one_email_per_recipient(self):
+        baker.make_recipe('common.user', _quantity=3)
+        users = User.objects.all()
+        self._post_response(
+            self.staff_user, baker.make(RecipientSegment),
+            form_data={
+                'subject': 'Test email',
+                'message': 'Test message',
+                'from_address': 'test@test.com'}
+        )
+        send_bulk_emails()
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            sorted(user.email for user in users)
+        )
+        self.assertEqual(
+            BulkEmailRecipient.objects.filter(
+                status=BulkEmailRecipient.SENT
+            ).count(), 5
+        )
+
+
+class BulkEmailStatusViewTests(TestPermissionMixin, TestCase):
+
+    def setUp(self):
+        super(BulkEmailStatusViewTests, self).setUp()
+        self.bulk_email = baker.make(
+            BulkEmail, subject='Test email', total=2, sent_count=1
+        )
+        baker.make(
+            BulkEmailRecipient, bulk_email=self.bulk_email,
+            email='sent@test.com', status=BulkEmailRecipient.SENT
+        )
+        baker.make(
+            BulkEmailRecipient, bulk_email=self.bulk_email,
+            email='pending@test.com'
+        )
+
+    def _get_response(self, user):
+        url = reverse(
+            'studioadmin:bulk_email_status', args=[self.bulk_email.id]
+        )
+        request = self.factory.get(url)
+        request.session = _create_session()
+        request.user = user
+        return bulk_email_status_view(request, self.bulk_email.id)
+
+    def test_cannot_access_if_not_staff(self):
+        resp = self._get_response(self.user)
+        self.assertEquals(resp.status_code, 302)
+        self.assertEquals(resp.url, reverse('permission_denied'))
+
+    def test_progress_and_recipient_status(self):
+        resp = self._get_response(self.staff_user)
+        self.assertEquals(resp.status_code, 200)
+        content = resp.rendered_content
+        self.assertIn('1 of 2 sent', content)
+        self.assertIn('sent@test.com', content)
+        self.assertIn('Pending', content)
+
 
 class ActivityLogListViewTests(TestPermissionMixin, TestCase):
 
@@ -290,11 +743,13 @@ class ActivityLogListViewTests(TestPermissionMixin, TestCase):
         # 2 with fixed dates to test search date
         baker.make(
             ActivityLog,
-            log='email_warnings job run; no unpaid booking warnings to send'
+            log='email_warnings job run; no unpaid booking warnings to send',
+            action=ActivityLog.CRON_JOB_NO_ACTION
         )
         baker.make(
             ActivityLog,
-            log='cancel_unpaid_bookings job run; no bookings to cancel'
+            log='cancel_unpaid_bookings job run; no bookings to cancel',
+            action=ActivityLog.CRON_JOB_NO_ACTION
         )
         baker.make(ActivityLog, log='Test log message')
         baker.make(ActivityLog, log='Test log message1 One')
@@ -448,3 +903,220 @@ class ActivityLogListViewTests(TestPermissionMixin, TestCase):
             }
         )
         self.assertEqual(len(resp.context_data['logs']), 7)
+
+    def test_filter_by_action(self):
+        baker.make(
+            ActivityLog, log='Page test has been deleted',
+            action=ActivityLog.PAGE_DELETED
+        )
+        resp = self._get_response(
+            self.staff_user, {
+                'search_submitted': 'Search',
+                'action': ActivityLog.PAGE_DELETED
+            }
+        )
+        self.assertEqual(
+            [log.log for log in resp.context_data['logs']],
+            ['Page test has been deleted']
+        )
+
+    def test_filter_by_actor(self):
+        resp = self._get_response(
+            self.staff_user, {
+                'search_submitted': 'Search',
+                'actor': self.staff_user.username
+            }
+        )
+        # the staff user's registration log
+        self.assertEqual(len(resp.context_data['logs']), 1)
+        self.assertEqual(
+            resp.context_data['logs'][0].actor, self.staff_user
+        )
+
+    def _page_logs(self, resp):
+        return [log.log for log in resp.context_data['logs']]
+
+    def test_older_and_newer_pages(self):
+        ActivityLog.objects.all().delete()
+        # entries with the same timestamp are split between pages by id
+        timestamp = timezone.now()
+        for i in range(45):
+            baker.make(
+                ActivityLog, log='Log {:02d}'.format(i),
+                timestamp=timestamp if i < 30 else
+                timestamp + timedelta(seconds=i)
+            )
+        resp = self._get_response(self.staff_user)
+        page = resp.context_data['page_obj']
+        self.assertEqual(
+            self._page_logs(resp),
+            ['Log {:02d}'.format(i) for i in range(44, 24, -1)]
+        )
+        self.assertFalse(page.has_newer)
+        self.assertTrue(page.has_older)
+        self.assertEqual(resp.context_data['log_count'], 45)
+        self.assertTrue(resp.context_data['log_count_exact'])
+
+        resp = self._get_response(
+            self.staff_user, {'older': page.older_cursor}
+        )
+        page = resp.context_data['page_obj']
+        self.assertEqual(
+            self._page_logs(resp),
+            ['Log {:02d}'.format(i) for i in range(24, 4, -1)]
+        )
+        self.assertTrue(page.has_newer)
+        self.assertTrue(page.has_older)
+
+        resp = self._get_response(
+            self.staff_user, {'older': page.older_cursor}
+        )
+        last_page = resp.context_data['page_obj']
+        self.assertEqual(
+            self._page_logs(resp),
+            ['Log {:02d}'.format(i) for i in range(4, -1, -1)]
+        )
+        self.assertFalse(last_page.has_older)
+
+        resp = self._get_response(
+            self.staff_user, {'newer': last_page.newer_cursor}
+        )
+        self.assertEqual(
+            self._page_logs(resp),
+            ['Log {:02d}'.format(i) for i in range(24, 4, -1)]
+        )
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        baker.make(ActivityLog, _quantity=60)
+        with CaptureQueriesContext(connection) as first_page:
+            resp = self._get_response(self.staff_user)
+        for _ in range(2):
+            cursor = resp.context_data['page_obj'].older_cursor
+            with CaptureQueriesContext(connection) as deep_page:
+                resp = self._get_response(self.staff_user, {'older': cursor})
+        self.assertEqual(len(deep_page), len(first_page))
+        self.assertNotIn('OFFSET', deep_page[-2]['sql'])
+
+    def test_invalid_cursor_shows_newest_page(self):
+        resp = self._get_response(self.staff_user, {'older': 'not-a-cursor'})
+        self.assertEqual(len(resp.context_data['logs']), 7)
+        self.assertFalse(resp.context_data['page_obj'].has_newer)
+
+    def test_filter_by_target(self):
+        resp = self._get_response(
+            self.staff_user, {
+                'target_model': 'auth.user', 'target_id': self.user.id
+            }
+        )
+        self.assertEqual(len(resp.context_data['logs']), 1)
+        self.assertIn(
+            self.user.username, resp.context_data['logs'][0].log
+        )
+
+
+class ActivityLogExportViewTests(TestPermissionMixin, TestCase):
+
+    def _get_response(self, user, form_data={}):
+        url = reverse('studioadmin:activitylog_export')
+        request = self.factory.get(url, form_data)
+        request.session = _create_session()
+        request.user = user
+        request._messages = FallbackStorage(request)
+        view = ActivityLogExportView.as_view()
+        return view(request)
+
+    def _rows(self, resp):
+        content = b''.join(resp.streaming_content).decode('utf-8')
+        return list(csv.reader(content.splitlines()))
+
+    def test_cannot_access_if_not_staff(self):
+        resp = self._get_response(self.user)
+        self.assertEquals(resp.status_code, 302)
+        self.assertEquals(resp.url, reverse('permission_denied'))
+
+    def test_export_uses_search_filters(self):
+        baker.make(
+            ActivityLog, log='Test log message', actor=self.staff_user,
+            action=ActivityLog.PAGE_UPDATED
+        )
+        baker.make(ActivityLog, log='Other message')
+        baker.make(ActivityLog, log='=HYPERLINK("http://example.com")')
+
+        resp = self._get_response(
+            self.staff_user,
+            {'search_submitted': 'Search', 'search': 'test log'}
+        )
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        self.assertIn('activitylog.csv', resp['Content-Disposition'])
+        rows = self._rows(resp)
+        self.assertEqual(
+            rows[0],
+            ['Timestamp', 'User', 'Action', 'Target model', 'Target id', 'Log']
+        )
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1:3], [self.staff_user.username, 'page_updated'])
+        self.assertEqual(rows[1][5], 'Test log message')
+
+        # text that a spreadsheet would run as a formula is escaped
+        rows = self._rows(self._get_response(self.staff_user))
+        self.assertIn(
+            '\'=HYPERLINK("http://example.com")', [row[5] for row in rows]
+        )
+
+
+class ActivityLogArchiveViewTests(TestPermissionMixin, TestCase):
+
+    def setUp(self):
+        super(ActivityLogArchiveViewTests, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = override_settings(ACTIVITYLOG_ARCHIVE_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        baker.make(
+            ActivityLog, log='Archived log message',
+            timestamp=datetime(2015, 1, 1, 16, 0, tzinfo=timezone.utc)
+        )
+        baker.make(
+            ActivityLog, log='Another archived log',
+            timestamp=datetime(2015, 2, 1, 16, 0, tzinfo=timezone.utc)
+        )
+        archive_logs(datetime(2016, 1, 1, tzinfo=timezone.utc))
+
+    def _get_response(self, user, form_data={}):
+        url = reverse('studioadmin:activitylog_archive')
+        request = self.factory.get(url, form_data)
+        request.session = _create_session()
+        request.user = user
+        request._messages = FallbackStorage(request)
+        view = ActivityLogArchiveView.as_view()
+        return view(request)
+
+    def test_cannot_access_if_not_staff(self):
+        resp = self._get_response(self.user)
+        self.assertEquals(resp.status_code, 302)
+        self.assertEquals(resp.url, reverse('permission_denied'))
+
+    def test_no_search_until_submitted(self):
+        resp = self._get_response(self.staff_user)
+        self.assertEquals(resp.status_code, 200)
+        self.assertNotIn('logs', resp.context_data)
+        month_field = resp.context_data['form'].fields['month']
+        self.assertEqual(
+            [choice[0] for choice in month_field.choices],
+            ['', '2015-02', '2015-01']
+        )
+
+    def test_search_archive(self):
+        resp = self._get_response(
+            self.staff_user, {'search': 'archived', 'month': ''}
+        )
+        self.assertEqual(len(resp.context_data['logs']), 2)
+
+        resp = self._get_response(
+            self.staff_user, {'search': 'archived', 'month': '2015-01'}
+        )
+        self.assertEqual(
+            [log['log'] for log in resp.context_data['logs']],
+            ['Archived log message']
+        )
@@ -2,13 +2,14 @@ from django.urls import include, path, re_path
 from django.views.generic import RedirectView
 
 from gallery.views import CategoryListView, CategoryUpdateView
-from studioadmin.views.activitylog import ActivityLogListView
-from studioadmin.views.email_users import choose_users_to_email, \
-    email_users_view
+from studioadmin.views.activitylog import ActivityLogArchiveView, \
+    ActivityLogExportView, ActivityLogListView
+from studioadmin.views.email_users import bulk_email_status_view, \
+    choose_users_to_email, email_users_view
 from studioadmin.views.timetable import WeeklySessionListView, \
     EventListView, WeeklySessionEditView, EventEditView, \
     CreateWeeklySessionView, CreateEventView
-from studioadmin.views.users import UserListView
+from studioadmin.views.users import UserExportView, UserListView
 from studioadmin.views.website import PageListView, PageCreateView, \
     PageUpdateView
 
@@ -18,12 +19,23 @@ app_name = 'studioadmin'
 
 urlpatterns = [
     path('users/', UserListView.as_view(), name="users"),
+    path('users/export/', UserExportView.as_view(), name='users_export'),
     path('users/email/', choose_users_to_email, name="choose_email_users"),
-    path('users/email/emailform/', email_users_view,
+    path('users/email/<int:segment_id>/emailform/', email_users_view,
         name="email_users_view"),
+    path('users/email/<int:bulk_email_id>/', bulk_email_status_view,
+        name="bulk_email_status"),
     path(
         'activitylog/', ActivityLogListView.as_view(), name='activitylog'
     ),
+    path(
+        'activitylog/export/', ActivityLogExportView.as_view(),
+        name='activitylog_export'
+    ),
+    path(
+        'activitylog/archive/', ActivityLogArchiveView.as_view(),
+        name='activitylog_archive'
+    ),
     #### GALLERY #####
     path(
         'gallery/albums/', CategoryListView.as_view(),
@@ -5,12 +5,18 @@ from functools import reduce
 
 from django.contrib import messages
 from django.db.models import Q
-from django.views.generic import CreateView, ListView, UpdateView, DeleteView
+from django.views.generic import CreateView, ListView, UpdateView, \
+    DeleteView, TemplateView
 
 from braces.views import LoginRequiredMixin
 
-from studioadmin.forms import ActivityLogSearchForm
+from common.csv_export import EXPORT_CHUNK_SIZE, stream_csv
+from common.pagination import InvalidCursor, KeysetPaginator, \
+    approximate_count
+from studioadmin.forms import ActivityLogArchiveSearchForm, \
+    ActivityLogSearchForm
 from studioadmin.views.utils import StaffUserMixin
+from activitylog.archive import search_archive
 from activitylog.models import ActivityLog
 
 
@@ -21,28 +27,55 @@ class ActivityLogListView(LoginRequiredMixin, StaffUserMixin, ListView):
     context_object_name = 'logs'
     paginate_by = 20
 
+    def paginate_queryset(self, queryset, page_size):
+        # seek pagination on (timestamp, id) with newer/older cursors, so
+        # there's no COUNT(*) or OFFSET however far back staff page
+        paginator = KeysetPaginator(queryset, 'timestamp', page_size)
+        try:
+            page = paginator.page(
+                older_than=self.request.GET.get('older'),
+                newer_than=self.request.GET.get('newer')
+            )
+        except InvalidCursor:
+            page = paginator.page()
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_queryset(self):
 
-        empty_text = [
-            'email_warnings job run; no unpaid booking warnings to send',
-            'cancel_unpaid_bookings job run; no bookings to cancel'
-        ]
-        queryset = ActivityLog.objects.exclude(
-            log__in=empty_text
-        ).order_by('-timestamp')
+        all_logs = ActivityLog.objects.select_related('actor').order_by(
+            '-timestamp'
+        )
+        target_model = self.request.GET.get('target_model')
+        if target_model:
+            # the log for one object, or all objects of a model
+            all_logs = all_logs.filter(target_model=target_model)
+            target_id = self.request.GET.get('target_id')
+            if target_id:
+                all_logs = all_logs.filter(target_id=target_id)
+        queryset = all_logs.exclude(action=ActivityLog.CRON_JOB_NO_ACTION)
 
         reset = self.request.GET.get('reset')
         search_submitted =  self.request.GET.get('search_submitted')
         search_text = self.request.GET.get('search')
         search_date = self.request.GET.get('search_date')
+        action = self.request.GET.get('action')
+        actor = self.request.GET.get('actor')
         hide_empty_cronjobs = self.request.GET.get('hide_empty_cronjobs')
 
-        if reset or (not (search_text or search_date) and hide_empty_cronjobs) \
-                or (not reset and not search_submitted):
+        if reset or (
+            not (search_text or search_date or action or actor) and
+            hide_empty_cronjobs
+        ) or (not reset and not search_submitted):
             return queryset
 
         if not hide_empty_cronjobs:
-            queryset = ActivityLog.objects.all().order_by('-timestamp')
+            queryset = all_logs
+
+        if action:
+            queryset = queryset.filter(action=action)
+
+        if actor:
+            queryset = queryset.filter(actor__username=actor)
 
         if search_date:
             try:
@@ -81,16 +114,71 @@ class ActivityLogListView(LoginRequiredMixin, StaffUserMixin, ListView):
 
         search_text = self.request.GET.get('search', '')
         search_date = self.request.GET.get('search_date', None)
+        action = self.request.GET.get('action', '')
+        actor = self.request.GET.get('actor', '')
         reset = self.request.GET.get('reset')
         if reset:
             hide_empty_cronjobs = 'on'
             search_text = ''
             search_date = None
+            action = actor = ''
         form = ActivityLogSearchForm(
             initial={
                 'search': search_text, 'search_date': search_date,
+                'action': action, 'actor': actor,
                 'hide_empty_cronjobs': hide_empty_cronjobs
             })
         context['form'] = form
 
-        return context
\ No newline at end of file
+        context['log_count'], context['log_count_exact'] = \
+            approximate_count(self.object_list)
+        params = self.request.GET.copy()
+        params.pop('older', None)
+        params.pop('newer', None)
+        context['querystring'] = params.urlencode()
+
+        return context
+
+
+class ActivityLogExportView(ActivityLogListView):
+    """
+    Download the logs matching the current search as CSV
+    """
+
+    def get(self, request, *args, **kwargs):
+        logs = self.get_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        rows = (
+            (
+                log.timestamp.isoformat(), log.actor.username if log.actor
+                else '', log.action, log.target_model, log.target_id, log.log
+            ) for log in logs
+        )
+        return stream_csv(
+            'activitylog.csv',
+            ['Timestamp', 'User', 'Action', 'Target model', 'Target id', 'Log'],
+            rows
+        )
+
+
+class ActivityLogArchiveView(LoginRequiredMixin, StaffUserMixin, TemplateView):
+    """
+    Search the logs moved to the archive files by archive_activity_log
+    """
+
+    template_name = 'studioadmin/activitylog_archive.html'
+    max_results = 200
+
+    def get_context_data(self, **kwargs):
+        context = super(ActivityLogArchiveView, self).get_context_data(
+            **kwargs
+        )
+        context['sidenav_selection'] = 'activitylog'
+        form = ActivityLogArchiveSearchForm(self.request.GET or None)
+        context['form'] = form
+        if form.is_valid():
+            context['logs'] = search_archive(
+                form.cleaned_data['search'], form.cleaned_data['month'],
+                limit=self.max_results
+            )
+            context['max_results'] = self.max_results
+        return context
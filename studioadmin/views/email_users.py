@@ -1,71 +1,110 @@
 import logging
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.urls import reverse
 from django.template.loader import get_template
 from django.template.response import TemplateResponse
-from django.shortcuts import HttpResponseRedirect, render
+from django.shortcuts import HttpResponseRedirect, get_object_or_404
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from django.core.mail.message import EmailMultiAlternatives
-from common.email_helpers import send_support_email
-from studioadmin.forms import EmailUsersForm, ChooseUsersFormSet
+from mailqueue.bulk import create_bulk_email
+from mailqueue.models import BulkEmail
+from studioadmin.forms import EmailUsersForm, RecipientSegmentForm
+from studioadmin.models import RecipientSegment
 from studioadmin.views.utils import staff_required
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 
 logger = logging.getLogger(__name__)
 
 
+RECIPIENTS_PER_PAGE = 50
+# unnamed selections are deleted once their email is queued, or after this
+# long if it never is
+ONE_OFF_SEGMENT_AGE = timedelta(days=1)
+
+
 @login_required
 @staff_required
 def choose_users_to_email(request,
                           template_name='studioadmin/choose_users_form.html'):
-
-
+    """
+    Filter the students to email, with a paginated preview of the matching
+    users in which students can be chosen individually.  The selection is
+    kept in the form while previewing and paging, and saved as a
+    RecipientSegment (named, if it's to be reused; unnamed ones are deleted
+    when the email is queued) when it's emailed; the users are only
+    resolved when the email is sent.
+    """
     if request.method == 'POST':
-        usersformset = ChooseUsersFormSet(request.POST)
-
-        if usersformset.is_valid():
-
-            users_to_email = []
-
-            for form in usersformset:
-                # check checkbox value to determine if that user is to be
-                # emailed; add user_id to list
-                if form.is_valid():
-                    if form.cleaned_data.get('email_user'):
-                        users_to_email.append(form.instance.id)
-                else:
-                    for error in form.errors:
-                        messages.error(request, mark_safe("{}".format(error)))
-
-            request.session['users_to_email'] = users_to_email
-
-            return HttpResponseRedirect(reverse('studioadmin:email_users_view'))
-
-        else:
-            messages.error(
-                request,
-                mark_safe(
-                    "There were errors in the following fields:\n{}".format(
-                        '\n'.join(
-                            ["{}".format(error) for error in usersformset.errors]
-                        )
-                    )
+        form = RecipientSegmentForm(request.POST)
+        emailing = 'preview' not in request.POST and \
+            'page' not in request.POST
+        if form.is_valid() and emailing:
+            RecipientSegment.objects.filter(
+                name='', created__lt=timezone.now() - ONE_OFF_SEGMENT_AGE
+            ).delete()
+            segment = form.save(commit=False)
+            segment.created_by = request.user
+            segment.save()
+            form.save_m2m()
+            if segment.name:
+                log_activity(
+                    'Email recipient selection "{}" saved by admin '
+                    'user {}'.format(segment.name, request.user.username),
+                    action=ActivityLog.RECIPIENT_SEGMENT_SAVED,
+                    actor=request.user, target=segment
                 )
+            return HttpResponseRedirect(
+                reverse('studioadmin:email_users_view', args=[segment.id])
             )
-
-    else:
-        usersformset = ChooseUsersFormSet(
-            queryset=User.objects.all().order_by('username'),
+        if form.is_valid():
+            segment = form.save(commit=False)
+        else:
+            messages.error(request, "Please correct the errors below")
+            segment = None
+        chosen = request.POST.getlist('chosen_users')
+        page = request.POST.get('page')
+    elif request.GET.get('segment'):
+        segment = get_object_or_404(
+            RecipientSegment, id=request.GET['segment']
         )
+        form = RecipientSegmentForm(instance=segment)
+        chosen = segment.chosen_users.values_list('id', flat=True)
+        page = request.GET.get('page')
+    else:
+        filters = [
+            field for field in RecipientSegmentForm._meta.fields
+            if field in request.GET
+        ]
+        form = RecipientSegmentForm(request.GET if filters else None)
+        segment = form.save(commit=False) if form.is_valid() \
+            else RecipientSegment()
+        chosen = request.GET.getlist('chosen_users')
+        page = request.GET.get('page')
+
+    chosen = {int(user_id) for user_id in chosen if str(user_id).isdigit()}
+    users = segment.get_matching_users() if segment is not None \
+        else User.objects.none()
+    paginator = Paginator(users, RECIPIENTS_PER_PAGE)
+    page_obj = paginator.get_page(page)
+    page_user_ids = {user.id for user in page_obj.object_list}
 
     return TemplateResponse(
         request, template_name, {
-            'usersformset': usersformset,
+            'form': form,
+            'users': page_obj.object_list,
+            'page_obj': page_obj,
+            'chosen': chosen,
+            # kept in the form as hidden inputs
+            'chosen_elsewhere': sorted(chosen - page_user_ids),
+            'saved_segments': RecipientSegment.objects.exclude(name=''),
             'sidenav_selection': 'email_users',
             }
     )
@@ -74,12 +113,12 @@ def choose_users_to_email(request,
 @login_required
 @staff_required
 def email_users_view(
-        request, template_name='studioadmin/email_users_form.html'
+        request, segment_id,
+        template_name='studioadmin/email_users_form.html'
 ):
 
-    users_to_email = User.objects.filter(
-        id__in=request.session['users_to_email']
-    )
+    segment = get_object_or_404(RecipientSegment, id=segment_id)
+    users_to_email = segment.get_users()
 
     if request.method == 'POST':
 
@@ -93,38 +132,34 @@ def email_users_view(
             message = form.cleaned_data['message']
             cc = form.cleaned_data['cc']
 
-            # do this per email address so recipients are not visible to
-            # each
-            email_addresses = [user.email for user in users_to_email]
-            for email_address in email_addresses:
-                try:
-                    msg = EmailMultiAlternatives(
-                        subject, message, from_address, [email_address],
-                        cc=[from_address] if cc else [],
-                        reply_to=[from_address]
-                    )
-                    msg.attach_alternative(
-                        get_template(
-                            'studioadmin/email/email_users.html'
-                        ).render({'subject': subject, 'message': message}),
-                        "text/html"
-                    )
-                    msg.send(fail_silently=False)
-                except Exception as e:
-                    # send mail to tech support with Exception
-                    send_support_email(e, __name__, "Bulk Email to students")
-                    ActivityLog.objects.create(log="Possible error with "
-                        "sending bulk email; notification sent to tech support")
-
-            ActivityLog.objects.create(
-                log='Bulk email with subject "{}" sent to users {} by '
-                    'admin user {}'.format(
-                    subject, email_addresses, request.user.username
-                )
+            # each recipient gets their own email so recipients are not
+            # visible to each other; they're sent in the background by the
+            # mail queue worker
+            bulk_email = create_bulk_email(
+                users_to_email, subject, message, from_address,
+                html_message=get_template(
+                    'studioadmin/email/email_users.html'
+                ).render({'subject': subject, 'message': message}),
+                cc_from_address=cc,
+                created_by=request.user
             )
 
-            return render(request,
-                'studioadmin/email_users_confirmation.html')
+            log_activity(
+                'Bulk email with subject "{}" (id {}) to {} users queued '
+                'by admin user {}'.format(
+                    subject, bulk_email.id, bulk_email.total,
+                    request.user.username
+                ),
+                action=ActivityLog.BULK_EMAIL_QUEUED, actor=request.user,
+                target=bulk_email
+            )
+            # a one-off selection isn't needed once its users are queued
+            if not segment.name:
+                segment.delete()
+
+            return HttpResponseRedirect(
+                reverse('studioadmin:bulk_email_status', args=[bulk_email.id])
+            )
 
         else:
             messages.error(
@@ -136,11 +171,30 @@ def email_users_view(
 
         form = EmailUsersForm()
 
+    recipient_count = users_to_email.count()
     return TemplateResponse(
         request, template_name, {
             'form': form,
-            'users_to_email': users_to_email,
+            'segment': segment,
+            'users_to_email': users_to_email[:RECIPIENTS_PER_PAGE],
+            'recipient_count': recipient_count,
+            'more_count': max(0, recipient_count - RECIPIENTS_PER_PAGE),
             'sidenav_selection': 'email_users',
         }
     )
 
+
+@login_required
+@staff_required
+def bulk_email_status_view(
+        request, bulk_email_id,
+        template_name='studioadmin/bulk_email_status.html'
+):
+    bulk_email = get_object_or_404(BulkEmail, id=bulk_email_id)
+    return TemplateResponse(
+        request, template_name, {
+            'bulk_email': bulk_email,
+            'recipients': bulk_email.recipients.all(),
+            'sidenav_selection': 'email_users',
+        }
+    )
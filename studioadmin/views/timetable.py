@@ -8,6 +8,7 @@ from django.views.generic import CreateView, ListView, UpdateView
 from braces.views import LoginRequiredMixin
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 from studioadmin.forms import CreateEventForm, TimetableWeeklySessionFormSet, \
     EditSessionForm, EditEventForm, EventsFormSet
@@ -49,9 +50,9 @@ class WeeklySessionListView(LoginRequiredMixin, StaffUserMixin, ListView):
                     ', '.join(["{}".format(id) for id in deleted_session_ids]),
                     'have' if len(deleted_session_ids) > 1 else 'has',
                 )
-            ActivityLog.objects.create(
-                log="Session{plural} (id{plural} {ids}) {pluralhas} "
-                    "been deleted by admin user {user}".format(
+            log_activity(
+                "Session{plural} (id{plural} {ids}) {pluralhas} "
+                "been deleted by admin user {user}".format(
                         plural='s' if len(deleted_session_ids) > 1 else '',
                         pluralhas = 'have' if len(deleted_session_ids) > 1
                         else 'has',
@@ -59,7 +60,9 @@ class WeeklySessionListView(LoginRequiredMixin, StaffUserMixin, ListView):
                             ["{}".format(id) for id in deleted_session_ids]
                         ),
                         user=request.user.username
-                    )
+                    ),
+                action=ActivityLog.SESSION_DELETED, actor=request.user,
+                target=WeeklySession
             )
             messages.success(request, msg)
         else:
@@ -113,9 +116,9 @@ class EventListView(LoginRequiredMixin, StaffUserMixin, ListView):
                     ', '.join(["{}".format(name) for name in deleted_event_ids]),
                     'have' if len(deleted_event_ids) > 1 else 'has',
                 )
-                ActivityLog.objects.create(
-                    log="{event_type}{plural} (id{plural} {ids}) "
-                        "{pluralhas} been deleted by admin user {user}".format(
+                log_activity(
+                    "{event_type}{plural} (id{plural} {ids}) "
+                    "{pluralhas} been deleted by admin user {user}".format(
                             event_type=EVENT_CHOICES_DICT[self.event_type],
                             plural='s' if len(deleted_event_ids) > 1 else '',
                             pluralhas = 'have' if len(deleted_event_ids) > 1
@@ -124,7 +127,9 @@ class EventListView(LoginRequiredMixin, StaffUserMixin, ListView):
                                 ["{}".format(id) for id in deleted_event_ids]
                             ),
                             user=request.user.username
-                        )
+                        ),
+                    action=ActivityLog.EVENT_DELETED, actor=request.user,
+                    target=Event
                 )
             if updated_event_ids:
                 msg = "{}{} {} {} been updated".format(
@@ -133,9 +138,9 @@ class EventListView(LoginRequiredMixin, StaffUserMixin, ListView):
                     ', '.join(["{}".format(id) for id in updated_event_ids]),
                     'have' if len(updated_event_ids) > 1 else 'has',
                 )
-                ActivityLog.objects.create(
-                    log="{event_type}{plural} (id{plural} {ids}) "
-                        "{pluralhas} been deleted by admin user {user}".format(
+                log_activity(
+                    "{event_type}{plural} (id{plural} {ids}) "
+                    "{pluralhas} been updated by admin user {user}".format(
                             event_type=EVENT_CHOICES_DICT[self.event_type],
                             plural='s' if len(updated_event_ids) > 1 else '',
                             pluralhas = 'have' if len(updated_event_ids) > 1
@@ -144,7 +149,9 @@ class EventListView(LoginRequiredMixin, StaffUserMixin, ListView):
                                 ["{}".format(id) for id in updated_event_ids]
                             ),
                             user=request.user.username
-                        )
+                        ),
+                    action=ActivityLog.EVENT_UPDATED, actor=request.user,
+                    target=Event
                 )
 
             messages.success(request, msg)
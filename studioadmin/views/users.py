@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Permission
 
 from django.contrib import messages
+from django.db.models import F, Q
 from django.urls import reverse
 from django.template.loader import get_template
 from django.template.response import TemplateResponse
@@ -17,6 +18,8 @@ from django.core.mail import send_mail
 from braces.views import LoginRequiredMixin
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
+from common.csv_export import EXPORT_CHUNK_SIZE, stream_csv
 # from flex_bookings.models import Event, Booking, Block, WaitingListUser, \
 #     BookingError
 # from flex_bookings.email_helpers import send_support_email, \
@@ -25,6 +28,8 @@ from activitylog.models import ActivityLog
 #     UserBlockFormSet
 from studioadmin.views.utils import StaffUserMixin, staff_required
 from website.models import RestrictedAccessTracker
+from website.utils import annotate_restricted_access, \
+    grant_restricted_access, revoke_restricted_access
 
 
 logger = logging.getLogger(__name__)
@@ -34,36 +39,38 @@ class UserListView(LoginRequiredMixin, StaffUserMixin, ListView):
     model = User
     template_name = 'studioadmin/user_list.html'
     context_object_name = 'users'
-    queryset = User.objects.all().order_by('first_name')
+    paginate_by = 50
+    sort_fields = (
+        'username', 'first_name', 'last_name', 'email', 'restricted_access',
+        'access_start_date'
+    )
+    default_sort = 'first_name'
 
-    def get(self, request, *args, **kwargs):
-        perm = Permission.objects.get(codename='can_view_restricted')
-        if 'remove_all' in self.request.GET:
-            users = [
-                user for user in User.objects.all() if
-                user.has_perm('website.can_view_restricted')
-                ]
-            RestrictedAccessTracker.objects.all().delete()
-            if users:
-                for user in users:
-                    if not user.is_staff:
-                        user.user_permissions.remove(perm)
-                messages.success(
-                    request,
-                    "Restricted access permission has been removed for all "
-                    "users (except staff and superusers)"
-                )
-                ActivityLog.objects.create(
-                    log='Restricted access permission has been removed for all '
-                        'users (except staff and superusers) by admin user {}'.format(request.user.username)
-                )
-            else:
-                messages.error(
-                    request,
-                    "No users currently have restricted access permission"
-                )
+    def get_sort(self):
+        sort = self.request.GET.get('sort', self.default_sort)
+        if sort.lstrip('-') not in self.sort_fields:
+            return self.default_sort
+        return sort
 
+    def get_queryset(self):
+        # restricted access and the tracker start date are annotated so the
+        # page doesn't need a permission or tracker query per user
+        queryset = annotate_restricted_access(User.objects.all()).annotate(
+            access_start_date=F('restrictedaccesstracker__start_date')
+        )
+        search = self.request.GET.get('search', '').strip()
+        if search:
+            queryset = queryset.filter(
+                Q(username__icontains=search) |
+                Q(first_name__icontains=search) |
+                Q(last_name__icontains=search) |
+                Q(email__icontains=search)
+            )
+        sort = self.get_sort()
+        return queryset.order_by(sort, '-id' if sort.startswith('-') else 'id')
 
+    def get(self, request, *args, **kwargs):
+        perm = Permission.objects.get(codename='can_view_restricted')
         if 'change_user' in self.request.GET:
             change_user_id = self.request.GET.getlist('change_user')[0]
             user_to_change = User.objects.get(id=change_user_id)
@@ -95,15 +102,17 @@ class UserListView(LoginRequiredMixin, StaffUserMixin, ListView):
                             user_to_change.username
                         )
                     )
-                    ActivityLog.objects.create(
-                        log="Permission to view restricted pages "
-                            "has been removed for {} {} ({}) by admin "
-                            "user {}".format(
+                    log_activity(
+                        "Permission to view restricted pages "
+                        "has been removed for {} {} ({}) by admin "
+                        "user {}".format(
                             user_to_change.first_name,
                             user_to_change.last_name,
                             user_to_change.username,
                             request.user.username
-                        )
+                        ),
+                        action=ActivityLog.RESTRICTED_ACCESS_REVOKED,
+                        actor=request.user, target=user_to_change
                     )
 
             else:
@@ -123,26 +132,119 @@ class UserListView(LoginRequiredMixin, StaffUserMixin, ListView):
                         user_to_change.username
                     )
                 )
-                ActivityLog.objects.create(
-                    log="Permission to view restricted pages has been added "
-                        "for {} {} ({}) by admin user {}".format(
+                log_activity(
+                    "Permission to view restricted pages has been added "
+                    "for {} {} ({}) by admin user {}".format(
                         user_to_change.first_name,
                             user_to_change.last_name,
                             user_to_change.username,
                             request.user.username
-                        )
+                        ),
+                    action=ActivityLog.RESTRICTED_ACCESS_GRANTED,
+                    actor=request.user, target=user_to_change
                 )
             user_to_change.save()
             return HttpResponseRedirect(reverse('studioadmin:users'))
 
         return super(UserListView, self).get(request, *args, **kwargs)
 
+    def post(self, request, *args, **kwargs):
+        """
+        Grant or revoke restricted access for the selected users, or for
+        everyone (staff and superusers keep their access)
+        """
+        action = request.POST.get('bulk_action')
+        if request.POST.get('apply_to') == 'all':
+            if action == 'revoke':
+                users = User.objects.filter(is_staff=False, is_superuser=False)
+                description = 'all users (except staff and superusers)'
+            else:
+                users = User.objects.all()
+                description = 'all users'
+        else:
+            users = User.objects.filter(
+                id__in=request.POST.getlist('selected_users')
+            )
+            description = 'selected users'
+
+        if action not in ('grant', 'revoke'):
+            messages.error(request, "Please choose an action")
+        elif not users.exists():
+            messages.error(request, "No users selected")
+        else:
+            if action == 'grant':
+                changed = grant_restricted_access(users)
+                change = 'added for'
+                log_action = ActivityLog.RESTRICTED_ACCESS_GRANTED
+            else:
+                changed = revoke_restricted_access(users)
+                change = 'removed for'
+                log_action = ActivityLog.RESTRICTED_ACCESS_REVOKED
+            if changed:
+                summary = "Permission to view restricted pages has been " \
+                    "{} {} ({} user{} changed)".format(
+                        change, description, changed,
+                        '' if changed == 1 else 's'
+                    )
+                messages.success(request, summary)
+                log_activity(
+                    '{} by admin user {}'.format(
+                        summary, request.user.username
+                    ),
+                    action=log_action, actor=request.user, target=User
+                )
+            else:
+                messages.info(request, "No users were changed")
+
+        return HttpResponseRedirect(
+            '{}?{}'.format(
+                reverse('studioadmin:users'), request.POST.get('next', '')
+            )
+        )
+
     def get_context_data(self):
         context = super(UserListView, self).get_context_data()
         context['sidenav_selection'] = 'users'
+        context['search'] = self.request.GET.get('search', '')
+        context['sort'] = self.get_sort()
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['querystring'] = params.urlencode()
+        params.pop('sort', None)
+        context['search_querystring'] = params.urlencode()
         return context
 
 
+class UserExportView(UserListView):
+    """
+    Download the users matching the current search as CSV, in the current
+    sort order
+    """
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        users = self.get_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        rows = (
+            (
+                user.username, user.first_name, user.last_name, user.email,
+                'yes' if user.restricted_access else 'no',
+                user.access_start_date.isoformat()
+                if user.restricted_access and user.access_start_date else '',
+                user.date_joined.isoformat()
+            ) for user in users
+        )
+        return stream_csv(
+            'users.csv',
+            [
+                'Username', 'First name', 'Last name', 'Email',
+                'Can view restricted pages', 'Access granted',
+                'Date joined'
+            ],
+            rows
+        )
+
+
 # @login_required
 # @staff_required
 # def user_bookings_view(request, user_id, booking_status='future'):
@@ -10,6 +10,7 @@ from django.utils.safestring import mark_safe
 from braces.views import LoginRequiredMixin
 
 from activitylog.models import ActivityLog
+from activitylog.utils import log_activity
 
 from studioadmin.forms import PageForm, PagesFormset, PictureFormset
 from studioadmin.views.utils import StaffUserMixin
@@ -53,20 +54,22 @@ class PageListView(LoginRequiredMixin, StaffUserMixin, ListView):
 
             if len(deleted_page_names) == 1:
                 msg = "Page '{}' has been deleted".format(deleted_page_names[0])
-                ActivityLog.objects.create(
-                    log="Page {} (id {}) has been deleted by admin "
-                        "user {}".format(
+                log_activity(
+                    "Page {} (id {}) has been deleted by admin "
+                    "user {}".format(
                         deleted_page_names[0], deleted_page_ids[0],
                         request.user.username
-                    )
+                    ),
+                    action=ActivityLog.PAGE_DELETED, actor=request.user,
+                    target=Page
                 )
             elif len(deleted_page_names) > 1:
                 msg = "Pages {} have been deleted".format(
                     ', '.join(["'{}'".format(name) for name in deleted_page_names]),
                 )
-                ActivityLog.objects.create(
-                    log= "Pages {} (ids {}) have been deleted by admin "
-                         "user {}".format(
+                log_activity(
+                    "Pages {} (ids {}) have been deleted by admin "
+                    "user {}".format(
                         ', '.join(
                             ["{}".format(name) for name in deleted_page_names]
                         ),
@@ -74,7 +77,9 @@ class PageListView(LoginRequiredMixin, StaffUserMixin, ListView):
                             ['{}'.format(pageid for pageid in deleted_page_ids)]
                         ),
                         request.user.username
-                    )
+                    ),
+                    action=ActivityLog.PAGE_DELETED, actor=request.user,
+                    target=Page
                 )
             else:
                 msg = "No changes made"
@@ -161,12 +166,14 @@ class PageUpdateView(LoginRequiredMixin, StaffUserMixin, UpdateView):
                          )
                     )
                 )
-                ActivityLog.objects.create(
-                    log="Page {} (id {}) has been updated by admin user "
-                        "{}: {}".format(
+                log_activity(
+                    "Page {} (id {}) has been updated by admin user "
+                    "{}: {}".format(
                         page.name, page.id, request.user.username,
                         ', '.join(change_messages)
-                    )
+                    ),
+                    action=ActivityLog.PAGE_UPDATED, actor=request.user,
+                    target=page
                 )
 
             else:
@@ -227,11 +234,13 @@ class PageCreateView(LoginRequiredMixin, StaffUserMixin, CreateView):
                     "Page {} has been created".format(page.name)
                     )
                 )
-                ActivityLog.objects.create(
-                    log="Page {} (id {}) has been created by admin "
-                        "user {}".format(
+                log_activity(
+                    "Page {} (id {}) has been created by admin "
+                    "user {}".format(
                         page.name, page.id, request.user.username
-                    )
+                    ),
+                    action=ActivityLog.PAGE_CREATED, actor=request.user,
+                    target=page
                     )
             else:
                 if not picture_formset.is_valid():
@@ -27,6 +27,7 @@ class Location(models.Model):
     full_name = models.CharField(max_length=255)
     address = models.TextField(blank=True, default="")
     map_url = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.short_name
@@ -74,6 +75,7 @@ class WeeklySession(models.Model):
 
     full = models.BooleanField(default=False)
     block_info = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ('day', 'time')
@@ -114,6 +116,7 @@ class Event(models.Model):
     )
     spaces = models.PositiveIntegerField(null=True, blank=True)
     show_on_site = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.id and self.spaces is None or self.spaces == '':
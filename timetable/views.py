@@ -1,12 +1,21 @@
 from django.contrib.auth.decorators import login_required
 
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 
-from timetable.models import Event, WeeklySession
+from timetable.models import Event, Location, WeeklySession
 from timetable.utils import staff_required
+from website.utils import cache_public_response, \
+    conditional_public_response
 
 
+@method_decorator(
+    conditional_public_response(WeeklySession, Location), name='dispatch'
+)
+@method_decorator(
+    cache_public_response(WeeklySession, Location), name='dispatch'
+)
 class WeeklySessionListView(ListView):
 
     model = WeeklySession
@@ -30,6 +39,10 @@ class WeeklySessionListView(ListView):
         return context
 
 
+@method_decorator(
+    conditional_public_response(Event, Location), name='dispatch'
+)
+@method_decorator(cache_public_response(Event, Location), name='dispatch')
 class EventListView(ListView):
 
     model = Event
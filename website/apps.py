@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.utils.autoreload import autoreload_started
+
+
+class WebsiteConfig(AppConfig):
+    name = 'website'
+
+    def ready(self):
+        import website.signals
+        from website.utils import load_extra_templates_index, \
+            watch_extra_templates
+
+        load_extra_templates_index()
+        autoreload_started.connect(watch_extra_templates)
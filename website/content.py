@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from urllib.parse import unquote
+
+from bleach.html5lib_shim import Filter
+from bleach.sanitizer import Cleaner
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+# HTML allowed in page content created with the CKEditor widget
+PAGE_CONTENT_TAGS = [
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption',
+    'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img',
+    'li', 'ol', 'p', 'pre', 's', 'small', 'span', 'strike', 'strong', 'sub',
+    'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+]
+PAGE_CONTENT_ATTRIBUTES = {
+    '*': ['align', 'class', 'id', 'style', 'title'],
+    'a': ['href', 'name', 'rel', 'target'],
+    'iframe': [
+        'allow', 'allowfullscreen', 'frameborder', 'height', 'scrolling',
+        'src', 'width'
+    ],
+    'img': ['alt', 'height', 'loading', 'src', 'width'],
+    'table': ['border', 'cellpadding', 'cellspacing', 'summary'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan', 'scope'],
+}
+PAGE_CONTENT_STYLES = [
+    'background-color', 'border', 'border-collapse', 'border-width', 'color',
+    'float', 'font-family', 'font-size', 'font-style', 'font-weight', 'height',
+    'line-height', 'margin', 'margin-bottom', 'margin-left', 'margin-right',
+    'margin-top', 'padding', 'text-align', 'text-decoration', 'vertical-align',
+    'width',
+]
+
+
+def get_media_image_size(src):
+    """
+    Return the (width, height) of an image in media storage from its url,
+    or None if it isn't a media file or can't be read
+    """
+    if not src or not src.startswith(settings.MEDIA_URL):
+        return None
+    try:
+        path = unquote(src[len(settings.MEDIA_URL):])
+        with default_storage.open(path) as image_file:
+            return Image.open(image_file).size
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class ImageAttributesFilter(Filter):
+    """
+    Add loading="lazy" to images, and their intrinsic width and height if
+    not already set, so the browser can lay out the page before they load
+    """
+
+    def __iter__(self):
+        for token in super(ImageAttributesFilter, self).__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag') and \
+                    token['name'] == 'img':
+                attrs = token['data']
+                attrs[(None, 'loading')] = 'lazy'
+                if (None, 'width') not in attrs and \
+                        (None, 'height') not in attrs:
+                    size = get_media_image_size(attrs.get((None, 'src')))
+                    if size:
+                        attrs[(None, 'width')] = str(size[0])
+                        attrs[(None, 'height')] = str(size[1])
+            yield token
+
+
+def render_page_content(content):
+    """
+    Sanitise page content and add image attributes; the result is stored
+    on the page and output directly when it's rendered
+    """
+    cleaner = Cleaner(
+        tags=PAGE_CONTENT_TAGS,
+        attributes=PAGE_CONTENT_ATTRIBUTES,
+        styles=PAGE_CONTENT_STYLES,
+        protocols=['http', 'https', 'mailto', 'tel'],
+        strip=True,
+        filters=[ImageAttributesFilter],
+    )
+    return cleaner.clean(content or '')
@@ -3,50 +3,38 @@ from datetime import datetime
 from django.conf import settings
 from django.utils import timezone
 
-from website.models import Page
+from website.utils import get_nav_snapshot
 
 from reviews.models import Review
 
 
-def website_pages(request):
-    pages = Page.objects.all().exclude(active=False)
-    return {'website_pages': pages}
-
-
-def more_menu_options(request):
-    """
-    :param request:
-    :return: True if there are website pages to be shown in the "More"
-    dropdown menu
-    """
-    pages = Page.objects.all().exclude(active=False)
-    more_menu_options_unrestricted = [
-        True for page in pages if page.menu_name and
-        page.menu_location == 'dropdown' and not page.restricted
-        ]
-    more_menu_options_restricted = [
-        True for page in pages if page.menu_name and
-        page.menu_location == 'dropdown' and page.restricted
-        ]
-
-    if more_menu_options_unrestricted:
-        return {'more_menu_options': True}
-    elif more_menu_options_restricted:
-        if request.user.has_perm('website.can_view_restricted'):
-            return {'more_menu_options': True}
-        return {'more_menu_options': False}
-    else:
-        return {'more_menu_options': False}
-
-
-def menu_options(request):
+def navigation(request):
     """
-    :param request:
-    :return: True if there are any website pages to be shown in the menu bar
+    Menu links for website pages, read from the cached navigation snapshot
+    so rendering the menu doesn't hit the database.  Restricted pages are
+    only included if the user has permission to view them.
     """
-    pages = Page.objects.all().exclude(active=False)
-    menu_options = [True for page in pages if page.menu_name]
-    return {'menu_options': True if menu_options else False}
+    snapshot = get_nav_snapshot()
+    can_view_restricted = snapshot['has_restricted'] and \
+        request.user.has_perm('website.can_view_restricted')
+
+    main_links = [
+        link for link in snapshot['main']
+        if can_view_restricted or not link['restricted']
+    ]
+    dropdown_links = [
+        link for link in snapshot['dropdown']
+        if can_view_restricted or not link['restricted']
+    ]
+    return {
+        'nav_main_links': main_links,
+        'nav_dropdown_links': dropdown_links,
+        # True if there are website pages to be shown in the "More"
+        # dropdown menu
+        'more_menu_options': bool(dropdown_links),
+        # True if there are any website pages to be shown in the menu bar
+        'menu_options': bool(main_links or dropdown_links),
+    }
 
 
 def reviews_pending(request):
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from website.models import Page
+
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# every page includes the menu links built from website pages
+BASE_DEPENDENCIES = ['website.page']
+
+
+def get_export_urls():
+    """
+    Return a dict of the public urls to export, mapped to the labels of the
+    models their content is built from
+    """
+    events = ['timetable.event', 'timetable.location']
+    urls = {
+        reverse('website:home'): ['reviews.review'],
+        reverse('website:about'): [],
+        reverse('website:classes'): [],
+        reverse('website:retreats'): [],
+        reverse('website:stretch_clinics'): events,
+        reverse('website:workshops'): events,
+        reverse('timetable:timetable'): [
+            'timetable.weeklysession', 'timetable.location'
+        ],
+        reverse('timetable:timetable_clinics'): events,
+        reverse('timetable:timetable_workshops'): events,
+        reverse('gallery:gallery'): ['gallery.image', 'gallery.category'],
+        reverse('reviews:reviews'): ['reviews.review'],
+    }
+    pages = Page.objects.filter(active=True, restricted=False)
+    for name in pages.values_list('name', flat=True):
+        urls[reverse('website:page', kwargs={'page_name': name})] = [
+            'website.picture'
+        ]
+    return {
+        url: sorted(set(BASE_DEPENDENCIES + dependencies))
+        for url, dependencies in urls.items()
+    }
+
+
+def model_fingerprint(label):
+    """
+    Hash of all the rows of a model, used to find the models that have
+    changed since the last export
+    """
+    model = apps.get_model(label)
+    digest = hashlib.md5()
+    for row in model.objects.order_by('pk').values_list().iterator():
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def url_to_path(url):
+    return os.path.join(url.strip('/'), 'index.html').lstrip('/')
+
+
+def render_url(url):
+    """
+    Render a url as an anonymous user; returns the url, status code and
+    content.  Called in the worker processes.
+    """
+    response = Client().get(url)
+    return url, response.status_code, response.content
+
+
+class Command(BaseCommand):
+    help = 'Export the public pages of the site as static html files, ' \
+           'with a manifest, so they can be served without django.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir', default=settings.STATIC_SITE_ROOT,
+            help='Directory to write the html files to'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Number of worker processes to render pages with'
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only export pages whose source models have changed since '
+                 'the last export'
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        if options['processes'] < 1:
+            raise CommandError('--processes must be at least 1')
+
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        manifest = {'models': {}, 'pages': {}}
+        if options['incremental'] and os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+
+        export_urls = get_export_urls()
+        labels = sorted(
+            {label for deps in export_urls.values() for label in deps}
+        )
+        fingerprints = {label: model_fingerprint(label) for label in labels}
+        changed = {
+            label for label in labels
+            if manifest['models'].get(label) != fingerprints[label]
+        }
+
+        to_render = [
+            url for url, dependencies in sorted(export_urls.items())
+            if url not in manifest['pages'] or changed.intersection(dependencies)
+        ]
+
+        # remove pages that are no longer public
+        for url in set(manifest['pages']) - set(export_urls):
+            path = os.path.join(output_dir, manifest['pages'].pop(url)['file'])
+            if os.path.exists(path):
+                os.remove(path)
+            self.stdout.write('Removed {}'.format(url))
+
+        errors = []
+        for url, status_code, content in self.render(to_render, options):
+            if status_code != 200:
+                errors.append(url)
+                # make sure it's retried on the next incremental export
+                manifest['pages'].pop(url, None)
+                self.stderr.write(
+                    'Error exporting {}: status {}'.format(url, status_code)
+                )
+                continue
+            filename = url_to_path(url)
+            path = os.path.join(output_dir, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as html_file:
+                html_file.write(content)
+            manifest['pages'][url] = {
+                'file': filename,
+                'dependencies': export_urls[url],
+                'sha256': hashlib.sha256(content).hexdigest(),
+                'exported': timezone.now().isoformat(),
+            }
+
+        manifest['models'] = fingerprints
+        manifest['generated'] = timezone.now().isoformat()
+        os.makedirs(output_dir, exist_ok=True)
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+        self.stdout.write(
+            '{} pages exported to {}{}'.format(
+                len(to_render) - len(errors), output_dir,
+                ' ({} unchanged)'.format(len(export_urls) - len(to_render))
+                if options['incremental'] else ''
+            )
+        )
+
+    def render(self, urls, options):
+        if options['processes'] == 1 or len(urls) < 2:
+            return [render_url(url) for url in urls]
+        # the worker processes must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['processes']) as executor:
+            return list(executor.map(render_url, urls))
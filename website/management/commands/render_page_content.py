@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from website.models import Page
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the stored sanitised html for all website pages'
+
+    def handle(self, *args, **options):
+        pages = Page.objects.all()
+        for page in pages:
+            # content_html is generated on save
+            page.save()
+        self.stdout.write('Content rendered for {} pages.'.format(pages.count()))
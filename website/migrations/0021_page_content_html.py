@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0020_page_layout_menu_choices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0021_page_content_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
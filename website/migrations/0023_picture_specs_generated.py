@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0022_page_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='specs_generated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0023_picture_specs_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='processing_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='website_pages/originals'),
+        ),
+    ]
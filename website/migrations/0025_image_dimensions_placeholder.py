@@ -0,0 +1,28 @@
+# Generated by Django 3.0.5 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0024_originals_processed_by_worker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='placeholder',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
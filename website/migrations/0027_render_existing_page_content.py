@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from website.content import render_page_content
+
+
+def render_content(apps, schema_editor):
+    Page = apps.get_model('website', 'Page')
+    for page in Page.objects.all():
+        page.content_html = render_page_content(page.content)
+        page.save(update_fields=['content_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0026_stable_upload_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            render_content, reverse_code=migrations.RunPython.noop
+        ),
+    ]
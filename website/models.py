@@ -3,7 +3,8 @@ from django.db import models
 from django.utils import timezone
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from imagekit.models import ProcessedImageField
+from common.imagespecs import ProcessedName, image_metadata
+from website.content import render_page_content
 
 
 PAGE_LAYOUT_CHOICES = (
@@ -47,6 +48,8 @@ class Page(models.Model):
                   "'main', the first uploaded image will be used."
     )
     content = models.TextField('Content')
+    # sanitised content, generated on save
+    content_html = models.TextField(blank=True, default='', editable=False)
     restricted = models.BooleanField(
         default=False,
         help_text='Page only visible if user is logged in and has been given '
@@ -57,6 +60,7 @@ class Page(models.Model):
         help_text="Unselect if you don't want this page to be visible on "
                   "the site (irrespective of user permissions)"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         permissions = (
@@ -70,31 +74,58 @@ class Page(models.Model):
         self.name = self.name.lower()
         if ' ' in self.name:
             self.name = self.name.replace(' ', '-')
+        self.content_html = render_page_content(self.content)
         super(Page, self).save()
 
 
 class Picture(models.Model):
+    """
+    Uploaded images are stored under the name they keep and processed by
+    the generate_image_specs worker, as for gallery images
+    """
 
-    image = ProcessedImageField(
-        upload_to='website_pages',
-        format='JPEG',
-        options={'quality': 70},
-        null=True, blank=True,
+    spec_fields = ()
+    spec_source = 'image'
+
+    image = models.ImageField(
+        upload_to=ProcessedName('website_pages'), null=True, blank=True
     )
     page = models.ForeignKey(
         Page, related_name='pictures', on_delete=models.CASCADE
     )
     main = models.BooleanField(default=False)
+    specs_generated = models.BooleanField(default=False)
+    processing_failed = models.BooleanField(default=False)
+    # stored on upload, for the templates
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder = models.TextField(blank=True, default='')
+
+    @property
+    def processing_status(self):
+        if self.specs_generated:
+            return 'ready'
+        return 'failed' if self.processing_failed else 'processing'
 
     def save(self, *args, **kwargs):
-        # delete old image file when replacing by updating the file
+        # a new upload, rather than the worker's processed image
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            self.width, self.height, self.placeholder = \
+                image_metadata(self.image)
         try:
             this = Picture.objects.get(id=self.id)
-            if this.image != self.image:
-                this.image.delete(save=False)
-        except:
-            pass # when new photo then we do nothing, normal case
+        except Picture.DoesNotExist:
+            this = None  # when new photo then we do nothing, normal case
+        replaced = this is not None and this.image != self.image
+        if replaced and new_upload:
+            self.specs_generated = False
+            self.processing_failed = False
         super(Picture, self).save(*args, **kwargs)
+        # delete old image file when replacing by updating the file; after
+        # the save, so the new upload doesn't take the old file's name
+        if replaced:
+            this.image.delete(save=False)
     
     def delete(self, *args, **kwargs):
         # delete the image from storage when deleting Picture object
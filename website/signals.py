@@ -0,0 +1,60 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from gallery.models import Category, Image
+from reviews.models import Review
+from timetable.models import Event, Location, WeeklySession
+from website.models import Page, Picture
+from website.utils import NAV_VERSION_CACHE_KEY, bump_cache_version, \
+    model_cache_version_key, page_version_cache_key
+
+
+@receiver(pre_save, sender=Page)
+def page_pre_save(sender, instance, *args, **kwargs):
+    # if a page is renamed, invalidate the cached page under its old name
+    if instance.pk:
+        old_name = Page.objects.filter(pk=instance.pk).values_list(
+            'name', flat=True
+        ).first()
+        if old_name and old_name != instance.name:
+            bump_cache_version(page_version_cache_key(old_name))
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Picture)
+@receiver(post_delete, sender=Picture)
+def page_post_change(sender, instance, *args, **kwargs):
+    # invalidate the cached navigation snapshot and page render bundle
+    bump_cache_version(NAV_VERSION_CACHE_KEY)
+    if sender == Page:
+        page = instance
+    else:
+        try:
+            page = instance.page
+        except Page.DoesNotExist:
+            return
+        # a page's updated_at covers its pictures too
+        Page.objects.filter(pk=page.pk).update(updated_at=timezone.now())
+        bump_cache_version(model_cache_version_key(Page))
+    bump_cache_version(page_version_cache_key(page.name))
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=WeeklySession)
+@receiver(post_delete, sender=WeeklySession)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def public_model_post_change(sender, instance, *args, **kwargs):
+    # evict cached public responses that depend on this model
+    bump_cache_version(model_cache_version_key(sender))
@@ -1,22 +1,39 @@
+import json
 import os
-from datetime import time
+import shutil
+import tempfile
+from datetime import time, timedelta
+from importlib import import_module
 from model_bakery import baker
+from io import StringIO
 from tempfile import NamedTemporaryFile
 
+from django.apps import apps as django_apps
 from django.conf import settings
-from django.contrib.auth.models import Permission, User
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.core.cache import cache
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.core import mail
 from django.core import management
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.test import Client, RequestFactory, TestCase, override_settings
+from django.utils import timezone
 
 from common.helpers import set_up_fb, _create_session
 
-from timetable.models import WeeklySession
+from mailqueue.models import QueuedEmail
+from mailqueue.utils import send_queued_emails
+from reviews.models import Review
+from timetable.models import Event, WeeklySession
+from website.content import render_page_content
+from website.context_processors import navigation
 from website.forms import ContactForm
-from website.models import Page, Picture
-from website.views import contact as contact_view
+from website.models import Page, Picture, RestrictedAccessTracker
+from website.utils import NAV_VERSION_CACHE_KEY, find_extra_templates, \
+    get_extra_template, get_nav_snapshot, get_page_bundle, \
+    grant_restricted_access, revoke_restricted_access
+from website.views import contact as contact_view, page as page_view
 
 
 class TestMixin(object):
@@ -139,6 +156,66 @@ class WebsiteModelsTests(TestCase):
             os.unlink(pic_file.name)
 
 
+@override_settings(MEDIA_ROOT=os.path.join(os.path.dirname(__file__), '..'))
+class PageContentTests(TestCase):
+
+    def test_content_sanitised_on_save(self):
+        page = baker.make(
+            Page, name='test',
+            content='<p onclick="evil()">Text</p><script>alert(1)</script>'
+                    '<a href="javascript:evil()">link</a>'
+                    '<iframe src="https://www.youtube.com/embed/1"></iframe>'
+        )
+        self.assertEqual(
+            page.content_html,
+            '<p>Text</p>alert(1)<a>link</a>'
+            '<iframe src="https://www.youtube.com/embed/1"></iframe>'
+        )
+
+    def test_images_lazy_loaded_with_dimensions(self):
+        content = render_page_content(
+            '<img src="/media/gallery/tests/testjpg.jpg">'
+            '<img src="https://example.com/test.jpg" width="10">'
+        )
+        self.assertEqual(
+            content,
+            '<img src="/media/gallery/tests/testjpg.jpg" loading="lazy" '
+            'width="2816" height="1880">'
+            '<img src="https://example.com/test.jpg" width="10" loading="lazy">'
+        )
+
+    def test_page_renders_stored_content(self):
+        page = baker.make(
+            Page, name='test', active=True,
+            content='<p>Text</p><script>alert(1)</script>'
+        )
+        resp = self.client.get(
+            reverse('website:page', kwargs={'page_name': page.name})
+        )
+        self.assertIn('<p>Text</p>alert(1)', resp.rendered_content)
+        self.assertNotIn('<script>alert(1)', resp.rendered_content)
+
+
+    def test_content_never_rendered_unsanitised(self):
+        page = baker.make(
+            Page, name='test', active=True, content='<script></script>'
+        )
+        self.assertEqual(page.content_html, '')
+        resp = self.client.get(
+            reverse('website:page', kwargs={'page_name': page.name})
+        )
+        self.assertNotIn('<script></script>', resp.rendered_content)
+
+    def test_migration_renders_existing_content(self):
+        page = baker.make(Page, content='<p>Text</p><script></script>')
+        Page.objects.filter(id=page.id).update(content_html='')
+        migration = import_module(
+            'website.migrations.0027_render_existing_page_content'
+        )
+        migration.render_content(django_apps, None)
+        page.refresh_from_db()
+        self.assertEqual(page.content_html, '<p>Text</p>')
+
 class PageViewsTests(TestMixin, TestCase):
 
     @classmethod
@@ -155,6 +232,10 @@ class PageViewsTests(TestMixin, TestCase):
             'website:page', kwargs={'page_name': cls.public_page.name}
         )
 
+    def setUp(self):
+        super(PageViewsTests, self).setUp()
+        cache.clear()
+
     def login(self, user):
         self.client.login(username=user.username, password='test')
 
@@ -234,6 +315,108 @@ class PageViewsTests(TestMixin, TestCase):
         resp = self.client.get(self.public_page_url)
         self.assertEqual(resp.template_name, 'website/page_side.html')
 
+    def test_page_bundle_cached(self):
+        self.client.get(self.public_page_url)
+        bundle = get_page_bundle(self.public_page.name)
+        self.assertEqual(bundle['page'], self.public_page)
+        with self.assertNumQueries(0):
+            get_page_bundle(self.public_page.name)
+
+    def test_page_bundle_invalidated_on_page_or_picture_change(self):
+        self.client.get(self.public_page_url)
+        self.public_page.heading = 'New heading'
+        self.public_page.save()
+        resp = self.client.get(self.public_page_url)
+        self.assertIn('New heading', resp.rendered_content)
+
+        self.public_page.layout = '1-img-left'
+        self.public_page.save()
+        picture = baker.make(Picture, page=self.public_page)
+        bundle = get_page_bundle(self.public_page.name)
+        self.assertEqual(bundle['pictures'], [picture])
+        self.assertEqual(bundle['main_picture'], picture)
+        self.assertEqual(bundle['template'], 'website/page_side.html')
+
+        picture.delete()
+        bundle = get_page_bundle(self.public_page.name)
+        self.assertEqual(bundle['pictures'], [])
+        self.assertEqual(bundle['template'], 'website/page.html')
+
+    def test_main_picture_renditions_shown_once_generated(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        testfile_path = os.path.join(
+            settings.BASE_DIR, 'gallery', 'tests', 'testjpg.jpg'
+        )
+        self.public_page.layout = '1-img-left'
+        self.public_page.save()
+        with override_settings(MEDIA_ROOT=media_root):
+            with open(testfile_path, 'rb') as file:
+                # as uploaded with the page form
+                picture = Picture.objects.create(
+                    page=self.public_page,
+                    image=SimpleUploadedFile('testjpg.jpg', file.read())
+                )
+            self.assertFalse(picture.specs_generated)
+            resp = self.client.get(self.public_page_url)
+            self.assertNotIn('srcset', resp.rendered_content)
+            # the dimensions and placeholder stored on upload
+            self.assertIn('width="2816" height="1880"', resp.rendered_content)
+            self.assertIn('data:image/jpeg;base64,', resp.rendered_content)
+
+            management.call_command(
+                'generate_image_specs', processes=1, stdout=StringIO()
+            )
+            picture.refresh_from_db()
+            self.assertTrue(picture.specs_generated)
+            # the cached page is evicted when the picture is marked generated
+            resp = self.client.get(self.public_page_url)
+            self.assertIn('srcset', resp.rendered_content)
+            self.assertIn('sizes="300px"', resp.rendered_content)
+
+    def test_page_bundle_main_picture(self):
+        pic1 = baker.make(Picture, page=self.public_page)
+        pic2 = baker.make(Picture, page=self.public_page, main=True)
+        self.assertEqual(
+            get_page_bundle(self.public_page.name)['main_picture'], pic2
+        )
+        pic2.main = False
+        pic2.save()
+        # first picture used if none selected as main
+        self.assertEqual(
+            get_page_bundle(self.public_page.name)['main_picture'], pic1
+        )
+
+    def test_renamed_page_bundle_invalidated(self):
+        page = baker.make(Page, active=True, name="oldname")
+        self.client.get(reverse('website:page', kwargs={'page_name': 'oldname'}))
+        page.name = 'newname'
+        page.save()
+        resp = self.client.get(
+            reverse('website:page', kwargs={'page_name': 'oldname'})
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_extra_template_included(self):
+        # /about/ is served by the about view, so call the page view directly
+        page = baker.make(Page, active=True, name="about")
+        request = self.factory.get('/about/')
+        request.user = self.user
+        resp = page_view(request, page_name=page.name)
+        self.assertEqual(
+            resp.context_data['include_html'], 'website/about_extra.html'
+        )
+
+        resp = self.client.get(self.public_page_url)
+        self.assertEqual(resp.context_data['include_html'], '')
+
+    def test_extra_templates_index(self):
+        self.assertIn('about', find_extra_templates())
+        self.assertEqual(
+            get_extra_template('about'), 'website/about_extra.html'
+        )
+        self.assertEqual(get_extra_template('testname1'), '')
+
     def test_cannot_get_inactive_page_if_not_staff(self):
         page = baker.make(Page, active=False, name="testname2")
         self.login(self.user)
@@ -272,6 +455,227 @@ class PageViewsTests(TestMixin, TestCase):
         self.assertIn("THIS PAGE IS NOT LIVE", resp.rendered_content)
 
 
+class NavigationTests(TestMixin, TestCase):
+
+    def setUp(self):
+        super(NavigationTests, self).setUp()
+        cache.clear()
+        self.dropdown_page = baker.make(
+            Page, active=True, name='dropdown', menu_name='Dropdown',
+            menu_location='dropdown'
+        )
+        self.restricted_page = baker.make(
+            Page, active=True, name='restricted', menu_name='Restricted',
+            menu_location='dropdown', restricted=True
+        )
+        self.main_page = baker.make(
+            Page, active=True, name='main', menu_name='Main',
+            menu_location='main'
+        )
+        # pages without a menu name or inactive pages are not shown
+        baker.make(Page, active=True, name='nomenu', menu_name='')
+        baker.make(Page, active=False, name='inactive', menu_name='Inactive')
+
+    def _get_context(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        return navigation(request)
+
+    def test_snapshot_links(self):
+        snapshot = get_nav_snapshot()
+        self.assertEqual(
+            [link['name'] for link in snapshot['main']], ['main']
+        )
+        self.assertEqual(
+            [link['name'] for link in snapshot['dropdown']],
+            ['dropdown', 'restricted']
+        )
+        self.assertEqual(snapshot['dropdown'][0]['url'], '/dropdown/')
+        self.assertTrue(snapshot['has_restricted'])
+
+    def test_snapshot_is_cached(self):
+        get_nav_snapshot()
+        with self.assertNumQueries(0):
+            get_nav_snapshot()
+            self._get_context(AnonymousUser())
+
+    def test_snapshot_invalidated_on_page_change(self):
+        get_nav_snapshot()
+        self.main_page.menu_name = 'New main'
+        self.main_page.save()
+        self.assertEqual(get_nav_snapshot()['main'][0]['menu_name'], 'New main')
+
+        self.main_page.delete()
+        self.assertEqual(get_nav_snapshot()['main'], [])
+
+    def test_snapshot_invalidated_on_picture_change(self):
+        old_key = cache.get(NAV_VERSION_CACHE_KEY)
+        baker.make(Picture, page=self.main_page)
+        self.assertNotEqual(cache.get(NAV_VERSION_CACHE_KEY), old_key)
+
+    def test_restricted_links_only_shown_with_permission(self):
+        context = self._get_context(AnonymousUser())
+        self.assertEqual(
+            [link['name'] for link in context['nav_dropdown_links']],
+            ['dropdown']
+        )
+        self.assertTrue(context['more_menu_options'])
+
+        context = self._get_context(self.restricted_user)
+        self.assertEqual(
+            [link['name'] for link in context['nav_dropdown_links']],
+            ['dropdown', 'restricted']
+        )
+
+    def test_more_menu_options(self):
+        self.dropdown_page.delete()
+        context = self._get_context(AnonymousUser())
+        self.assertFalse(context['more_menu_options'])
+        self.assertTrue(context['menu_options'])
+
+        context = self._get_context(self.restricted_user)
+        self.assertTrue(context['more_menu_options'])
+
+    def test_menu_links_rendered(self):
+        resp = self.client.get(reverse('website:home'))
+        self.assertIn(
+            '<a href="/dropdown/">Dropdown</a>', resp.rendered_content
+        )
+        self.assertNotIn('/restricted/', resp.rendered_content)
+
+
+@override_settings(PUBLIC_RESPONSE_CACHE_ENABLED=True)
+class PublicResponseCacheTests(TestMixin, TestCase):
+
+    def setUp(self):
+        super(PublicResponseCacheTests, self).setUp()
+        cache.clear()
+
+    def test_anonymous_response_is_cached(self):
+        url = reverse('website:workshops')
+        baker.make(Event, event_type='workshop', description='Workshop 1')
+        resp = self.client.get(url)
+        self.assertIn('Workshop 1', resp.rendered_content)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(url)
+        self.assertIn('Workshop 1', resp.content.decode('utf-8'))
+
+    def test_cache_evicted_on_dependent_model_change(self):
+        url = reverse('website:workshops')
+        event = baker.make(
+            Event, event_type='workshop', description='Workshop 1'
+        )
+        self.client.get(url)
+        event.description = 'Workshop 2'
+        event.save()
+        resp = self.client.get(url)
+        self.assertIn('Workshop 2', resp.rendered_content)
+
+        event.delete()
+        resp = self.client.get(url)
+        self.assertNotIn('Workshop 2', resp.rendered_content)
+
+    def test_cache_not_evicted_on_unrelated_model_change(self):
+        self.client.get(reverse('website:workshops'))
+        baker.make(Review, user=self.user)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('website:workshops'))
+
+    def test_page_change_evicts_cache(self):
+        self.client.get(reverse('website:about'))
+        baker.make(
+            Page, active=True, name='new', menu_name='New Page'
+        )
+        resp = self.client.get(reverse('website:about'))
+        self.assertIn('New Page', resp.rendered_content)
+
+    def test_authenticated_users_bypass_cache(self):
+        url = reverse('website:workshops')
+        self.client.get(url)
+        self.client.login(username=self.user.username, password='test')
+        resp = self.client.get(url)
+        # not a cached response
+        self.assertIsNotNone(resp.context)
+        self.assertIn(
+            'href="{}"'.format(reverse('profile:profile')),
+            resp.rendered_content
+        )
+
+
+class ConditionalResponseTests(TestMixin, TestCase):
+
+    def setUp(self):
+        super(ConditionalResponseTests, self).setUp()
+        cache.clear()
+        self.page = baker.make(
+            Page, name='test-page', content='Test content', active=True
+        )
+        self.url = reverse('website:page', kwargs={'page_name': 'test-page'})
+
+    def test_validators_sent(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('ETag', resp)
+        self.assertIn('Last-Modified', resp)
+        self.assertIn('Cookie', resp['Vary'])
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+
+    def test_matching_last_modified_returns_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        resp = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_etag_changes_on_dependent_model_change(self):
+        url = reverse('timetable:timetable_workshops')
+        event = baker.make(Event, event_type='workshop')
+        etag = self.client.get(url)['ETag']
+
+        event.description = 'Updated'
+        event.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+        # deleting a row changes the etag too
+        etag = resp['ETag']
+        event.delete()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_picture_change_updates_page_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        baker.make(Picture, page=self.page)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_etag_unchanged_on_unrelated_model_change(self):
+        url = reverse('gallery:gallery')
+        etag = self.client.get(url)['ETag']
+        baker.make(Review, user=self.user)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_reviews_and_timetable_send_validators(self):
+        for url in [reverse('reviews:reviews'), reverse('timetable:timetable')]:
+            etag = self.client.get(url)['ETag']
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304)
+
+    def test_no_validators_for_authenticated_users(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username=self.user.username, password='test')
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('ETag', resp)
+
+
 class ContactViewsTests(TestMixin, TestCase):
 
     def _get_response(self, user=None, session_data={}, referer=None):
@@ -389,6 +793,7 @@ class ContactViewsTests(TestMixin, TestCase):
         }
 
         self._post_response(form_data)
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(
@@ -411,7 +816,7 @@ class ContactViewsTests(TestMixin, TestCase):
         }
 
         resp = self._post_response(form_data)
-        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(QueuedEmail.objects.exists())
 
         # form is returned in context with errors
         form = resp.context_data['form']
@@ -419,6 +824,30 @@ class ContactViewsTests(TestMixin, TestCase):
             form.errors, {'message': ['This field is required.']}
         )
 
+    def test_contact_form_email_is_queued(self):
+        form_data = {
+            'subject': 'General Enquiry',
+            'first_name': 'test',
+            'last_name': 'testname',
+            'email_address': 'test@test.com',
+            'message': 'Hello',
+            'cc': False,
+            'data_privacy_accepted': True
+        }
+
+        self._post_response(form_data)
+        # not sent during the request
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.to, 'flexibeasttest@gmail.com')
+        self.assertTrue(
+            queued.failure_notification.startswith(
+                'Contact form enquiry from test testname (test@test.com)'
+            )
+        )
+        self.assertIn('email: test@test.com', queued.failure_notification)
+        self.assertIn('message: Hello', queued.failure_notification)
+
     def test_process_valid_contact_form_with_cc(self):
 
         form_data = {
@@ -432,6 +861,7 @@ class ContactViewsTests(TestMixin, TestCase):
         }
 
         self._post_response(form_data)
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(email.to, ['flexibeasttest@gmail.com'])
@@ -452,6 +882,7 @@ class ContactViewsTests(TestMixin, TestCase):
         }
 
         self._post_response(form_data)
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(email.to, ['flexibeasttest@gmail.com'])
@@ -484,6 +915,63 @@ class ContactViewsTests(TestMixin, TestCase):
         )
 
 
+class RestrictedAccessTests(TestCase):
+
+    def setUp(self):
+        self.perm = Permission.objects.get(codename='can_view_restricted')
+        self.users = baker.make_recipe('common.user', _quantity=3)
+
+    def test_grant_restricted_access(self):
+        self.users[0].user_permissions.add(self.perm)
+        with self.assertNumQueries(7):
+            granted = grant_restricted_access(User.objects.all())
+        self.assertEqual(granted, 2)
+        for user in User.objects.all():
+            self.assertTrue(user.has_perm('website.can_view_restricted'))
+        # trackers are only started for the users granted access
+        self.assertEqual(
+            sorted(
+                RestrictedAccessTracker.objects.values_list(
+                    'user_id', flat=True
+                )
+            ),
+            sorted(user.id for user in self.users[1:])
+        )
+
+    def test_grant_restarts_stale_tracker(self):
+        tracker = baker.make(
+            RestrictedAccessTracker, user=self.users[0],
+            start_date=timezone.now() - timedelta(days=10)
+        )
+        grant_restricted_access(User.objects.filter(id=self.users[0].id))
+        self.assertGreater(
+            RestrictedAccessTracker.objects.get(user=self.users[0]).start_date,
+            tracker.start_date
+        )
+
+    def test_revoke_restricted_access(self):
+        grant_restricted_access(User.objects.all())
+        revoked = revoke_restricted_access(
+            User.objects.filter(id__in=[user.id for user in self.users[:2]])
+        )
+        self.assertEqual(revoked, 2)
+        self.assertEqual(
+            [
+                user.id for user in User.objects.all()
+                if user.has_perm('website.can_view_restricted')
+            ],
+            [self.users[2].id]
+        )
+        self.assertEqual(
+            list(
+                RestrictedAccessTracker.objects.values_list(
+                    'user_id', flat=True
+                )
+            ),
+            [self.users[2].id]
+        )
+
+
 class WebsiteManagementTests(TestCase):
 
     def test_create_about_page(self):
@@ -492,6 +980,64 @@ class WebsiteManagementTests(TestCase):
         self.assertEqual(Page.objects.count(), 1)
         self.assertEqual(Page.objects.first().name, 'about')
 
+    def test_export_static_site(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        baker.make(Page, name='public', active=True)
+        baker.make(Page, name='restricted', active=True, restricted=True)
+        baker.make(Page, name='inactive', active=False)
+
+        management.call_command(
+            'export_static_site', output_dir=output_dir, processes=1
+        )
+        for path in [
+            'index.html', 'about/index.html', 'timetable/regular-classes/index.html',
+            'gallery/index.html', 'testimonials/index.html',
+            'public/index.html'
+        ]:
+            self.assertTrue(os.path.exists(os.path.join(output_dir, path)))
+        self.assertFalse(
+            os.path.exists(os.path.join(output_dir, 'restricted/index.html'))
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(output_dir, 'inactive/index.html'))
+        )
+
+        with open(os.path.join(output_dir, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(
+            manifest['pages']['/public/']['dependencies'],
+            ['website.page', 'website.picture']
+        )
+
+    def test_export_static_site_incremental(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        management.call_command(
+            'export_static_site', output_dir=output_dir, processes=1
+        )
+        user = baker.make_recipe('common.user')
+        baker.make(Review, user=user, published=True, review='Great class')
+
+        out = StringIO()
+        management.call_command(
+            'export_static_site', output_dir=output_dir, processes=1,
+            incremental=True, stdout=out
+        )
+        # only the home and testimonials pages depend on reviews
+        self.assertIn('2 pages exported', out.getvalue())
+        with open(
+            os.path.join(output_dir, 'testimonials/index.html')
+        ) as html_file:
+            self.assertIn('Great class', html_file.read())
+
+    def test_render_page_content(self):
+        page = baker.make(Page, content='<p>Text</p><script></script>')
+        Page.objects.filter(id=page.id).update(content_html='')
+        management.call_command('render_page_content')
+        page.refresh_from_db()
+        self.assertEqual(page.content_html, '<p>Text</p>')
+
     def test_about_page_not_overwritten_if_already_exists(self):
         management.call_command('create_about_page')
         self.assertEqual(Page.objects.count(), 1)
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, Exists, Max, \
+    OuterRef, Value, When
+from django.template import Engine
+from django.template.utils import get_app_template_dirs
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from website.models import Page, RestrictedAccessTracker
+
+
+NAV_VERSION_CACHE_KEY = 'website_nav_version'
+NAV_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_TEMPLATES = {
+    'no-img': 'website/page.html',
+    '1-img-top': 'website/page.html',
+    '1-img-left': 'website/page_side.html',
+    '1-img-right': 'website/page_side.html',
+    'img-col-left': 'website/page_col.html',
+    'img-col-right': 'website/page_col.html',
+}
+PAGE_BUNDLE_CACHE_TIMEOUT = 60 * 60 * 24
+MODEL_STATE_CACHE_TIMEOUT = 60 * 60 * 24
+
+EXTRA_TEMPLATE_SUFFIX = '_extra.html'
+# names of pages that have a website/<page_name>_extra.html template; built
+# once at startup by WebsiteConfig.ready()
+_extra_templates = None
+
+
+def get_cache_version(key):
+    """
+    Return the current version token stored under key, creating one if
+    it's not in the cache yet.  Cached data built from the models is keyed
+    by this version, so bumping it makes the old entries unreachable.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex[:12], timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_cache_versions(keys):
+    """
+    Return the current version tokens for a list of keys, using a single
+    cache lookup for the ones that already exist.
+    """
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_cache_version(key)
+        for key in keys
+    ]
+
+
+def bump_cache_version(key):
+    cache.set(key, uuid4().hex[:12], timeout=None)
+
+
+def model_cache_version_key(model):
+    return 'model_cache_version_{}'.format(model._meta.label_lower)
+
+
+def nav_snapshot_cache_key():
+    return 'website_nav_snapshot_{}'.format(
+        get_cache_version(NAV_VERSION_CACHE_KEY)
+    )
+
+
+def build_nav_snapshot():
+    """
+    Build the menu links for all active pages that have a menu name
+    """
+    pages = Page.objects.filter(active=True).exclude(
+        menu_name__isnull=True
+    ).exclude(menu_name='').order_by('id').values(
+        'name', 'menu_name', 'menu_location', 'restricted'
+    )
+    snapshot = {'main': [], 'dropdown': [], 'has_restricted': False}
+    for page in pages:
+        link = {
+            'name': page['name'],
+            'menu_name': page['menu_name'],
+            'url': reverse(
+                'website:page', kwargs={'page_name': page['name']}
+            ),
+            'restricted': page['restricted'],
+        }
+        snapshot[page['menu_location']].append(link)
+        if page['restricted']:
+            snapshot['has_restricted'] = True
+    return snapshot
+
+
+def get_nav_snapshot():
+    key = nav_snapshot_cache_key()
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_nav_snapshot()
+        cache.set(key, snapshot, timeout=NAV_CACHE_TIMEOUT)
+    return snapshot
+
+
+def public_response_cache_key(request, models):
+    versions = get_cache_versions(
+        [model_cache_version_key(model) for model in models]
+    )
+    # the cookie law banner is only rendered until it's been accepted
+    key = '{}:{}:{}'.format(
+        request.build_absolute_uri(),
+        request.COOKIES.get('cookielaw_accepted', ''),
+        ':'.join(versions)
+    )
+    return 'public_response_{}'.format(
+        hashlib.md5(key.encode('utf-8')).hexdigest()
+    )
+
+
+def cache_public_response(*models):
+    """
+    Cache the rendered response of a public view for anonymous users.
+
+    The cache key includes the current version of each model the page
+    depends on, so saving or deleting any of them (see website.signals)
+    evicts only the pages that use it.  Page is always a dependency since
+    it provides the menu links.  Authenticated users, non-GET requests
+    and requests with pending messages bypass the cache.
+    """
+    models = (Page,) + models
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not settings.PUBLIC_RESPONSE_CACHE_ENABLED or \
+                    request.method not in ('GET', 'HEAD') or \
+                    request.user.is_authenticated or \
+                    len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            key = public_response_cache_key(request, models)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+
+            def _cache_response(response):
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(
+                        key, response,
+                        timeout=settings.PUBLIC_RESPONSE_CACHE_TIMEOUT
+                    )
+
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(_cache_response)
+            else:
+                _cache_response(response)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def get_models_state(models):
+    """
+    Return a (label, latest updated_at, row count) tuple for each model.
+    The aggregates are cached under the model's current version, so they're
+    only queried again after one of its rows is saved or deleted.
+    """
+    versions = get_cache_versions(
+        [model_cache_version_key(model) for model in models]
+    )
+    keys = [
+        'model_state_{}_{}'.format(model._meta.label_lower, version)
+        for model, version in zip(models, versions)
+    ]
+    cached = cache.get_many(keys)
+    states = []
+    for model, key in zip(models, keys):
+        state = cached.get(key)
+        if state is None:
+            aggregates = model.objects.aggregate(
+                last_modified=Max('updated_at'), count=Count('pk')
+            )
+            state = (
+                model._meta.label_lower,
+                aggregates['last_modified'],
+                aggregates['count']
+            )
+            cache.set(key, state, timeout=MODEL_STATE_CACHE_TIMEOUT)
+        states.append(state)
+    return states
+
+
+def public_response_etag(request, states):
+    # the row counts are included so that deletions change the etag
+    key = '{}:{}:{}'.format(
+        request.get_full_path(),
+        request.COOKIES.get('cookielaw_accepted', ''),
+        ':'.join(
+            '{}-{}-{}'.format(
+                label, last_modified.isoformat() if last_modified else '',
+                count
+            )
+            for label, last_modified, count in states
+        )
+    )
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def conditional_public_response(*models):
+    """
+    Send ETag and Last-Modified headers with the response of a public view
+    for anonymous users, built from the latest updated_at and row count of
+    each model the page depends on.  A request with matching
+    If-None-Match/If-Modified-Since headers gets a 304 without the view
+    being called.  As with cache_public_response, Page is always a
+    dependency, and authenticated users, non-GET requests and requests with
+    pending messages are passed straight to the view.
+    """
+    models = (Page,) + models
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or \
+                    request.user.is_authenticated or \
+                    len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            states = get_models_state(models)
+            etag = public_response_etag(request, states)
+            last_modified = max(
+                (state[1] for state in states if state[1] is not None),
+                default=None
+            )
+            response = condition(
+                etag_func=lambda *args, **kwargs: etag,
+                last_modified_func=lambda *args, **kwargs: last_modified
+            )(view_func)(request, *args, **kwargs)
+            # the content differs for logged in users
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def get_template_dirs():
+    engine = Engine.get_default()
+    template_dirs = list(engine.dirs)
+    if engine.app_dirs:
+        template_dirs.extend(get_app_template_dirs('templates'))
+    return template_dirs
+
+
+def find_extra_templates():
+    """
+    Scan the template directories for website/<page_name>_extra.html
+    templates and return the set of page names that have one.  Page names
+    can contain "/", so subdirectories are included.
+    """
+    page_names = set()
+    for template_dir in get_template_dirs():
+        website_dir = os.path.join(template_dir, 'website')
+        for dirpath, _, filenames in os.walk(website_dir):
+            for filename in filenames:
+                if filename.endswith(EXTRA_TEMPLATE_SUFFIX):
+                    path = os.path.relpath(
+                        os.path.join(dirpath, filename), website_dir
+                    )
+                    page_names.add(
+                        path[:-len(EXTRA_TEMPLATE_SUFFIX)].replace(os.sep, '/')
+                    )
+    return frozenset(page_names)
+
+
+def load_extra_templates_index():
+    global _extra_templates
+    _extra_templates = find_extra_templates()
+
+
+def get_extra_template(page_name):
+    """
+    Return the extra template to include for this page, or '' if it
+    doesn't have one
+    """
+    if _extra_templates is None:
+        load_extra_templates_index()
+    if page_name in _extra_templates:
+        return 'website/{}{}'.format(page_name, EXTRA_TEMPLATE_SUFFIX)
+    return ''
+
+
+def watch_extra_templates(sender, **kwargs):
+    """
+    Make runserver reload (and so rebuild the extra templates index) when
+    an extra template is added or removed
+    """
+    for template_dir in get_template_dirs():
+        sender.watch_dir(
+            os.path.join(template_dir, 'website'),
+            '**/*{}'.format(EXTRA_TEMPLATE_SUFFIX)
+        )
+
+
+def page_version_cache_key(page_name):
+    return 'website_page_version_{}'.format(page_name)
+
+
+def build_page_bundle(page_name):
+    """
+    Collect everything needed to render a page: the page itself, its
+    pictures in upload order, the main picture (the one selected as main,
+    or the first one), the layout template and the extra template to
+    include.  Returns None if there is no page with this name.
+    """
+    try:
+        page = Page.objects.get(name=page_name)
+    except Page.DoesNotExist:
+        return None
+
+    pictures = list(page.pictures.order_by('id'))
+    main_picture = next(
+        (picture for picture in pictures if picture.main),
+        pictures[0] if pictures else None
+    )
+    template = PAGE_TEMPLATES[page.layout] if pictures \
+        else PAGE_TEMPLATES['no-img']
+    return {
+        'page': page,
+        'pictures': pictures,
+        'main_picture': main_picture,
+        'template': template,
+        'include_html': get_extra_template(page.name),
+    }
+
+
+def get_page_bundle(page_name):
+    key = 'website_page_bundle_{}_{}'.format(
+        page_name, get_cache_version(page_version_cache_key(page_name))
+    )
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_page_bundle(page_name)
+        if bundle is not None:
+            cache.set(key, bundle, timeout=PAGE_BUNDLE_CACHE_TIMEOUT)
+    return bundle
+
+
+def get_restricted_permission():
+    return Permission.objects.get(
+        codename='can_view_restricted', content_type__app_label='website'
+    )
+
+
+def annotate_restricted_access(users):
+    """
+    Annotate a User queryset with `restricted_access`: whether the user has
+    the can_view_restricted permission, directly, through a group or as an
+    active superuser, matching user.has_perm() without a query per user
+    """
+    permission = get_restricted_permission()
+    direct = User.user_permissions.through.objects.filter(
+        user=OuterRef('pk'), permission=permission
+    )
+    through_group = Permission.group_set.through.objects.filter(
+        group__user=OuterRef('pk'), permission=permission
+    )
+    return users.annotate(
+        restricted_access=Case(
+            When(is_active=False, then=Value(False)),
+            When(is_superuser=True, then=Value(True)),
+            When(Exists(direct), then=Value(True)),
+            When(Exists(through_group), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    )
+
+
+def grant_restricted_access(users):
+    """
+    Give the users in a User queryset the can_view_restricted permission and
+    start their access timers.  Users who already have the permission
+    directly are left alone.  Returns the number of users granted access.
+    """
+    permission = get_restricted_permission()
+    UserPermission = User.user_permissions.through
+    to_grant = users.exclude(user_permissions=permission)
+    with transaction.atomic():
+        # restart the timers of any stale trackers
+        RestrictedAccessTracker.objects.filter(user__in=to_grant).delete()
+        user_ids = list(to_grant.values_list('id', flat=True))
+        UserPermission.objects.bulk_create(
+            [
+                UserPermission(user_id=user_id, permission=permission)
+                for user_id in user_ids
+            ],
+            batch_size=500, ignore_conflicts=True
+        )
+        start_date = timezone.now()
+        RestrictedAccessTracker.objects.bulk_create(
+            [
+                RestrictedAccessTracker(user_id=user_id, start_date=start_date)
+                for user_id in user_ids
+            ],
+            batch_size=500
+        )
+    return len(user_ids)
+
+
+def revoke_restricted_access(users):
+    """
+    Remove the direct can_view_restricted permission from the users in a
+    User queryset and stop their access timers.  Returns the number of
+    users whose permission was removed.
+    """
+    permission = get_restricted_permission()
+    with transaction.atomic():
+        revoked, _ = User.user_permissions.through.objects.filter(
+            permission=permission, user__in=users
+        ).delete()
+        RestrictedAccessTracker.objects.filter(user__in=users).delete()
+    return revoked
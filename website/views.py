@@ -1,33 +1,23 @@
-from django.shortcuts import render, HttpResponse, HttpResponseRedirect, \
-    get_object_or_404
+from django.http import Http404
+from django.shortcuts import render, HttpResponse, HttpResponseRedirect
 from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.conf import settings
-from django.core.mail.message import EmailMessage, EmailMultiAlternatives
-from django.template.loader import get_template, select_template
-from django.template import TemplateDoesNotExist
+from django.core.mail.message import EmailMultiAlternatives
+from django.template.loader import get_template
 from django.contrib import messages
-from django.utils.safestring import mark_safe
-from django.core.mail import send_mail
 
 from accounts.models import DataPrivacyPolicy
 from accounts.utils import has_active_data_privacy_agreement
+from mailqueue.utils import enqueue_email
 from reviews.models import Review
-from timetable.models import WeeklySession, Event
-from website.models import Page
+from timetable.models import WeeklySession, Event, Location
 from website.forms import ContactForm
+from website.utils import cache_public_response, \
+    conditional_public_response, get_page_bundle
 
 
-TEMPLATES = {
-    'no-img': 'website/page.html',
-    '1-img-top': 'website/page.html',
-    '1-img-left': 'website/page_side.html',
-    '1-img-right': 'website/page_side.html',
-    'img-col-left': 'website/page_col.html',
-    'img-col-right': 'website/page_col.html',
-}
-
-
+@cache_public_response(Review)
 def home(request):
     if DataPrivacyPolicy.current_version() > 0 and request.user.is_authenticated \
             and not has_active_data_privacy_agreement(request.user):
@@ -40,24 +30,29 @@ def home(request):
         {'nav_section': 'home', 'testimonials': reviews}
     )
 
+
+@cache_public_response()
 def about(request):
     return TemplateResponse(
         request, 'website/about.html', {'nav_section': 'about'}
     )
 
 
+@cache_public_response()
 def classes(request):
     return TemplateResponse(
         request, 'website/classes.html', {'nav_section': 'services'}
     )
 
 
+@cache_public_response()
 def retreats(request):
     return TemplateResponse(
         request, 'website/retreats.html', {'nav_section': 'services'}
     )
 
 
+@cache_public_response(Event, Location)
 def stretch_clinics(request):
     events = Event.objects.filter(show_on_site=True, event_type='clinic').order_by('-date')
     return TemplateResponse(
@@ -66,6 +61,7 @@ def stretch_clinics(request):
     )
 
 
+@cache_public_response(Event, Location)
 def workshops(request):
     events = Event.objects.filter(show_on_site=True, event_type='workshop').order_by('-date')
     return TemplateResponse(
@@ -73,8 +69,12 @@ def workshops(request):
     )
 
 
+@conditional_public_response()
 def page(request, page_name):
-    page = get_object_or_404(Page, name=page_name)
+    bundle = get_page_bundle(page_name)
+    if bundle is None:
+        raise Http404('No page found with name {}'.format(page_name))
+    page = bundle['page']
 
     if not page.active and not request.user.is_staff:
         return HttpResponseRedirect(reverse(settings.PERMISSION_DENIED_URL))
@@ -96,22 +96,14 @@ def page(request, page_name):
                 reverse('profile:data_privacy_review') + '?next=' + request.path
             )
 
-    template = TEMPLATES['no-img']
-    if page.pictures.count() > 0:
-        template = TEMPLATES[page.layout]
-
-    try:
-        select_template(
-            ['website/{}_extra.html'.format(page_name)]
-        )
-        include_html = 'website/{}_extra.html'.format(page_name)
-    except TemplateDoesNotExist:
-        include_html = ''
-
     context = {
-        'page': page, 'include_html': include_html, 'nav_section': 'more'
+        'page': page,
+        'pictures': bundle['pictures'],
+        'main_picture': bundle['main_picture'],
+        'include_html': bundle['include_html'],
+        'nav_section': 'more'
     }
-    return TemplateResponse(request, template, context)
+    return TemplateResponse(request, bundle['template'], context)
 
 
 def process_contact_form(request):
@@ -137,64 +129,41 @@ def process_contact_form(request):
             'message': message,
         }
 
-        try:
-            msg = EmailMultiAlternatives(
-                '{} {}'.format(settings.ACCOUNT_EMAIL_SUBJECT_PREFIX, subject),
-                get_template(
-                    'website/contact_form_email.txt'
-                ).render(ctx),
-                settings.DEFAULT_FROM_EMAIL,
-                to=[settings.DEFAULT_STUDIO_EMAIL],
-                cc=[email_address] if cc else [],
-                reply_to=[email_address]
-            )
-            msg.attach_alternative(
-                get_template(
-                    'website/contact_form_email.html'
-                ).render(ctx),
-                "text/html"
+        msg = EmailMultiAlternatives(
+            '{} {}'.format(settings.ACCOUNT_EMAIL_SUBJECT_PREFIX, subject),
+            get_template(
+                'website/contact_form_email.txt'
+            ).render(ctx),
+            settings.DEFAULT_FROM_EMAIL,
+            to=[settings.DEFAULT_STUDIO_EMAIL],
+            cc=[email_address] if cc else [],
+            reply_to=[email_address]
+        )
+        msg.attach_alternative(
+            get_template(
+                'website/contact_form_email.html'
+            ).render(ctx),
+            "text/html"
+        )
+        # sent by the mail queue worker, which notifies tech support with
+        # the enquiry details if it can't be delivered
+        enqueue_email(
+            msg,
+            failure_notification='Contact form enquiry from {}\n\n'
+            'first_name: {}\n'
+            'last_name: {}\n'
+            'email: {}\n'
+            'message: {}'.format(
+                '{} {} ({})'.format(first_name, last_name, email_address),
+                first_name, last_name, email_address, message
             )
-            msg.send(fail_silently=False)
+        )
 
-            messages.info(
-                request,
-                "Thank you for your enquiry! Your email has been sent and "
-                "we'll get back to you as soon as possible."
-            )
-        except Exception as e:
-            # send mail to tech support with Exception
-            try:
-                send_mail('{} An error occurred! ({})'.format(
-                        settings.ACCOUNT_EMAIL_SUBJECT_PREFIX,
-                        'contact form'
-                        ),
-                    'An error occurred in {}\n\nThe exception '
-                    'raised was "{}"\n\n'
-                    'first_name: {}\n'
-                    'last_name: {}\n'
-                    'email: {}\n'
-                    'message: {}'.format(
-                        __name__, repr(e), first_name, last_name,
-                        email_address, message
-                    ),
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.SUPPORT_EMAIL],
-                    fail_silently=True)
-                messages.error(request, "A problem occurred while submitting "
-                                        "the form.  Tech support has been notified.")
-            except Exception as e:
-                messages.error(
-                    request, mark_safe(
-                        "A problem occurred while submitting the form, "
-                         "please contact the studio on "
-                         "<a href='mailto:{}' target=_blank>{}</a> for "
-                        "information".format(
-                            settings.DEFAULT_STUDIO_EMAIL,
-                            settings.DEFAULT_STUDIO_EMAIL
-                        )
-                    )
-                )
-                pass
+        messages.info(
+            request,
+            "Thank you for your enquiry! Your email has been sent and "
+            "we'll get back to you as soon as possible."
+        )
 
         request.session['first_name'] = first_name
         request.session['last_name'] = last_name